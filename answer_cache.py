@@ -0,0 +1,164 @@
+"""Cache de respostas do LLM compartilhado entre sessões.
+
+A chave combina provedor, modelo, temperatura, pergunta normalizada e um hash
+do contexto enviado; a mesma pergunta com o mesmo contexto é respondida uma
+única vez para todos os usuários. As entradas mais usadas ficam em um LRU em
+memória de tamanho limitado, e todas são persistidas em SQLite em
+``.cache/answers.sqlite3``, sobrevivendo a reinícios do app.
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_DIR = os.environ.get("ENADE_CACHE_DIR", ".cache")
+CACHE_VERSION = "v1"
+
+_SPACES = re.compile(r"\s+")
+_TRAILING = re.compile(r"[\s?!.;:]+$")
+# Pedaços reenviados ao reproduzir uma resposta do cache como stream
+_REPLAY_PIECE = re.compile(r"\S+\s*|\s+")
+
+
+def normalize_prompt(prompt):
+    """Caixa, espaços e pontuação final não mudam a pergunta"""
+    return _TRAILING.sub("", _SPACES.sub(" ", prompt.strip().lower()))
+
+
+def make_key(provider, model, temperature, prompt, context=""):
+    """Chave do cache: hash de (provedor, modelo, temperatura, pergunta normalizada, contexto)"""
+    context_hash = hashlib.sha256(context.encode("utf-8")).hexdigest()
+    parts = [CACHE_VERSION, provider, model, f"{float(temperature):.2f}", normalize_prompt(prompt), context_hash]
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+
+class AnswerCache:
+    """LRU em memória na frente de uma tabela SQLite; seguro para várias threads"""
+
+    def __init__(self, path=None, max_memory=256, max_disk=20000):
+        self.path = path or os.path.join(CACHE_DIR, "answers.sqlite3")
+        self.max_memory = max_memory
+        self.max_disk = max_disk
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            " key TEXT PRIMARY KEY, answer TEXT NOT NULL, provider TEXT, model TEXT,"
+            " created REAL, last_used REAL, hits INTEGER DEFAULT 0)"
+        )
+        self._db.commit()
+
+    def _remember(self, key, answer):
+        self._memory[key] = answer
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        """Resposta guardada para ``key`` ou ``None``"""
+        with self._lock:
+            answer = self._memory.get(key)
+            if answer is not None:
+                self._memory.move_to_end(key)
+            else:
+                row = self._db.execute("SELECT answer FROM answers WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    self.misses += 1
+                    return None
+                answer = row[0]
+                self._remember(key, answer)
+                self.disk_hits += 1
+            self.hits += 1
+            self._db.execute("UPDATE answers SET last_used = ?, hits = hits + 1 WHERE key = ?", (time.time(), key))
+            self._db.commit()
+            return answer
+
+    def put(self, key, answer, provider="", model=""):
+        if not answer:
+            return
+        now = time.time()
+        with self._lock:
+            self._remember(key, answer)
+            self._db.execute(
+                "INSERT OR REPLACE INTO answers (key, answer, provider, model, created, last_used, hits)"
+                " VALUES (?, ?, ?, ?, ?, ?, 0)",
+                (key, answer, provider, model, now, now),
+            )
+            # Descarta as entradas usadas há mais tempo quando o disco passa do limite
+            self._db.execute(
+                "DELETE FROM answers WHERE key IN (SELECT key FROM answers ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_disk,),
+            )
+            self._db.commit()
+
+    def __contains__(self, key):
+        with self._lock:
+            if key in self._memory:
+                return True
+            return self._db.execute("SELECT 1 FROM answers WHERE key = ?", (key,)).fetchone() is not None
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._db.execute("DELETE FROM answers")
+            self._db.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "memory_entries": len(self._memory),
+        }
+
+
+def replay(answer):
+    """Reproduz uma resposta guardada como stream, palavra por palavra"""
+    for match in _REPLAY_PIECE.finditer(answer):
+        yield match.group(0)
+
+
+def cached_stream(cache, key, stream, provider="", model=""):
+    """Envolve o gerador ``stream`` (chamado só em caso de miss) com o cache.
+
+    No acerto, a resposta guardada é reproduzida com :func:`replay`. No miss,
+    os pedaços do modelo passam adiante e a resposta completa é guardada; o
+    gerador do provedor deve retornar ``True`` ao receber o ``[DONE]``, para
+    que respostas interrompidas por erro ou timeout não entrem no cache.
+    """
+    answer = cache.get(key)
+    if answer is not None:
+        yield from replay(answer)
+        return True
+    generator = stream()
+    pieces = []
+    try:
+        while True:
+            try:
+                piece = next(generator)
+            except StopIteration as stop:
+                completed = stop.value
+                break
+            pieces.append(piece)
+            yield piece
+    finally:
+        # Consumidor que desistiu no meio: fecha já o stream do provedor (e a conexão)
+        generator.close()
+    if completed:
+        cache.put(key, "".join(pieces), provider=provider, model=model)
+    return completed
@@ -0,0 +1,207 @@
+"""Cliente assíncrono (asyncio) para as APIs de chat, com fan-out concorrente.
+
+Mesma semântica de streaming de ``gpt4_chat``/``deepseek_chat``: os pedaços
+de ``delta.content`` chegam à medida que o modelo os gera e a resposta só é
+considerada completa quando o servidor envia ``[DONE]``. Trabalhos com várias
+chamadas (pré-cálculo das sugestões, análise questão a questão) usam
+:meth:`AsyncLLMClient.gather`, que dispara tudo de uma vez, limitado por um
+semáforo por chave de API, e devolve os resultados na ordem de envio: o
+tempo total fica perto do da chamada mais lenta, não da soma de todas.
+
+Com ``httpx`` instalado usa ``httpx.AsyncClient`` (HTTP/2 se houver ``h2``);
+senão, cada chamada roda o :class:`llm_client.LLMClient` síncrono em uma
+thread, que repassa as linhas do stream para o loop de eventos.
+
+Uso::
+
+    resultados = run_all([ChatRequest("openai", api_key, "gpt-4", messages), ...])
+"""
+import asyncio
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+import requests
+
+from llm_client import CONNECT_TIMEOUT, READ_TIMEOUT, USE_HTTP2, LLMClient, _translate_errors, chat_url, httpx
+from sse import ChatStream
+
+# Chamadas simultâneas por chave de API (limites de taxa são por chave)
+MAX_CONCURRENCY = int(os.environ.get("ENADE_MAX_CONCURRENCY", "4"))
+
+_END = object()
+
+
+@dataclass
+class ChatRequest:
+    provider: str
+    api_key: str
+    model: str
+    messages: list
+    temperature: float = 0.5
+    max_tokens: int = 2000
+
+    def payload(self):
+        return {
+            "model": self.model,
+            "messages": self.messages,
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens,
+            "stream": True,
+            "stream_options": {"include_usage": True},
+        }
+
+    def headers(self):
+        return {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}
+
+
+@dataclass
+class ChatResult:
+    text: str
+    complete: bool  # o servidor enviou [DONE]
+    elapsed: float
+    finish_reason: str = None
+    usage: dict = None
+
+
+class AsyncLLMClient:
+    """Streaming assíncrono com concorrência limitada por chave de API.
+
+    Semáforos e conexões ficam presos ao loop de eventos em que foram
+    criados: use uma instância por loop (``async with AsyncLLMClient() as c``).
+    """
+
+    def __init__(self, max_concurrency=MAX_CONCURRENCY, connect_timeout=CONNECT_TIMEOUT,
+                 read_timeout=READ_TIMEOUT, http2=USE_HTTP2):
+        self.max_concurrency = max_concurrency
+        self._semaphores = {}
+        if http2 and httpx is not None:
+            self.backend = "httpx"
+            self._client = httpx.AsyncClient(
+                http2=True,
+                limits=httpx.Limits(max_connections=max(32, max_concurrency * 2)),
+                timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            )
+        else:
+            self.backend = "requests"
+            self._client = LLMClient(connect_timeout, read_timeout, pool_maxsize=max(32, max_concurrency * 2), http2=False)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    async def aclose(self):
+        if self.backend == "httpx":
+            await self._client.aclose()
+        else:
+            self._client.close()
+
+    def _semaphore(self, api_key):
+        if api_key not in self._semaphores:
+            self._semaphores[api_key] = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphores[api_key]
+
+    async def _chunks(self, request):
+        """Pedaços de bytes da resposta; erros HTTP viram ``requests.HTTPError``"""
+        url = chat_url(request.provider)
+        if self.backend == "httpx":
+            with _translate_errors():
+                async with self._client.stream("POST", url, headers=request.headers(), json=request.payload()) as response:
+                    if response.status_code != 200:
+                        await response.aread()
+                        raise requests.HTTPError(f"{response.status_code}: {response.text}")
+                    async for chunk in response.aiter_bytes():
+                        yield chunk
+            return
+
+        # Sem httpx: o stream síncrono roda em uma thread e alimenta uma fila do loop
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        stop = threading.Event()
+
+        def put(item):
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+            except RuntimeError:
+                # Loop já encerrado: ninguém mais está lendo
+                stop.set()
+
+        def worker():
+            try:
+                with self._client.stream(url, request.headers(), request.payload()) as response:
+                    if response.status_code != 200:
+                        put(requests.HTTPError(f"{response.status_code}: {response.text}"))
+                        return
+                    for chunk in response.iter_bytes():
+                        if stop.is_set():
+                            return
+                        put(chunk)
+            except Exception as e:
+                put(e)
+            finally:
+                put(_END)
+
+        threading.Thread(target=worker, daemon=True).start()
+        try:
+            while True:
+                item = await queue.get()
+                if item is _END:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            # Consumidor desistiu (ou terminou): a thread fecha a resposta
+            stop.set()
+
+    async def _events(self, request, stream):
+        """Pedaços de ``delta.content``, decodificados por ``stream`` (:class:`sse.ChatStream`)"""
+        async with self._semaphore(request.api_key):
+            chunks = self._chunks(request)
+            try:
+                async for chunk in chunks:
+                    for content in stream.feed(chunk):
+                        yield content
+                    if stream.done:
+                        return
+                for content in stream.close():
+                    yield content
+            finally:
+                # Libera a conexão antes de soltar o semáforo
+                await chunks.aclose()
+
+    async def stream(self, request, stream=None):
+        """Gerador assíncrono com os pedaços da resposta, como o ``gpt4_chat`` dos apps.
+
+        Passe um :class:`sse.ChatStream` para consultar ``done``,
+        ``finish_reason`` e ``usage`` depois do fim.
+        """
+        async for content in self._events(request, stream or ChatStream()):
+            yield content
+
+    async def chat(self, request):
+        """Resposta inteira de uma chamada em streaming"""
+        start = time.perf_counter()
+        stream = ChatStream()
+        pieces = [content async for content in self._events(request, stream)]
+        return ChatResult("".join(pieces), stream.done, time.perf_counter() - start,
+                          stream.finish_reason, stream.usage)
+
+    async def gather(self, requests_, return_exceptions=True):
+        """Dispara todas as chamadas de uma vez; resultados na ordem de ``requests_``.
+
+        Com ``return_exceptions`` (padrão), uma chamada que falha devolve a
+        exceção no lugar do :class:`ChatResult`, sem cancelar as outras.
+        """
+        return await asyncio.gather(*(self.chat(r) for r in requests_), return_exceptions=return_exceptions)
+
+
+def run_all(requests_, max_concurrency=MAX_CONCURRENCY, return_exceptions=True):
+    """Versão síncrona de :meth:`AsyncLLMClient.gather`, para scripts e apps sem loop"""
+    async def main():
+        async with AsyncLLMClient(max_concurrency) as client:
+            return await client.gather(requests_, return_exceptions)
+    return asyncio.run(main())
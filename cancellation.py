@@ -0,0 +1,63 @@
+"""Cancelamento cooperativo dos streams dos modelos.
+
+Cada sessão guarda um :class:`CancelToken` para a resposta em andamento.
+Uma nova pergunta na mesma sessão cancela o token anterior (:func:`supersede`),
+e o gerador do chat confere o token a cada pedaço recebido, fechando a
+conexão com o provedor assim que ele é cancelado. Reruns do Streamlit e
+desconexões do navegador interrompem o script na próxima chamada ``st.*``;
+nesse caso o app fecha o stream explicitamente (``stream.close()``), o que
+chega ao gerador do chat como ``GeneratorExit`` e também fecha a conexão.
+"""
+import threading
+
+# Motivos registrados nas métricas
+SUPERSEDED = "substituida"  # nova pergunta na mesma sessão
+ABANDONED = "abandonada"  # rerun, desconexão ou consumidor que parou de ler
+HEDGE_LOST = "hedge"  # pedido duplicado que perdeu a corrida (ver hedged_router.py)
+
+
+class CancelToken:
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+        self.reason = None
+
+    def cancel(self, reason=SUPERSEDED):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                pass
+
+    def on_cancel(self, callback):
+        """Chama ``callback`` no cancelamento (na hora, se já foi cancelado).
+
+        Usado para fechar uma resposta bloqueada à espera de bytes, que não
+        chegaria a conferir o token até o próximo pedaço.
+        """
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+
+def supersede(state, key="cancelamento"):
+    """Cancela o stream anterior da sessão e devolve o token da nova resposta"""
+    previous = state.get(key)
+    if previous is not None:
+        previous.cancel(SUPERSEDED)
+    token = CancelToken()
+    state[key] = token
+    return token
@@ -0,0 +1,141 @@
+"""Montagem do contexto do prompt por orçamento de tokens do modelo escolhido.
+
+Em vez de cortes fixos em caracteres, o contexto é preenchido com os blocos de
+maior valor (questões citadas, padrões de resposta, trechos recuperados) até
+o limite de tokens que sobra na janela do modelo depois de reservar espaço
+para a resposta (``max_tokens``), para as demais mensagens e para uma margem.
+
+A contagem usa o ``tiktoken`` (tokenizador local, sem chamada de rede) quando
+instalado; sem ele, cai em uma estimativa conservadora.
+"""
+import os
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - depende do ambiente
+    tiktoken = None
+
+# Janela de contexto (tokens) de cada modelo oferecido na barra lateral
+MODEL_CONTEXT_WINDOWS = {
+    "gpt-4": 8192,
+    "gpt-4-turbo-preview": 128000,
+    "gpt-3.5-turbo": 16385,
+    "deepseek-chat": 64000,
+    "deepseek-coder": 64000,
+}
+DEFAULT_CONTEXT_WINDOW = 8192
+
+# Teto de contexto mesmo em modelos de janela grande: acima disso o custo e o
+# tempo até o primeiro token crescem sem ganho perceptível nas respostas
+MAX_CONTEXT_TOKENS = int(os.environ.get("ENADE_MAX_CONTEXT_TOKENS", "24000"))
+
+# Overhead do formato de chat da OpenAI: por mensagem e para iniciar a resposta
+TOKENS_PER_MESSAGE = 3
+TOKENS_REPLY_PRIMING = 3
+SAFETY_MARGIN = 256
+
+_ROUGH_TOKEN = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+
+@lru_cache(maxsize=None)
+def _encoding(model):
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        # Modelos fora da OpenAI (DeepSeek) usam um BPE de tamanho parecido
+        return tiktoken.get_encoding("cl100k_base")
+
+
+@lru_cache(maxsize=8192)
+def count_tokens(text, model="gpt-4"):
+    """Número de tokens de ``text`` no tokenizador do modelo"""
+    encoding = _encoding(model)
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return _estimate_tokens(text)
+
+
+def _estimate_tokens(text):
+    # Estimativa sem tiktoken: palavras longas em português viram 2+ tokens
+    return sum(1 + len(piece) // 6 for piece in _ROUGH_TOKEN.findall(text))
+
+
+def truncate_to_tokens(text, budget_tokens, model="gpt-4"):
+    """Maior prefixo de ``text`` que cabe em ``budget_tokens``"""
+    encoding = _encoding(model)
+    if encoding is not None:
+        tokens = encoding.encode(text, disallowed_special=())
+        if len(tokens) <= budget_tokens:
+            return text
+        return encoding.decode(tokens[:budget_tokens])
+    # Sem tokenizador: busca binária pelo maior prefixo dentro da estimativa
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if _estimate_tokens(text[:middle]) <= budget_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    return text[:low]
+
+
+def count_message_tokens(messages, model="gpt-4"):
+    """Tokens de uma lista de mensagens no formato de chat, overhead incluído"""
+    total = TOKENS_REPLY_PRIMING
+    for message in messages:
+        total += TOKENS_PER_MESSAGE + count_tokens(message["content"], model)
+    return total
+
+
+def context_window(model):
+    return MODEL_CONTEXT_WINDOWS.get(model, DEFAULT_CONTEXT_WINDOW)
+
+
+def context_budget(model, max_tokens, messages=(), cap=MAX_CONTEXT_TOKENS):
+    """Tokens disponíveis para o contexto depois de reservar resposta, mensagens e margem"""
+    reserved = max_tokens + count_message_tokens(list(messages), model) + SAFETY_MARGIN
+    return max(0, min(cap, context_window(model) - reserved))
+
+
+@dataclass
+class PackedContext:
+    """Resultado do empacotamento: texto final e contabilidade de tokens"""
+    text: str
+    tokens: int
+    budget: int
+    included: int
+    dropped: int
+
+
+def pack_context(blocks, budget_tokens, model="gpt-4", separator="\n\n"):
+    """Preenche o orçamento de forma gulosa com os blocos de maior valor.
+
+    ``blocks`` é uma lista de ``(ordem, texto)`` já em ordem decrescente de
+    valor; blocos que não cabem são pulados e o próximo é tentado. No texto
+    final os blocos escolhidos aparecem ordenados por ``ordem`` (por exemplo,
+    questões citadas primeiro e trechos na ordem dos documentos).
+    """
+    separator_tokens = count_tokens(separator, model)
+    selected = []
+    used = 0
+    dropped = 0
+    for order, text in blocks:
+        cost = count_tokens(text, model) + (separator_tokens if selected else 0)
+        if used + cost > budget_tokens:
+            dropped += 1
+            continue
+        selected.append((order, text))
+        used += cost
+    selected.sort(key=lambda block: block[0])
+    return PackedContext(
+        text=separator.join(text for _, text in selected),
+        tokens=used,
+        budget=budget_tokens,
+        included=len(selected),
+        dropped=dropped,
+    )
@@ -0,0 +1,128 @@
+"""Memória da conversa do chat dentro de um orçamento fixo de tokens.
+
+Os turnos mais recentes vão na íntegra para o modelo; quando passam do
+orçamento, os mais antigos são incorporados a um resumo acumulado (gerado
+pelo próprio modelo ou, na falta dele, por um resumo extrativo) que fica
+guardado na sessão e só é refeito na próxima rolagem. Assim os tokens de
+entrada por pergunta ficam limitados, por mais longa que seja a sessão.
+"""
+import os
+import re
+
+from context_packer import count_message_tokens, count_tokens, truncate_to_tokens
+from exam_index import NUM_DISCURSIVE, NUM_OBJECTIVE, find_question_refs
+
+MEMORY_TOKENS = int(os.environ.get("ENADE_MEMORY_TOKENS", "1500"))
+SUMMARY_TOKENS = int(os.environ.get("ENADE_MEMORY_SUMMARY_TOKENS", "300"))
+
+_EXCERPT_WORDS = 30
+_ROLES = {"user": "Usuário", "assistant": "Assistente"}
+
+
+def extractive_summary(previous, turns, max_tokens=SUMMARY_TOKENS, model="gpt-4"):
+    """Resumo sem chamar o modelo: início de cada turno, descartando os mais antigos se não couber"""
+    lines = previous.splitlines() if previous else []
+    for role, text in turns:
+        words = text.split()
+        excerpt = " ".join(words[:_EXCERPT_WORDS]) + (" …" if len(words) > _EXCERPT_WORDS else "")
+        lines.append(f"- {_ROLES.get(role, role)}: {excerpt}")
+    while len(lines) > 1 and count_tokens("\n".join(lines), model) > max_tokens:
+        lines.pop(0)
+    return truncate_to_tokens("\n".join(lines), max_tokens, model)
+
+
+class ConversationMemory:
+    """Resumo acumulado dos turnos antigos + turnos recentes na íntegra"""
+
+    def __init__(self, budget_tokens=MEMORY_TOKENS, summary_tokens=SUMMARY_TOKENS):
+        self.budget_tokens = budget_tokens
+        self.summary_tokens = summary_tokens
+        self.summary = ""
+        self.summarized = 0  # quantos turnos do histórico já estão no resumo
+        self._recent = []
+
+    def reset(self):
+        self.summary = ""
+        self.summarized = 0
+        self._recent = []
+
+    def fit(self, historico, model="gpt-4", summarize=None):
+        """Ajusta a memória ao histórico ``[(papel, texto), ...]`` já exibido.
+
+        Se os turnos ainda não resumidos passam do orçamento, os mais antigos
+        são passados a ``summarize(resumo_anterior, turnos)`` até que os
+        recentes ocupem no máximo metade do orçamento (folga para as próximas
+        perguntas não dispararem um novo resumo a cada turno).
+        """
+        if len(historico) < self.summarized:
+            self.reset()
+        recent = list(historico[self.summarized:])
+        if count_message_tokens(self._as_messages(recent), model) > self.budget_tokens - self.summary_tokens:
+            target = (self.budget_tokens - self.summary_tokens) // 2
+            cut = 0
+            while cut < len(recent) and count_message_tokens(self._as_messages(recent[cut:]), model) > target:
+                cut += 1
+            rolled, recent = recent[:cut], recent[cut:]
+            summary = None
+            if summarize is not None:
+                try:
+                    summary = summarize(self.summary, rolled)
+                except Exception:
+                    summary = None
+            if summary:
+                summary = truncate_to_tokens(summary, self.summary_tokens, model)
+            else:
+                summary = extractive_summary(self.summary, rolled, self.summary_tokens, model)
+            self.summary = summary
+            self.summarized += cut
+        self._recent = recent
+
+    @staticmethod
+    def _as_messages(turns):
+        return [{"role": role, "content": text} for role, text in turns]
+
+    def messages(self):
+        """Mensagens a inserir entre o prompt de sistema e a pergunta atual"""
+        messages = []
+        if self.summary:
+            messages.append({"role": "system", "content": f"Resumo da conversa até aqui:\n{self.summary}"})
+        return messages + self._as_messages(self._recent)
+
+    def tokens(self, model="gpt-4"):
+        return count_message_tokens(self.messages(), model) if self.summary or self._recent else 0
+
+
+# "e a questão seguinte?", "e a anterior?", "explique melhor essa questão"
+_NEXT = re.compile(r"\b(seguinte|pr[óo]xima)\b", re.IGNORECASE)
+_PREVIOUS = re.compile(r"\banterior\b", re.IGNORECASE)
+_SAME = re.compile(r"\b(d?essa|nessa|desta|esta|mesma)\s+quest", re.IGNORECASE)
+
+
+def resolve_followup(prompt, historico):
+    """Completa perguntas de continuação com a questão a que se referem.
+
+    ``"e a seguinte?"`` depois de uma pergunta sobre a questão 7 vira
+    ``"e a seguinte? (questão 8)"``, para que o roteador e a busca saibam de
+    qual questão se trata. Perguntas que já citam questões não mudam.
+    """
+    if find_question_refs(prompt):
+        return prompt
+    if _NEXT.search(prompt):
+        step = 1
+    elif _PREVIOUS.search(prompt):
+        step = -1
+    elif _SAME.search(prompt):
+        step = 0
+    else:
+        return prompt
+    for role, text in reversed(historico):
+        refs = find_question_refs(text) if role == "user" else []
+        if refs:
+            last = refs[-1]
+            discursive = last.startswith("D")
+            number = int(last[1:]) + step
+            if not 1 <= number <= (NUM_DISCURSIVE if discursive else NUM_OBJECTIVE):
+                return prompt
+            label = "questão discursiva" if discursive else "questão"
+            return f"{prompt} ({label} {number})"
+    return prompt
@@ -0,0 +1,105 @@
+"""Carregamento dos PDFs da prova e montagem do contexto enviado ao modelo.
+
+Usado pelos apps Streamlit e pelos scripts de linha de comando (por exemplo
+``precompute_suggestions.py``), por isso não depende do Streamlit: avisos e
+erros de extração são entregues a callbacks opcionais.
+"""
+import hashlib
+import os
+
+from context_packer import pack_context
+from exam_index import AnswerKey, QuestionIndex, RubricStore, find_question_refs, mentions_rubric
+from page_store import PageStore
+from pdf_ingest import EXTRACTOR_VERSION, load_pdf_pages
+from retrieval import BM25Index
+
+DOCUMENT_FILES = {
+    "Prova": "2017 - Questoes.pdf",
+    "Gabarito (QO)": "2017 - BCC - gb.pdf",
+    "Padrões de Resposta (QD)": "2017 - Padroes de Resposta.pdf"
+}
+
+
+def load_documents(files=DOCUMENT_FILES, on_warning=None, on_error=None):
+    """Extrai os PDFs e constrói o store de páginas e os índices da prova"""
+    paginas_por_documento = []
+    arquivos_encontrados = []
+    arquivos_faltando = []
+    hashes = hashlib.sha256(EXTRACTOR_VERSION.encode("utf-8"))
+
+    for name, path in files.items():
+        if os.path.exists(path):
+            try:
+                # Texto por página vem do cache em disco (ou do PyPDF2 no primeiro acesso)
+                pdf_data = load_pdf_pages(path)
+                num_pages = len(pdf_data['pages'])
+
+                for i, erro in pdf_data['errors']:
+                    if on_warning:
+                        on_warning(f"Erro ao extrair página {i+1} de {name}: {erro}")
+
+                paginas_por_documento.append((name, pdf_data['pages']))
+                arquivos_encontrados.append(f"{name} ({num_pages} páginas)")
+                hashes.update(f"\0{name}\0{pdf_data['sha256']}".encode("utf-8"))
+
+            except Exception as e:
+                if on_error:
+                    on_error(f"Erro ao processar {path}: {e}")
+                arquivos_faltando.append(f"{name} (erro: {e})")
+        else:
+            arquivos_faltando.append(f"{name} (não encontrado)")
+
+    # Um único buffer com offsets por página, sem concatenações sucessivas
+    paginas = PageStore.build(paginas_por_documento)
+
+    return {
+        'paginas': paginas,
+        # O caderno original (2017 - BCC.pdf) fica de fora: a extração dele perde os
+        # cabeçalhos de 10 das 40 questões e não traz nenhuma que falte em "Prova"
+        'questoes': QuestionIndex.build(paginas, ["Prova"]),
+        'gabarito': AnswerKey.from_store(paginas, "Gabarito (QO)"),
+        'padroes': RubricStore.from_store(paginas, ["Padrões de Resposta (QD)"]),
+        'busca': BM25Index.from_store(paginas),
+        'arquivos_ok': arquivos_encontrados,
+        'arquivos_erro': arquivos_faltando,
+        'total_chars': paginas.total_chars,
+        # Muda sempre que um PDF (ou o extrator) muda
+        'sha256': hashes.hexdigest(),
+    }
+
+
+def build_chat_context(dados, pergunta, orcamento, model, buscar=None):
+    """Questões citadas na pergunta e trechos mais relevantes, até ``orcamento`` tokens do modelo.
+
+    ``buscar(pergunta, k)`` devolve ``[(score, Chunk), ...]``; por padrão, a
+    busca lexical (BM25) carregada com os documentos.
+    """
+    buscar = buscar or dados['busca'].search
+    questoes = dados['questoes']
+    padroes = dados['padroes']
+    blocos = []
+    usou_padrao = False
+    for qid in find_question_refs(pergunta):
+        if qid in questoes:
+            blocos.append(((0, len(blocos)), " ".join(questoes.text(qid).split())))
+        if qid in padroes:
+            blocos.append(((0, len(blocos)), padroes.get(qid).to_markdown()))
+            usou_padrao = True
+    # Perguntas sobre critérios de correção ficam só com o enunciado e o padrão de resposta
+    if usou_padrao and mentions_rubric(pergunta):
+        return pack_context(blocos, orcamento, model)
+    # Um trecho tem ~250 tokens: modelos de janela maior recebem mais trechos
+    relevantes = buscar(pergunta, k=max(12, orcamento // 250))
+    if not relevantes:
+        # Nenhum termo da pergunta aparece nos documentos: mantém o início deles
+        relevantes = [(0.0, chunk) for chunk in dados['busca'].chunks]
+    for _, chunk in relevantes:
+        blocos.append(((1, chunk.id), f"{chunk.header()}\n{chunk.text}"))
+    return pack_context(blocos, orcamento, model)
+
+
+def build_summary_context(dados, orcamento, model):
+    """Enunciados de todas as questões em ordem, até ``orcamento`` tokens do modelo"""
+    questoes = dados['questoes']
+    blocos = [((0, i), " ".join(questoes.text(qid).split())) for i, qid in enumerate(questoes.ids())]
+    return pack_context(blocos, orcamento, model)
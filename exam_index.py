@@ -0,0 +1,451 @@
+"""Índices estruturados sobre o texto da prova ENADE CC 2017.
+
+Os índices são construídos uma única vez sobre o :class:`PageStore` carregado
+por ``load_all_documents()`` e guardam apenas offsets no buffer; o texto de
+uma questão é recuperado com uma consulta ao dicionário e uma fatia do buffer,
+sem varrer o corpus novamente.
+"""
+import re
+from dataclasses import dataclass
+
+# "QUESTÃO 23" ou "QUESTÃO DISCURSIVA 03" (bytes UTF-8, para casar direto no buffer)
+_QUESTION_BOUNDARY = re.compile(rb"QUEST(?:\xc3\x83|A)O\s+(DISCURSIVA\s+)?(\d{1,2})\b")
+
+# Referências a questões em texto livre: "questão 12", "Q12", "D3", "discursiva 2",
+# "questões 3, 4 e 7", "questões 9 a 12"... O "D" vem colado ao número: "letra d 2"
+# ou "item d 3" não são discursivas
+_QUESTION_REF = re.compile(
+    r"\b(?:(?:quest[ãa]o\s+)?discursiva\s*|d)0?([1-5])\b"
+    r"|\b(?:quest[ãa]o|quest[õo]es|q)\s*(?:n[ºo°.]?\s*)?(\d{1,2}(?:\s*(?:,|e|a|-)\s*\d{1,2}\b)*)\b",
+    re.IGNORECASE,
+)
+_REF_LIST_PART = re.compile(r"(\d{1,2})(?:\s*(?:a|-)\s*(\d{1,2}))?", re.IGNORECASE)
+
+
+def _expand_numbers(sequence):
+    """``"3, 4 e 7"`` -> [3, 4, 7]; ``"9 a 12"`` -> [9, 10, 11, 12]"""
+    numbers = []
+    for match in _REF_LIST_PART.finditer(sequence):
+        first = int(match.group(1))
+        last = int(match.group(2)) if match.group(2) else first
+        numbers.extend(range(first, max(first, last) + 1))
+    return numbers
+
+NUM_OBJECTIVE = 35
+NUM_DISCURSIVE = 5
+
+
+@dataclass(frozen=True)
+class QuestionSpan:
+    """Localização de uma questão no buffer do :class:`PageStore`"""
+    id: str
+    kind: str  # "objetiva" ou "discursiva"
+    number: int
+    document: str
+    start: int  # offsets em bytes no buffer
+    end: int
+    char_start: int  # offsets em caracteres no texto completo
+    char_end: int
+    first_page: int
+    last_page: int
+
+
+def question_id(number, discursive=False):
+    """Identificador canônico: ``Q23`` para objetivas, ``D3`` para discursivas"""
+    return f"D{int(number)}" if discursive else f"Q{int(number)}"
+
+
+def normalize_question_id(ref):
+    """Converte ``"q 07"``, ``"23"``, ``"D03"`` ou ``"discursiva 3"`` no id canônico (ou ``None``)"""
+    match = _QUESTION_REF.search(str(ref))
+    if match is None:
+        ref = str(ref).strip()
+        return question_id(ref) if ref.isdigit() else None
+    if match.group(1):
+        return question_id(match.group(1), discursive=True)
+    return question_id(_expand_numbers(match.group(2))[0])
+
+
+def find_question_refs(text, in_range=True):
+    """Ids das questões citadas em ``text``, na ordem em que aparecem e sem repetição.
+
+    Com ``in_range=False`` números fora da prova (``"questão 48"``) também são
+    devolvidos, para quem precisa detectar citações inexistentes.
+    """
+    refs = []
+    for match in _QUESTION_REF.finditer(text):
+        if match.group(1):
+            found = [question_id(match.group(1), discursive=True)]
+        else:
+            found = [question_id(n) for n in _expand_numbers(match.group(2))
+                     if 1 <= n <= NUM_OBJECTIVE or not in_range and n > 0]
+        for qid in found:
+            if qid not in refs:
+                refs.append(qid)
+    return refs
+
+
+class QuestionIndex:
+    """Índice id da questão -> :class:`QuestionSpan` sobre um :class:`PageStore`"""
+
+    def __init__(self, store, spans):
+        self._store = store
+        self._spans = spans
+
+    @classmethod
+    def build(cls, store, documents):
+        """Detecta as fronteiras "QUESTÃO NN" / "QUESTÃO DISCURSIVA N" nos documentos.
+
+        ``documents`` é uma lista de nomes em ordem de preferência: o primeiro
+        documento que contém uma questão define sua posição e os seguintes só
+        preenchem as questões que faltarem.
+        """
+        found = {}
+        # Offsets em caracteres calculados incrementalmente, decodificando cada
+        # trecho do buffer uma única vez (as fronteiras vêm em ordem crescente)
+        char_position = 0
+        byte_position = 0
+
+        def to_chars(offset):
+            nonlocal char_position, byte_position
+            char_position += len(str(store.view(byte_position, offset), "utf-8", "ignore"))
+            byte_position = offset
+            return char_position
+
+        ordered = sorted(
+            (name for name in documents if name in store.documents),
+            key=store.documents.index,
+        )
+        for name in ordered:
+            doc_start, doc_end = store.document_bounds(name)
+            boundaries = [
+                (doc_start + match.start(), question_id(match.group(2), discursive=bool(match.group(1))))
+                for match in _QUESTION_BOUNDARY.finditer(store.document_view(name))
+            ]
+            boundaries.append((doc_end, None))
+            char_offsets = [to_chars(offset) for offset, _ in boundaries]
+            for i, (start, qid) in enumerate(boundaries[:-1]):
+                if qid in found:
+                    continue
+                end = boundaries[i + 1][0]
+                found[qid] = QuestionSpan(
+                    id=qid,
+                    kind="discursiva" if qid.startswith("D") else "objetiva",
+                    number=int(qid[1:]),
+                    document=name,
+                    start=start,
+                    end=end,
+                    char_start=char_offsets[i],
+                    char_end=char_offsets[i + 1],
+                    first_page=store.page_at(name, start),
+                    last_page=store.page_at(name, max(start, end - 1)),
+                )
+        return cls(store, found)
+
+    def __contains__(self, ref):
+        return normalize_question_id(ref) in self._spans
+
+    def __len__(self):
+        return len(self._spans)
+
+    def get(self, ref):
+        """:class:`QuestionSpan` da questão (aceita ``"Q23"``, ``"23"``, ``"D3"``...) ou ``None``"""
+        return self._spans.get(normalize_question_id(ref))
+
+    def view(self, ref):
+        """``memoryview`` com o texto da questão, sem cópia"""
+        span = self.get(ref)
+        if span is None:
+            raise KeyError(ref)
+        return self._store.view(span.start, span.end)
+
+    def text(self, ref):
+        """Texto exato da questão"""
+        return str(self.view(ref), "utf-8").strip()
+
+    def statement(self, ref):
+        """Texto da questão com espaços compactados e sem marcadores de página"""
+        return _squash(self.text(ref))
+
+    def ids(self, kind=None):
+        """Ids indexados (objetivas em ordem numérica, depois discursivas)"""
+        spans = [s for s in self._spans.values() if kind is None or s.kind == kind]
+        spans.sort(key=lambda s: (s.kind == "discursiva", s.number))
+        return [s.id for s in spans]
+
+    def missing(self):
+        """Questões esperadas na prova que não foram encontradas no texto"""
+        expected = [question_id(n) for n in range(1, NUM_OBJECTIVE + 1)]
+        expected += [question_id(n, discursive=True) for n in range(1, NUM_DISCURSIVE + 1)]
+        return [qid for qid in expected if qid not in self._spans]
+
+
+
+@dataclass(frozen=True)
+class AnswerKeyItem:
+    """Linha do gabarito oficial das questões objetivas"""
+    number: int
+    answer: str  # "A" a "E"; vazio quando anulada
+    annulled: bool
+
+    @property
+    def label(self):
+        return "Anulada" if self.annulled else self.answer
+
+
+# "12 C", "7 ANULADA" ou "7 *" na tabela ITEM / GABARITO
+_ANSWER_KEY_ROW = re.compile(r"(?<!\d)(\d{1,2})\s+([A-E]|ANULAD[AO]|\*)(?![A-Za-zÀ-ú])")
+
+
+class AnswerKey:
+    """Gabarito das questões objetivas indexado pelo número da questão"""
+
+    def __init__(self, items):
+        self._items = items
+
+    @classmethod
+    def parse(cls, text):
+        """Lê a tabela "ITEM GABARITO" do texto extraído de ``2017 - BCC - gb.pdf``"""
+        header = re.search(r"ITEM\s+GABARITO", text)
+        if header is not None:
+            text = text[header.end():]
+        items = {}
+        for match in _ANSWER_KEY_ROW.finditer(text):
+            number = int(match.group(1))
+            if not 1 <= number <= NUM_OBJECTIVE or number in items:
+                continue
+            annulled = match.group(2) not in "ABCDE"
+            items[number] = AnswerKeyItem(
+                number=number,
+                answer="" if annulled else match.group(2),
+                annulled=annulled,
+            )
+        return cls(items)
+
+    @classmethod
+    def from_store(cls, store, document):
+        """Monta o gabarito a partir do documento já carregado no :class:`PageStore`"""
+        if document not in store.documents:
+            return cls({})
+        return cls.parse(str(store.document_view(document), "utf-8"))
+
+    def get(self, ref):
+        """:class:`AnswerKeyItem` da questão (número ou id como ``"Q12"``) ou ``None``"""
+        if isinstance(ref, int):
+            return self._items.get(ref)
+        qid = normalize_question_id(ref)
+        if qid is None or not qid.startswith("Q"):
+            return None
+        return self._items.get(int(qid[1:]))
+
+    def __iter__(self):
+        return iter(sorted(self._items.values(), key=lambda item: item.number))
+
+    def __len__(self):
+        return len(self._items)
+
+
+_ANSWER_KEY_INTENT = re.compile(r"\b(resposta|gabarito|alternativa|correta|certa|letra)\b", re.IGNORECASE)
+# Pedidos de explicação continuam indo para o modelo
+_NEEDS_ANALYSIS = re.compile(r"\b(por\s*qu[eê]|explique|explica|justifi|analise|comente|compare|resolv)", re.IGNORECASE)
+
+
+def needs_analysis(prompt):
+    """Indica se a pergunta pede explicação/análise (e deve seguir para o modelo)"""
+    return _NEEDS_ANALYSIS.search(prompt) is not None
+
+
+def answer_key_reply(prompt, answer_key):
+    """Resposta direta do gabarito para perguntas como "qual a resposta da questão 12?".
+
+    Retorna ``None`` quando a pergunta não é uma consulta simples ao gabarito
+    (nesse caso ela segue para o modelo).
+    """
+    if not _ANSWER_KEY_INTENT.search(prompt) or needs_analysis(prompt):
+        return None
+    refs = find_question_refs(prompt)
+    # Discursivas não estão no gabarito: a pergunta inteira segue para o modelo, com o padrão de resposta
+    if any(not qid.startswith("Q") for qid in refs):
+        return None
+    items = [answer_key.get(qid) for qid in refs]
+    if not items or None in items:
+        return None
+    lines = []
+    for item in items:
+        if item.annulled:
+            lines.append(f"- **Questão {item.number:02d}:** anulada")
+        else:
+            lines.append(f"- **Questão {item.number:02d}:** alternativa **{item.answer}**")
+    return "**Gabarito oficial (definitivo):**\n\n" + "\n".join(lines)
+
+
+@dataclass(frozen=True)
+class Rubric:
+    """Padrão de resposta de uma questão discursiva"""
+    id: str
+    statement: str  # enunciado, quando presente no documento
+    expected_answer: str
+    criteria: tuple  # itens/aspectos que a resposta deve conter
+    points: tuple  # ((item, pontos), ...), ex.: (("a", 3.0), ("b", 7.0))
+
+    @property
+    def total_points(self):
+        return sum(value for _, value in self.points)
+
+    def to_markdown(self, include_statement=False):
+        """Versão compacta para exibir no chat ou enviar como contexto ao modelo"""
+        lines = [f"**Padrão de resposta — Questão Discursiva {self.id[1:].zfill(2)}**"]
+        if len(self.points) > 1:
+            breakdown = ", ".join(f"item {item}) {_format_points(value)}" for item, value in self.points)
+            lines.append(f"*Pontuação:* {breakdown} (total {_format_points(self.total_points)})")
+        elif self.points:
+            lines.append(f"*Pontuação:* {_format_points(self.total_points)}")
+        if include_statement and self.statement:
+            lines.append(f"*Enunciado:* {self.statement}")
+        if self.criteria:
+            lines.append("*Critérios de correção:*")
+            lines.extend(f"- {criterion}" for criterion in self.criteria)
+        else:
+            lines.append(self.expected_answer)
+        return "\n".join(lines)
+
+
+def _format_points(value):
+    return f"{value:.1f}".replace(".", ",") + " pontos"
+
+
+_PAGE_MARKER = re.compile(r"\[Página \d+\]|--- DOCUMENTO:[^\n]*---")
+_DISCURSIVE_HEADING = re.compile(r"QUEST[ÃA]O\s+DISCURSIVA\s+(\d{1,2})")
+_RUBRIC_HEADING = re.compile(r"PADR[ÃA]O\s+DE\s+RESPOSTA(?:\s*[-–]\s*QUEST[ÃA]O\s+(\d{1,2}))?")
+_ITEM_POINTS = re.compile(r"(?:\b([a-e])\)\s[^()]*?)?\(valor:\s*(\d+(?:,\d+)?)\s*pontos?\)", re.IGNORECASE)
+# Marcadores de itens de correção: "a)", "•", "●", "" (símbolo perdido na extração) ou "1."
+_CRITERION_MARKER = re.compile(r"(?:^|\s)(?:[a-e]\)|[•●]|\d{1,2}\.)\s+")
+
+
+def _squash(text):
+    return re.sub(r"\s+", " ", _PAGE_MARKER.sub(" ", text)).strip()
+
+
+def _split_criteria(answer):
+    markers = list(_CRITERION_MARKER.finditer(answer))
+    if len(markers) < 2:
+        return ()
+    criteria = []
+    intro = answer[:markers[0].start()].strip()
+    for i, marker in enumerate(markers):
+        end = markers[i + 1].start() if i + 1 < len(markers) else len(answer)
+        item = answer[marker.start():end].strip()
+        if item:
+            criteria.append(item)
+    if intro:
+        criteria.insert(0, intro)
+    return tuple(criteria)
+
+
+class RubricStore:
+    """Padrões de resposta D1–D5 indexados pelo id da questão discursiva"""
+
+    def __init__(self, rubrics):
+        self._rubrics = rubrics
+
+    @classmethod
+    def parse(cls, text):
+        """Lê enunciados, padrões de resposta e pontuação do texto extraído.
+
+        Aceita o formato de ``2017 - Padroes de Resposta.pdf`` ("QUESTÃO
+        DISCURSIVA NN" ... "PADRÃO DE RESPOSTA - QUESTÃO NN") e o de
+        ``2017 - BCC - PV.pdf``, em que os padrões aparecem sem número e em
+        ordem (D1 a D5).
+        """
+        text = _squash(text)
+        statements = {}
+        headings = list(_DISCURSIVE_HEADING.finditer(text))
+        rubric_headings = list(_RUBRIC_HEADING.finditer(text))
+
+        boundaries = sorted(
+            [(m.start(), "statement", m) for m in headings]
+            + [(m.start(), "rubric", m) for m in rubric_headings]
+        )
+        rubrics = {}
+        sequence = 0
+        for i, (start, kind, match) in enumerate(boundaries):
+            end = boundaries[i + 1][0] if i + 1 < len(boundaries) else len(text)
+            body = text[match.end():end].strip()
+            if kind == "statement":
+                statements[question_id(match.group(1), discursive=True)] = body
+                continue
+            sequence += 1
+            if match.group(1):
+                qid = question_id(match.group(1), discursive=True)
+            else:
+                qid = question_id(sequence, discursive=True)
+            if qid in rubrics or int(qid[1:]) > NUM_DISCURSIVE:
+                continue
+            statement = statements.get(qid, "")
+            points = tuple(
+                ((m.group(1) or "").lower(), float(m.group(2).replace(",", ".")))
+                for m in _ITEM_POINTS.finditer(statement)
+            )
+            rubrics[qid] = Rubric(
+                id=qid,
+                statement=statement,
+                expected_answer=body,
+                criteria=_split_criteria(body),
+                points=points,
+            )
+        return cls(rubrics)
+
+    @classmethod
+    def from_store(cls, store, documents):
+        """Monta o store a partir dos documentos carregados, em ordem de preferência"""
+        rubrics = {}
+        for name in documents:
+            if name not in store.documents:
+                continue
+            for qid, rubric in cls.parse(str(store.document_view(name), "utf-8"))._rubrics.items():
+                rubrics.setdefault(qid, rubric)
+        return cls(rubrics)
+
+    def get(self, ref):
+        """:class:`Rubric` da questão discursiva (``"D2"``, ``"discursiva 2"``...) ou ``None``"""
+        qid = normalize_question_id(ref)
+        return self._rubrics.get(qid) if qid else None
+
+    def __contains__(self, ref):
+        return self.get(ref) is not None
+
+    def __iter__(self):
+        return iter(sorted(self._rubrics.values(), key=lambda r: int(r.id[1:])))
+
+    def __len__(self):
+        return len(self._rubrics)
+
+
+_RUBRIC_INTENT = re.compile(
+    r"padr[ãa]o\s+de\s+resposta|padr[õo]es\s+de\s+resposta|crit[ée]rios?|corre[çc][ãa]o"
+    r"|pontua[çc]|resposta\s+esperada|gabarito",
+    re.IGNORECASE,
+)
+
+
+def mentions_rubric(prompt):
+    """Indica se a pergunta trata do padrão de resposta/critérios de correção"""
+    return _RUBRIC_INTENT.search(prompt) is not None
+
+
+def rubric_reply(prompt, rubrics):
+    """Padrão de resposta de D1–D5 para perguntas como "qual o padrão de resposta da D2?".
+
+    Assim como :func:`answer_key_reply`, retorna ``None`` quando a pergunta
+    pede análise e deve seguir para o modelo.
+    """
+    if not mentions_rubric(prompt) or needs_analysis(prompt):
+        return None
+    refs = find_question_refs(prompt)
+    # Objetivas não têm padrão de resposta: como em answer_key_reply, a pergunta mista vai ao modelo
+    if any(not qid.startswith("D") for qid in refs):
+        return None
+    found = [rubrics.get(qid) for qid in refs]
+    if not found or None in found:
+        return None
+    return "\n\n".join(rubric.to_markdown() for rubric in found)
@@ -0,0 +1,126 @@
+"""Servidor local compatível com ``/v1/chat/completions`` (OpenAI/DeepSeek), com atrasos injetados.
+
+Serve para testar o streaming, o cancelamento e o failover sem gastar com
+as APIs. Exemplo com um primário lento e um secundário rápido::
+
+    python fake_openai_server.py --port 8001 --ttft-ms 4000 &
+    python fake_openai_server.py --port 8002 --ttft-ms 300 &
+    ENADE_OPENAI_BASE=http://127.0.0.1:8001/v1 ENADE_DEEPSEEK_BASE=http://127.0.0.1:8002/v1 \\
+        streamlit run streamlit_app_claude.py
+
+Qualquer chave de API é aceita. ``--fail-rate`` devolve 503 numa fração dos
+pedidos e ``--stall-rate`` segura o primeiro token por ``--stall-ms``.
+"""
+import argparse
+import json
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_WORDS = ("A questão avalia estruturas de dados, com foco em árvores binárias de busca "
+          "e na complexidade das operações de inserção e remoção.").split()
+
+
+def chunk_event(model, content=None, finish_reason=None, usage=None):
+    event = {
+        "id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+        "choices": [] if usage else [{"index": 0, "delta": {"content": content} if content is not None else {},
+                                      "finish_reason": finish_reason}],
+    }
+    if usage:
+        event["usage"] = usage
+    return b"data: " + json.dumps(event, ensure_ascii=False).encode("utf-8") + b"\n\n"
+
+
+def make_handler(args):
+    rng = random.Random(args.seed)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *values):
+            if args.verbose:
+                super().log_message(format, *values)
+
+        def handle(self):
+            try:
+                super().handle()
+            except (BrokenPipeError, ConnectionResetError):
+                # Cliente derrubou a conexão keep-alive (cancelamento, hedge perdido)
+                pass
+
+        def _send_chunk(self, data):
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.flush()
+
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            model = request.get("model", "fake")
+            if rng.random() < args.fail_rate:
+                body = json.dumps({"error": {"message": "servidor falso indisponível"}}).encode("utf-8")
+                self.send_response(503)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+            tokens = min(args.tokens, request.get("max_tokens") or args.tokens)
+            words = [(" " if i else "") + _WORDS[i % len(_WORDS)] for i in range(tokens)]
+            first_token = args.ttft_ms + (args.stall_ms if rng.random() < args.stall_rate else 0)
+            if not request.get("stream"):
+                time.sleep((first_token + args.token_ms * tokens) / 1000)
+                body = json.dumps({"choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(words)},
+                                                "finish_reason": "stop"}]}, ensure_ascii=False).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            try:
+                time.sleep(first_token / 1000)
+                for word in words:
+                    self._send_chunk(chunk_event(model, word))
+                    time.sleep(args.token_ms / 1000)
+                self._send_chunk(chunk_event(model, finish_reason="length" if tokens < args.tokens else "stop"))
+                usage = {"prompt_tokens": 100, "completion_tokens": tokens, "total_tokens": 100 + tokens}
+                self._send_chunk(chunk_event(model, usage=usage) + b"data: [DONE]\n\n")
+                self.wfile.write(b"0\r\n\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                # Cliente cancelou: é exatamente o que os testes de cancelamento querem ver
+                if args.verbose:
+                    print(f"cliente desconectou ({model})")
+
+    return Handler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor falso compatível com a API de chat da OpenAI")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--ttft-ms", type=float, default=300, help="atraso até o primeiro token")
+    parser.add_argument("--token-ms", type=float, default=20, help="intervalo entre tokens")
+    parser.add_argument("--tokens", type=int, default=60, help="tokens por resposta")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fração de pedidos respondidos com 503")
+    parser.add_argument("--stall-rate", type=float, default=0.0, help="fração de pedidos com atraso extra")
+    parser.add_argument("--stall-ms", type=float, default=5000)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(args))
+    server.daemon_threads = True
+    print(f"Servidor falso em http://{args.host}:{server.server_port}/v1 "
+          f"(1º token {args.ttft_ms:.0f} ms, {args.token_ms:.0f} ms/token)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
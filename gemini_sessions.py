@@ -0,0 +1,134 @@
+"""Sessões de chat do Gemini que mandam só o turno novo.
+
+O ``streamlit_app.py`` recriava o chat a cada rerun e enviava, a cada
+pergunta, a string ``st.session_state.message`` com toda a transcrição até
+ali; como o histórico do chat também ia junto, os tokens de entrada
+cresciam de forma quadrática ao longo da conversa. :class:`ChatSession`
+fica guardada na sessão (uma por modalidade e arquivo) e repassa ao chat
+apenas a mensagem nova.
+
+O histórico enviado é limitado: depois de mostrar a resposta, o app chama
+:meth:`ChatSession.compact`; se os turnos passam de ``max_turns`` ou de
+``max_tokens`` (estimados), os mais antigos viram um resumo
+acumulado, gerado pelo próprio modelo ou, se a chamada falhar, pelo resumo
+extrativo de :mod:`conversation_memory`, e o chat é recriado com o
+contexto fixo (arquivos), o resumo e os turnos recentes. Os tokens de cada
+turno vêm do ``usage_metadata`` da resposta.
+"""
+import os
+from dataclasses import dataclass
+
+from google.genai import types
+
+from context_packer import count_tokens
+from conversation_memory import extractive_summary
+
+HISTORY_TURNS = int(os.environ.get("ENADE_GEMINI_HISTORY_TURNS", "8"))
+HISTORY_TOKENS = int(os.environ.get("ENADE_GEMINI_HISTORY_TOKENS", "4000"))
+SUMMARY_TOKENS = 400
+
+SUMMARY_INSTRUCTIONS = (
+    "Update the running summary of a conversation between a user and an assistant. "
+    "Keep facts, names, numbers and open questions; drop greetings and repetition. "
+    "Answer with the updated summary only, at most 200 words."
+)
+
+
+@dataclass(frozen=True)
+class TurnUsage:
+    prompt_tokens: int = None
+    reply_tokens: int = None
+    cached_tokens: int = None
+    total_tokens: int = None
+
+
+def _text(content):
+    return "".join(part.text for part in content.parts or () if getattr(part, "text", None))
+
+
+class ChatSession:
+    """Chat do Gemini com histórico limitado; uma instância por sessão e modalidade"""
+
+    def __init__(self, client, model, config=None, context=(), send=None,
+                 max_turns=HISTORY_TURNS, max_tokens=HISTORY_TOKENS):
+        self.client = client
+        self.model = model
+        self.config = config
+        self.context = list(context)
+        self.max_turns = max_turns
+        self.max_tokens = max_tokens
+        self.summary = ""
+        self.summarized = 0  # turnos já incorporados ao resumo
+        self.usage = []
+        self._send = send or (lambda chat, message: chat.send_message(message))
+        self._chat = self._create([])
+
+    def _create(self, turns):
+        history = list(self.context)
+        if self.summary:
+            history.append(types.Content(role="user", parts=[
+                types.Part.from_text(text=f"Summary of the conversation so far:\n{self.summary}")
+            ]))
+        return self.client.chats.create(model=self.model, config=self.config, history=history + list(turns))
+
+    def _turns(self):
+        """Conteúdos da conversa, sem o contexto fixo e o resumo"""
+        prefix = len(self.context) + (1 if self.summary else 0)
+        return self._chat.get_history(curated=True)[prefix:]
+
+    def send(self, message):
+        """Manda só ``message``; o histórico recente já está no chat"""
+        response = self._send(self._chat, message)
+        usage = response.usage_metadata
+        self.usage.append(TurnUsage(
+            prompt_tokens=getattr(usage, "prompt_token_count", None),
+            reply_tokens=getattr(usage, "candidates_token_count", None),
+            cached_tokens=getattr(usage, "cached_content_token_count", None),
+            total_tokens=getattr(usage, "total_token_count", None),
+        ))
+        return response
+
+    def rebase(self, context):
+        """Troca o contexto fixo (arquivo reenviado com nova URI) mantendo a conversa"""
+        turns = self._turns()
+        self.context = list(context)
+        self._chat = self._create(turns)
+
+    def compact(self):
+        """Resume os turnos antigos se a janela passou do limite.
+
+        Fica fora de :meth:`send` para que a chamada extra do resumo não
+        atrase a exibição da resposta; devolve ``True`` se houve resumo.
+        """
+        turns = self._turns()
+        if (len(turns) // 2 <= self.max_turns
+                and count_tokens("\n".join(_text(c) for c in turns)) <= self.max_tokens):
+            return False
+        # Fica a metade mais recente da janela (ao menos o último turno), em pares pergunta/resposta
+        keep = 2 * max(1, self.max_turns // 2)
+        while keep > 2 and count_tokens("\n".join(_text(c) for c in turns[-keep:])) > self.max_tokens // 2:
+            keep -= 2
+        rolled, recent = turns[:-keep], turns[-keep:]
+        if not rolled:
+            return False
+        self.summary = self._summarize(rolled)
+        self.summarized += len(rolled) // 2
+        self._chat = self._create(recent)
+        return True
+
+    def _summarize(self, contents):
+        turns = [("assistant" if c.role == "model" else "user", _text(c)) for c in contents]
+        transcript = "\n\n".join(f"{role}: {text}" for role, text in turns)
+        try:
+            # Chat avulso, só para passar pelo mesmo ``send`` (e pelas métricas) das perguntas
+            chat = self.client.chats.create(model=self.model, config=types.GenerateContentConfig(
+                system_instruction=SUMMARY_INSTRUCTIONS, max_output_tokens=SUMMARY_TOKENS))
+            response = self._send(chat, f"PREVIOUS SUMMARY:\n{self.summary or '(empty)'}\n\nNEW TURNS:\n{transcript}")
+            summary = response.text
+        except Exception:
+            summary = None
+        return summary or extractive_summary(self.summary, turns, SUMMARY_TOKENS)
+
+    def history_tokens(self):
+        """Estimativa dos tokens de conversa reenviados a cada turno (sem os arquivos)"""
+        return count_tokens("\n".join([self.summary] + [_text(c) for c in self._turns()]))
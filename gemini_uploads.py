@@ -0,0 +1,165 @@
+"""Registro de uploads para a Files API do Gemini, sem reenviar o mesmo arquivo.
+
+O ``streamlit_app.py`` chamava ``client.files.upload`` a cada rerun com um
+arquivo selecionado, ou seja, a cada mensagem do chat; com áudio e vídeo o
+upload (e o processamento no servidor) dominava o tempo de resposta.
+:class:`UploadRegistry` guarda, por hash do conteúdo, o arquivo remoto já
+enviado e o devolve enquanto ele estiver válido. Perto da expiração do
+provedor (48 h na Files API), o arquivo é reenviado em segundo plano e a
+resposta segue usando o anterior; só um arquivo já expirado (ou prestes a
+expirar) volta a bloquear a mensagem.
+"""
+import hashlib
+import io
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+from google.genai import types
+
+FILE_TTL_SECONDS = 48 * 3600  # validade dos arquivos na Files API, se a resposta não trouxer a data
+REFRESH_MARGIN_SECONDS = float(os.environ.get("ENADE_UPLOAD_REFRESH_MINUTES", "60")) * 60
+EXPIRY_MARGIN_SECONDS = 5 * 60  # abaixo disso o arquivo antigo não é mais usado
+PROCESSING_POLL_SECONDS = 2
+UPLOAD_CONCURRENCY = int(os.environ.get("ENADE_UPLOAD_CONCURRENCY", "4"))
+
+
+def content_key(data):
+    """Chave de um arquivo no registro: sha256 do conteúdo"""
+    return hashlib.sha256(data).hexdigest()
+
+
+@dataclass
+class _Entry:
+    file: object
+    expires_at: float
+    size: int
+    hits: int = 0
+    refreshing: bool = False
+
+
+class UploadRegistry:
+    """Arquivos remotos por sha256 do conteúdo, compartilhados pelas sessões do processo"""
+
+    def __init__(self, client, refresh_margin=REFRESH_MARGIN_SECONDS, expiry_margin=EXPIRY_MARGIN_SECONDS,
+                 poll_seconds=PROCESSING_POLL_SECONDS, clock=time.monotonic):
+        self.client = client
+        self.refresh_margin = refresh_margin
+        self.expiry_margin = expiry_margin
+        self.poll_seconds = poll_seconds
+        self._clock = clock
+        self._entries = {}
+        self._key_locks = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.bytes_saved = 0
+
+    def upload(self, data, mime_type, display_name=None):
+        """Arquivo remoto (``ACTIVE``) com o conteúdo ``data``, enviando só se preciso"""
+        key = content_key(data)
+        cached = self._lookup(key, data)
+        if cached is not None:
+            return cached
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        # Duas sessões com o mesmo arquivo: a segunda espera o upload da primeira
+        with key_lock:
+            cached = self._lookup(key, data)
+            if cached is not None:
+                return cached
+            file, expires_at = self._send(data, mime_type, display_name)
+            with self._lock:
+                self.misses += 1
+                self._entries[key] = _Entry(file, expires_at, len(data))
+                self._evict_expired()
+            return file
+
+    def upload_many(self, items, max_workers=UPLOAD_CONCURRENCY):
+        """:meth:`upload` de vários ``(data, mime_type, display_name)`` em paralelo, na ordem recebida.
+
+        Cada arquivo tem sua própria entrada, então acrescentar um arquivo a
+        um conjunto já enviado só sobe o arquivo novo.
+        """
+        items = list(items)
+        if len(items) <= 1:
+            return [self.upload(*item) for item in items]
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as pool:
+            return list(pool.map(lambda item: self.upload(*item), items))
+
+    def _lookup(self, key, data):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            remaining = entry.expires_at - self._clock()
+            if remaining <= self.expiry_margin:
+                return None
+            entry.hits += 1
+            self.hits += 1
+            self.bytes_saved += entry.size
+            if remaining <= self.refresh_margin and not entry.refreshing:
+                entry.refreshing = True
+                threading.Thread(target=self._refresh, args=(key, entry, data), daemon=True).start()
+            return entry.file
+
+    def _refresh(self, key, entry, data):
+        """Reenvia em segundo plano um arquivo perto de expirar; o antigo vale até a troca"""
+        try:
+            file, expires_at = self._send(data, entry.file.mime_type, getattr(entry.file, "display_name", None))
+        except Exception:
+            # Tenta de novo no próximo acerto; até expirar, o arquivo antigo continua servindo
+            with self._lock:
+                entry.refreshing = False
+            return
+        with self._lock:
+            self.refreshes += 1
+            self._entries[key] = _Entry(file, expires_at, len(data), hits=entry.hits)
+
+    def _send(self, data, mime_type, display_name):
+        """Upload a partir da memória e espera o processamento; devolve ``(arquivo, expira_em)``"""
+        file = self.client.files.upload(
+            file=io.BytesIO(data),
+            config=types.UploadFileConfig(mime_type=mime_type, display_name=display_name),
+        )
+        while file.state == "PROCESSING":
+            time.sleep(self.poll_seconds)
+            file = self.client.files.get(name=file.name)
+        if file.state == "FAILED":
+            raise ValueError(file.state)
+        return file, self._clock() + self._ttl(file)
+
+    @staticmethod
+    def _ttl(file):
+        expiration = getattr(file, "expiration_time", None)
+        if expiration is None:
+            return FILE_TTL_SECONDS
+        if expiration.tzinfo is None:
+            expiration = expiration.replace(tzinfo=timezone.utc)
+        return (expiration - datetime.now(timezone.utc)).total_seconds()
+
+    def _evict_expired(self):
+        now = self._clock()
+        for key in [k for k, e in self._entries.items() if e.expires_at - now <= self.expiry_margin]:
+            del self._entries[key]
+            self._key_locks.pop(key, None)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "files": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "refreshes": self.refreshes,
+                "bytes_saved": self.bytes_saved,
+            }
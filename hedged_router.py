@@ -0,0 +1,257 @@
+"""Pedidos duplicados ("hedged requests") e failover por SLO entre OpenAI e DeepSeek.
+
+O :class:`HedgedRouter` manda a pergunta ao endpoint primário e, se nenhum
+token chegar dentro do prazo de hedge, dispara a mesma pergunta no
+secundário. A resposta que começar primeiro é a que vai para a tela; a outra
+é cancelada e a conexão dela é fechada. Erros antes do primeiro token passam
+direto para o próximo endpoint.
+
+Para cada endpoint (provedor/modelo) o roteador guarda o tempo até o
+primeiro token das últimas chamadas. O prazo de hedge segue o p95 do
+primário (ou ``ENADE_HEDGE_AFTER_MS``, se definido), e um endpoint cujo p95
+passa do SLO (``ENADE_SLO_TTFT_MS``), ou que falha ou perde a corrida para o
+outro várias vezes seguidas, é rebaixado por ``ENADE_DEMOTE_SECONDS``:
+enquanto isso, o outro vira o primário.
+
+Para testar sem as APIs, suba dois ``fake_openai_server.py`` com atrasos
+diferentes e aponte ``ENADE_OPENAI_BASE``/``ENADE_DEEPSEEK_BASE`` para eles;
+``tests/test_hedged_router.py`` faz isso com hedge, failover e rebaixamento.
+"""
+import os
+import queue
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+
+import requests
+
+from cancellation import ABANDONED, HEDGE_LOST, CancelToken
+from llm_client import LLMClient, chat_url
+from llm_metrics import CallTimer, percentile
+from sse import ChatStream
+
+HEDGE_AFTER_MS = float(os.environ.get("ENADE_HEDGE_AFTER_MS", "0"))  # 0 = automático (p95 do primário)
+HEDGE_DEFAULT_MS = 2500  # sem histórico suficiente
+HEDGE_MIN_MS = 500
+HEDGE_MAX_MS = 8000
+SLO_TTFT_MS = float(os.environ.get("ENADE_SLO_TTFT_MS", "6000"))
+DEMOTE_SECONDS = float(os.environ.get("ENADE_DEMOTE_SECONDS", "120"))
+MAX_STRIKES = 3  # falhas ou corridas perdidas seguidas
+MIN_SAMPLES = 5
+WINDOW = 50
+
+_POLL = 0.05
+
+
+@dataclass(frozen=True)
+class Endpoint:
+    provider: str
+    model: str
+    api_key: str = field(repr=False, compare=False)
+
+    @property
+    def name(self):
+        return f"{self.provider}/{self.model}"
+
+
+class _Health:
+    def __init__(self):
+        self.ttft_ms = deque(maxlen=WINDOW)
+        self.strikes = 0
+        self.demoted_until = 0.0
+
+
+class HedgedRouter:
+    """Estatísticas por endpoint compartilhadas pelas sessões; uma chamada por :meth:`stream`"""
+
+    def __init__(self, client=None, metrics=None, hedge_after_ms=HEDGE_AFTER_MS, slo_ttft_ms=SLO_TTFT_MS,
+                 demote_seconds=DEMOTE_SECONDS, clock=time.monotonic):
+        self.client = client or LLMClient()
+        self.metrics = metrics
+        self.hedge_after_ms = hedge_after_ms
+        self.slo_ttft_ms = slo_ttft_ms
+        self.demote_seconds = demote_seconds
+        self._clock = clock
+        self._health = {}
+        self._lock = threading.Lock()
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def _state(self, endpoint):
+        return self._health.setdefault(endpoint.name, _Health())
+
+    def demoted(self, endpoint):
+        with self._lock:
+            return self._state(endpoint).demoted_until > self._clock()
+
+    def order(self, endpoints):
+        """Endpoints saudáveis primeiro, na ordem de preferência; rebaixados no fim"""
+        return sorted(endpoints, key=self.demoted)
+
+    def hedge_delay_ms(self, endpoint):
+        if self.hedge_after_ms:
+            return self.hedge_after_ms
+        with self._lock:
+            samples = sorted(self._state(endpoint).ttft_ms)
+        if len(samples) < MIN_SAMPLES:
+            return HEDGE_DEFAULT_MS
+        return min(HEDGE_MAX_MS, max(HEDGE_MIN_MS, percentile(samples, 95)))
+
+    def observe(self, endpoint, ttft_ms=None, failed=False, lost=False):
+        """Registra o 1º token, uma falha ou uma corrida perdida; rebaixa o endpoint degradado.
+
+        Na corrida perdida, ``ttft_ms`` é só um limite inferior (o tempo até o
+        cancelamento), então ela conta também como ponto contra o endpoint.
+        """
+        with self._lock:
+            state = self._state(endpoint)
+            if ttft_ms is not None:
+                state.ttft_ms.append(ttft_ms)
+            state.strikes = state.strikes + 1 if failed or lost else 0
+            samples = sorted(state.ttft_ms)
+            demote = (state.strikes >= MAX_STRIKES
+                      or len(samples) >= MIN_SAMPLES and percentile(samples, 95) > self.slo_ttft_ms)
+            if demote:
+                state.demoted_until = self._clock() + self.demote_seconds
+                # Volta com histórico limpo: a primeira chamada depois do prazo decide de novo
+                state.ttft_ms.clear()
+                state.strikes = 0
+
+    def status(self):
+        """``{endpoint: {p50, p95, amostras, rebaixado}}`` para a barra lateral"""
+        now = self._clock()
+        with self._lock:
+            items = [(name, sorted(state.ttft_ms), state.demoted_until) for name, state in self._health.items()]
+        return {
+            name: {"p50": percentile(samples, 50), "p95": percentile(samples, 95),
+                   "samples": len(samples), "demoted": until > now}
+            for name, samples, until in items
+        }
+
+    def _attempt(self, index, endpoint, payload, events, token, details):
+        """Lê o stream de um endpoint numa thread, mandando ``(índice, tipo, valor)`` para ``events``.
+
+        Antes do ``"done"``, ``details`` recebe finish_reason, usage e métricas da chamada.
+        """
+        timer = CallTimer(endpoint.provider, endpoint.model)
+        stream = ChatStream()
+        registro = None
+        headers = {"Authorization": f"Bearer {endpoint.api_key}", "Content-Type": "application/json"}
+        try:
+            with self.client.stream(chat_url(endpoint.provider), headers, dict(payload, model=endpoint.model)) as response:
+                # Perdedor esperando bytes: fechar a resposta desbloqueia a leitura
+                token.on_cancel(response.abort)
+                timer.response(response.timings)
+                if response.status_code != 200:
+                    raise requests.HTTPError(f"{endpoint.name} ({response.status_code}): {response.text[:300]}")
+                for content in stream.iter_content(response.iter_bytes()):
+                    if token.cancelled:
+                        return
+                    timer.token()
+                    events.put((index, "token", content))
+                uso = stream.usage or {}
+                registro = timer.finish(stream.done, prompt_tokens=uso.get("prompt_tokens"),
+                                        completion_tokens=uso.get("completion_tokens", stream.events),
+                                        finish_reason=stream.finish_reason)
+                details.update(finish_reason=stream.finish_reason, usage=stream.usage,
+                               malformed=stream.malformed, metrics=registro)
+                events.put((index, "done", stream.done))
+        except Exception as e:
+            if not token.cancelled:
+                events.put((index, "error", e))
+        finally:
+            if registro is None:
+                registro = timer.finish(False, completion_tokens=stream.events or None, cancelled=token.reason)
+            if self.metrics is not None:
+                self.metrics.record(registro)
+
+    def stream(self, endpoints, messages, temperature=0.5, max_tokens=2000, info=None, cancel=None):
+        """Gerador de pedaços da resposta, como ``gpt4_chat``; retorna ``True`` no ``[DONE]``.
+
+        ``info`` (dict) recebe o endpoint vencedor, se houve hedge e, no fim, o
+        finish_reason, o usage e as métricas da resposta vencedora. Se todos os
+        endpoints falharem antes do primeiro token, o erro do primário é levantado.
+        """
+        ordered = self.order(endpoints)
+        payload = {"messages": messages, "temperature": temperature, "max_tokens": max_tokens,
+                   "stream": True, "stream_options": {"include_usage": True}}
+        events = queue.Queue()
+        tokens, started, errors, details = [], [], {}, []
+
+        def start(index):
+            token = CancelToken()
+            tokens.append(token)
+            started.append(self._clock())
+            details.append({})
+            threading.Thread(target=self._attempt, args=(index, ordered[index], payload, events, token, details[index]),
+                             daemon=True).start()
+
+        def finish(index, completed):
+            if info is not None:
+                info.update(details[index])
+            return completed
+
+        def cancel_others(winner):
+            for index, token in enumerate(tokens):
+                # Quem já falhou levou o ponto em observe(failed=True); não conta de novo como derrota
+                if index != winner and index not in errors and not token.cancelled:
+                    token.cancel(HEDGE_LOST)
+                    # O perdedor não chegou ao 1º token: o tempo até aqui é um limite inferior do TTFT
+                    self.observe(ordered[index], (self._clock() - started[index]) * 1000, lost=True)
+
+        if cancel is not None:
+            cancel.on_cancel(lambda: [token.cancel(cancel.reason) for token in tokens])
+        start(0)
+        hedge_at = self._clock() + self.hedge_delay_ms(ordered[0]) / 1000
+        winner = None
+        try:
+            while winner is None:
+                if cancel is not None and cancel.cancelled:
+                    return None
+                if len(started) < len(ordered) and self._clock() >= hedge_at:
+                    self.hedges += 1
+                    start(len(started))
+                try:
+                    index, kind, value = events.get(timeout=_POLL)
+                except queue.Empty:
+                    continue
+                if kind == "error":
+                    errors[index] = value
+                    self.observe(ordered[index], failed=True)
+                    if len(errors) == len(started):
+                        if len(started) == len(ordered):
+                            raise errors[0] if 0 in errors else value
+                        # Failover: o próximo endpoint sai na hora, sem esperar o prazo de hedge
+                        start(len(started))
+                    continue
+                winner = index
+                self.observe(ordered[index], (self._clock() - started[index]) * 1000)
+                cancel_others(index)
+                if index > 0:
+                    self.hedge_wins += 1
+                if info is not None:
+                    info.update(endpoint=ordered[index].name, hedged=len(started) > 1)
+                if kind == "done":
+                    return finish(index, value)
+                yield value
+
+            while True:
+                try:
+                    index, kind, value = events.get(timeout=_POLL)
+                except queue.Empty:
+                    if cancel is not None and cancel.cancelled:
+                        return None
+                    continue
+                if index != winner:
+                    continue
+                if kind == "token":
+                    yield value
+                elif kind == "done":
+                    return finish(index, value)
+                else:
+                    raise value
+        finally:
+            # Fim normal, erro ou GeneratorExit: nenhuma tentativa fica lendo em segundo plano
+            for token in tokens:
+                token.cancel(ABANDONED)
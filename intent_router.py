@@ -0,0 +1,196 @@
+"""Roteamento das perguntas do chat antes da chamada ao modelo.
+
+Consultas que só precisam das estruturas já extraídas dos PDFs (enunciado de
+uma questão, gabarito, padrão de resposta, contagens e listagens) são
+respondidas na hora a partir dos índices de :mod:`exam_index`. Apenas
+perguntas abertas, que pedem análise, seguem para o LLM.
+"""
+import re
+from dataclasses import dataclass
+
+from exam_index import (
+    NUM_DISCURSIVE,
+    NUM_OBJECTIVE,
+    answer_key_reply,
+    find_question_refs,
+    needs_analysis,
+    rubric_reply,
+)
+from retrieval import tokenize
+
+# Estrutura do caderno do ENADE: formação geral (objetivas 1–8 e discursivas 1–2)
+# e componente específico (objetivas 9–35 e discursivas 3–5)
+GENERAL_OBJECTIVE = range(1, 9)
+GENERAL_DISCURSIVE = range(1, 3)
+
+_STATEMENT_INTENT = re.compile(
+    r"\benunciado|\b(mostr|exib|transcrev|apresent|cit)[ae]\b|\btexto\s+(completo\s+)?d[ao]|\bleia\b|\bver\s+a\b"
+    r"|\bo\s+que\s+diz\b",
+    re.IGNORECASE,
+)
+_COUNT_INTENT = re.compile(r"\bquant[ao]s\b|\bn[úu]mero\s+de\b|\btotal\s+de\b", re.IGNORECASE)
+_LIST_INTENT = re.compile(r"\b(list[ea]r?|enumer[ea]r?|rela[çc][ãa]o\s+d[ae]s)\b|\bquais\s+(s[ãa]o\s+)?as\s+quest", re.IGNORECASE)
+_QUESTIONS = re.compile(r"\bquest[õo]es\b", re.IGNORECASE)
+_ANNULLED = re.compile(r"\banulad[ao]s?\b", re.IGNORECASE)
+_DISCURSIVE = re.compile(r"\bdiscursivas?\b", re.IGNORECASE)
+_OBJECTIVE = re.compile(r"\bobjetivas?\b|m[úu]ltipla\s+escolha", re.IGNORECASE)
+_FULL_ANSWER_KEY = re.compile(r"\bgabarito\b", re.IGNORECASE)
+
+# Termos que aparecem em contagens e listagens genéricas; qualquer outro termo
+# ("quantas questões de algoritmos?") indica um filtro por assunto, que fica com o modelo
+_ROUTING_TERMS = frozenset(tokenize("""
+quantas quantos questões prova provas tem têm possui possuem existem há houve foram total número
+liste listar lista listagem enumere relação quais são todas todos anuladas anulados discursivas
+objetivas múltipla escolha como estão distribuídas distribuição divididas dividida enade computação
+ciência 2017 mostre mostrar exiba gabarito completo oficial definitivo tabela inteiro me dê
+"""))
+
+# Termos das consultas diretas (gabarito, padrão de resposta, enunciado); sobrando
+# qualquer outro ("... e qual o assunto abordado?"), a pergunta tem uma segunda parte
+# que o template deixaria sem resposta, então ela fica com o modelo
+_LOOKUP_TERMS = _ROUTING_TERMS | frozenset(tokenize("""
+resposta respostas correta certa alternativa letra padrão padrões esperada critérios correção pontuação
+enunciado texto transcreva apresente cite leia ver diz objetiva
+"""))
+# Números e referências já extraídos por find_question_refs ("12", "d2", "q7")
+_REF_TERM = re.compile(r"[dq]?\d{1,2}")
+
+_PREVIEW_CHARS = 110
+
+
+@dataclass(frozen=True)
+class Route:
+    """Destino de uma pergunta: resposta pronta (``reply``) ou ``"llm"``"""
+    intent: str  # "gabarito", "padrao", "enunciado", "contagem", "listagem", "anuladas" ou "llm"
+    reply: str = None
+
+    @property
+    def direct(self):
+        return self.reply is not None
+
+
+LLM = Route("llm")
+
+
+def route_query(prompt, questions, answer_key, rubrics):
+    """Classifica a pergunta por regras e, se possível, já monta a resposta.
+
+    ``questions``, ``answer_key`` e ``rubrics`` são o :class:`QuestionIndex`,
+    o :class:`AnswerKey` e o :class:`RubricStore` carregados na inicialização.
+    """
+    if needs_analysis(prompt) or unaccounted_terms(prompt, _LOOKUP_TERMS):
+        return LLM
+    reply = answer_key_reply(prompt, answer_key)
+    if reply is not None:
+        return Route("gabarito", reply)
+    reply = rubric_reply(prompt, rubrics)
+    if reply is not None:
+        return Route("padrao", reply)
+
+    refs = find_question_refs(prompt)
+    if refs and _STATEMENT_INTENT.search(prompt):
+        reply = statement_reply(refs, questions)
+        return Route("enunciado", reply) if reply is not None else LLM
+    if refs or unaccounted_terms(prompt, _ROUTING_TERMS):
+        return LLM
+    if _COUNT_INTENT.search(prompt) and (_QUESTIONS.search(prompt) or _ANNULLED.search(prompt)):
+        return Route("contagem", count_reply(prompt, questions, answer_key))
+    if _ANNULLED.search(prompt):
+        # "quais questões foram anuladas?", "quais foram as anuladas?": o gabarito já sabe
+        return Route("anuladas", annulled_reply(questions, answer_key))
+    if _LIST_INTENT.search(prompt) and (_QUESTIONS.search(prompt) or _ANNULLED.search(prompt)):
+        return Route("listagem", list_reply(prompt, questions, answer_key))
+    if _FULL_ANSWER_KEY.search(prompt) and len(answer_key):
+        return Route("gabarito", answer_key_table(answer_key))
+    return LLM
+
+
+def unaccounted_terms(prompt, known):
+    """Termos da pergunta que não são de ``known`` nem referências a questões"""
+    return {term for term in tokenize(prompt) if term not in known and not _REF_TERM.fullmatch(term)}
+
+
+def _title(span):
+    if span.kind == "discursiva":
+        label = f"Questão Discursiva {span.number}"
+    else:
+        label = f"Questão {span.number:02d}"
+    pages = f"página {span.first_page}" if span.first_page == span.last_page else f"páginas {span.first_page}–{span.last_page}"
+    return f"{label} ({span.document}, {pages})"
+
+
+def statement_reply(refs, questions):
+    """Enunciado das questões citadas, ou ``None`` se alguma não foi indexada"""
+    spans = [questions.get(qid) for qid in refs]
+    if not spans or None in spans:
+        return None
+    return "\n\n".join(f"#### {_title(span)}\n\n{questions.statement(span.id)}" for span in spans)
+
+
+def _annulled(answer_key):
+    return [item for item in answer_key if item.annulled]
+
+
+def count_reply(prompt, questions, answer_key):
+    """Contagens de questões a partir do índice e do gabarito"""
+    objective = len(questions.ids("objetiva")) or NUM_OBJECTIVE
+    discursive = len(questions.ids("discursiva")) or NUM_DISCURSIVE
+    if _ANNULLED.search(prompt):
+        annulled = _annulled(answer_key)
+        numbers = ", ".join(f"{item.number:02d}" for item in annulled)
+        return f"**{len(annulled)}** questão(ões) anulada(s) no gabarito oficial" + (f": {numbers}." if numbers else ".")
+    if _DISCURSIVE.search(prompt) and not _OBJECTIVE.search(prompt):
+        return f"A prova tem **{discursive} questões discursivas** (D1–D{discursive})."
+    if _OBJECTIVE.search(prompt) and not _DISCURSIVE.search(prompt):
+        return f"A prova tem **{objective} questões objetivas** (01–{objective:02d})."
+    specific_objective = objective - len(GENERAL_OBJECTIVE)
+    specific_discursive = discursive - len(GENERAL_DISCURSIVE)
+    return (
+        f"A prova tem **{objective + discursive} questões**: {objective} objetivas e {discursive} discursivas.\n\n"
+        f"| Parte | Objetivas | Discursivas |\n"
+        f"|---|---|---|\n"
+        f"| Formação Geral | {len(GENERAL_OBJECTIVE)} (01–08) | {len(GENERAL_DISCURSIVE)} (D1–D2) |\n"
+        f"| Componente Específico | {specific_objective} (09–{objective:02d}) | {specific_discursive} (D3–D{discursive}) |"
+    )
+
+
+def _preview(questions, qid):
+    text = questions.statement(qid)
+    # Pula o cabeçalho "QUESTÃO 07" repetido no início do enunciado
+    text = re.sub(r"^QUEST[ÃA]O\s+(DISCURSIVA\s+)?\d{1,2}\s*", "", text)
+    return text if len(text) <= _PREVIEW_CHARS else text[:_PREVIEW_CHARS].rsplit(" ", 1)[0] + "…"
+
+
+def annulled_reply(questions, answer_key):
+    """Questões anuladas no gabarito oficial, com o início do enunciado"""
+    annulled = _annulled(answer_key)
+    if not annulled:
+        return "Nenhuma questão foi anulada no gabarito oficial."
+    lines = [f"- **Questão {item.number:02d}:** {_preview(questions, f'Q{item.number}')}"
+             if f"Q{item.number}" in questions else f"- **Questão {item.number:02d}**"
+             for item in annulled]
+    return "**Questões anuladas no gabarito oficial:**\n\n" + "\n".join(lines)
+
+
+def list_reply(prompt, questions, answer_key):
+    """Listagem de questões (anuladas, discursivas, objetivas ou todas) com o início do enunciado"""
+    if _ANNULLED.search(prompt):
+        return annulled_reply(questions, answer_key)
+    if _DISCURSIVE.search(prompt) and not _OBJECTIVE.search(prompt):
+        kind = "discursiva"
+    elif _OBJECTIVE.search(prompt) and not _DISCURSIVE.search(prompt):
+        kind = "objetiva"
+    else:
+        kind = None
+    lines = []
+    for qid in questions.ids(kind):
+        span = questions.get(qid)
+        label = f"D{span.number}" if span.kind == "discursiva" else f"{span.number:02d}"
+        lines.append(f"- **{label}** (p. {span.first_page}): {_preview(questions, qid)}")
+    return "\n".join(lines) if lines else "Nenhuma questão foi encontrada no texto da prova."
+
+
+def answer_key_table(answer_key):
+    """Gabarito completo das objetivas em tabela markdown"""
+    rows = [f"| {item.number:02d} | {item.label} |" for item in answer_key]
+    return "**Gabarito oficial (definitivo):**\n\n| Questão | Resposta |\n|---|---|\n" + "\n".join(rows)
@@ -0,0 +1,223 @@
+"""Cliente HTTP compartilhado para as APIs de chat (OpenAI e DeepSeek).
+
+Um único cliente por processo (criado via ``st.cache_resource`` nos apps)
+mantém um pool de conexões keep-alive: depois da primeira pergunta, as
+seguintes reaproveitam a conexão TLS já aberta em vez de pagar DNS, TCP e
+handshake a cada mensagem. Usa ``httpx`` com HTTP/2 quando ``httpx`` e ``h2``
+estão instalados (e ``ENADE_HTTP2`` não é ``0``); caso contrário,
+``requests.Session`` com ``HTTPAdapter``. Erros de rede do ``httpx`` são
+convertidos nas exceções equivalentes do ``requests``, para que o tratamento
+de erros dos apps seja o mesmo nos dois casos.
+
+Cada resposta traz ``timings`` com o tempo de conexão (0 quando a conexão
+veio do pool) e o tempo até os cabeçalhos, usados em :mod:`llm_metrics`.
+"""
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+try:
+    import httpx
+    import h2  # noqa: F401 - necessário para http2=True no httpx
+except ImportError:  # pragma: no cover - depende do ambiente
+    httpx = None
+
+# ENADE_OPENAI_BASE / ENADE_DEEPSEEK_BASE apontam para outro servidor compatível
+# (ex.: fake_openai_server.py nos testes de failover)
+API_BASES = {
+    "openai": os.environ.get("ENADE_OPENAI_BASE", "https://api.openai.com/v1"),
+    "deepseek": os.environ.get("ENADE_DEEPSEEK_BASE", "https://api.deepseek.com/v1"),
+}
+
+CONNECT_TIMEOUT = float(os.environ.get("ENADE_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.environ.get("ENADE_READ_TIMEOUT", "60"))
+# Conexões mantidas por host: cobre as sessões simultâneas de um processo do Streamlit
+POOL_MAXSIZE = int(os.environ.get("ENADE_POOL_MAXSIZE", "32"))
+USE_HTTP2 = os.environ.get("ENADE_HTTP2", "1") != "0"
+
+
+def chat_url(provider):
+    return f"{API_BASES[provider]}/chat/completions"
+
+
+# Tempo da última conexão aberta pela thread (o requests faz a chamada na thread de quem pediu)
+_connect_timing = threading.local()
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        _connect_timing.seconds = time.perf_counter() - start
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        # TCP + TLS
+        start = time.perf_counter()
+        super().connect()
+        _connect_timing.seconds = time.perf_counter() - start
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _TimedAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _TimedHTTPConnectionPool,
+            "https": _TimedHTTPSConnectionPool,
+        }
+
+
+class StreamResponse:
+    """Resposta em streaming com a mesma interface para ``requests`` e ``httpx``"""
+
+    def __init__(self, response, backend, timings=None):
+        self._response = response
+        self._backend = backend
+        self.status_code = response.status_code
+        self.timings = timings or {}
+
+    def iter_bytes(self):
+        """Pedaços brutos do corpo, à medida que chegam"""
+        if self._backend == "httpx":
+            with _translate_errors():
+                yield from self._response.iter_bytes()
+        else:
+            yield from self._response.iter_content(chunk_size=None)
+
+    def read(self):
+        if self._backend == "httpx":
+            return self._response.read()
+        return self._response.content
+
+    def json(self):
+        if self._backend == "httpx":
+            self._response.read()
+        return self._response.json()
+
+    @property
+    def text(self):
+        if self._backend == "httpx":
+            self._response.read()
+        return self._response.text
+
+    def close(self):
+        self._response.close()
+
+    def abort(self):
+        """Interrompe, de outra thread, uma leitura bloqueada à espera de bytes.
+
+        ``close()`` esperaria a leitura em andamento terminar (trava do buffer);
+        derrubar o socket faz a leitura falhar na hora.
+        """
+        connection = getattr(getattr(self._response, "raw", None), "_connection", None)
+        sock = getattr(connection, "sock", None)
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            return
+        threading.Thread(target=self.close, daemon=True).start()
+
+
+@contextmanager
+def _translate_errors():
+    if httpx is None:
+        yield
+        return
+    try:
+        yield
+    except httpx.TimeoutException as e:
+        raise requests.exceptions.Timeout(str(e)) from e
+    except httpx.TransportError as e:
+        raise requests.exceptions.ConnectionError(str(e)) from e
+
+
+class LLMClient:
+    """Pool de conexões keep-alive reutilizado por todas as chamadas do processo"""
+
+    def __init__(self, connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT,
+                 pool_maxsize=POOL_MAXSIZE, http2=USE_HTTP2):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.backend = "httpx" if http2 and httpx is not None else "requests"
+        if self.backend == "httpx":
+            self._client = httpx.Client(
+                http2=True,
+                limits=httpx.Limits(max_connections=pool_maxsize, max_keepalive_connections=pool_maxsize),
+                timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            )
+        else:
+            self._client = requests.Session()
+            # Só repete falhas de conexão (o pedido ainda não foi enviado); nunca
+            # repete um POST que o servidor já pode ter começado a processar
+            retries = Retry(total=2, connect=2, read=0, status=0, backoff_factor=0.2)
+            adapter = _TimedAdapter(pool_connections=len(API_BASES), pool_maxsize=pool_maxsize, max_retries=retries)
+            self._client.mount("https://", adapter)
+            self._client.mount("http://", adapter)
+
+    @contextmanager
+    def stream(self, url, headers, payload):
+        """POST em streaming; a conexão volta ao pool quando o bloco termina"""
+        start = time.perf_counter()
+        if self.backend == "httpx":
+            marks = {"connect": 0.0}
+
+            def trace(event, info):
+                if event == "connection.connect_tcp.started":
+                    marks["tcp"] = time.perf_counter()
+                elif event in ("connection.connect_tcp.complete", "connection.start_tls.complete"):
+                    marks["connect"] = time.perf_counter() - marks["tcp"]
+
+            with _translate_errors(), self._client.stream("POST", url, headers=headers, json=payload,
+                                                          extensions={"trace": trace}) as response:
+                timings = {"connect_ms": marks["connect"] * 1000, "ttfb_ms": (time.perf_counter() - start) * 1000}
+                yield StreamResponse(response, "httpx", timings)
+        else:
+            _connect_timing.seconds = 0.0
+            response = self._client.post(
+                url, headers=headers, json=payload, stream=True,
+                timeout=(self.connect_timeout, self.read_timeout),
+            )
+            timings = {"connect_ms": _connect_timing.seconds * 1000, "ttfb_ms": (time.perf_counter() - start) * 1000}
+            try:
+                yield StreamResponse(response, "requests", timings)
+            finally:
+                response.close()
+
+    def warm(self, providers=None):
+        """Abre (e devolve ao pool) uma conexão com cada API, pagando DNS e TLS antes da 1ª pergunta"""
+        for provider in providers or API_BASES:
+            try:
+                if self.backend == "httpx":
+                    self._client.head(API_BASES[provider], timeout=httpx.Timeout(self.connect_timeout))
+                else:
+                    self._client.head(API_BASES[provider], timeout=(self.connect_timeout, self.connect_timeout))
+            except Exception:
+                # Sem rede na inicialização: a primeira pergunta abre a conexão normalmente
+                pass
+
+    def warm_in_background(self, providers=None):
+        thread = threading.Thread(target=self.warm, args=(providers,), daemon=True)
+        thread.start()
+        return thread
+
+    def close(self):
+        self._client.close()
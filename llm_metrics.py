@@ -0,0 +1,173 @@
+"""Métricas de latência e vazão de cada chamada aos modelos.
+
+Cada chamada gera um :class:`CallMetrics` com as fases separadas: conexão
+(0 quando o pool reaproveita uma conexão aberta), primeiro byte (cabeçalhos
+da resposta), primeiro token, duração total e tokens/s da geração (contados
+a partir do primeiro token). Conexão e primeiro byte altos apontam para a
+rede; primeiro token alto com primeiro byte baixo, para a fila do provedor;
+tokens/s baixo, para a geração em si.
+
+:class:`MetricsRegistry` guarda as últimas chamadas de cada modelo (janela
+deslizante) e calcula p50/p95/p99. Com ``ENADE_METRICS_LOG`` definido, cada
+registro também é gravado como uma linha JSON nesse arquivo.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, field
+
+METRICS_WINDOW = int(os.environ.get("ENADE_METRICS_WINDOW", "500"))
+METRICS_LOG = os.environ.get("ENADE_METRICS_LOG", "")
+
+PERCENTILES = (50, 95, 99)
+LATENCY_FIELDS = ("connect_ms", "ttfb_ms", "ttft_ms", "total_ms", "tokens_per_s")
+
+
+@dataclass
+class CallMetrics:
+    provider: str
+    model: str
+    cache: str = "miss"  # miss, hit, semantico, pre-calculada
+    connect_ms: float = None
+    ttfb_ms: float = None
+    ttft_ms: float = None
+    total_ms: float = None
+    prompt_tokens: int = None
+    completion_tokens: int = None
+    tokens_per_s: float = None
+    finish_reason: str = None
+    ok: bool = False
+    cancelled: str = None  # motivo, ver cancellation.py
+    tokens_saved: int = None  # estimativa de tokens não gerados por causa do cancelamento
+    timestamp: float = field(default_factory=time.time)
+
+
+class CallTimer:
+    """Marca as fases de uma chamada e monta o :class:`CallMetrics` no fim"""
+
+    def __init__(self, provider, model, cache="miss", clock=time.perf_counter):
+        self.provider = provider
+        self.model = model
+        self.cache = cache
+        self._clock = clock
+        self.start = clock()
+        self.connect_ms = None
+        self.ttfb_ms = None
+        self.ttft_ms = None
+
+    def _elapsed_ms(self):
+        return (self._clock() - self.start) * 1000
+
+    def response(self, timings=None):
+        """Cabeçalhos recebidos; ``timings`` vem de ``StreamResponse.timings``"""
+        timings = timings or {}
+        self.connect_ms = timings.get("connect_ms")
+        self.ttfb_ms = timings.get("ttfb_ms", self._elapsed_ms())
+
+    def token(self):
+        if self.ttft_ms is None:
+            self.ttft_ms = self._elapsed_ms()
+
+    def finish(self, ok=True, prompt_tokens=None, completion_tokens=None, finish_reason=None,
+               cancelled=None, tokens_saved=None):
+        total_ms = self._elapsed_ms()
+        tokens_per_s = None
+        # Com um só token (ou tudo chegando de uma vez) não há geração a medir
+        if completion_tokens and completion_tokens > 1 and self.ttft_ms is not None and total_ms - self.ttft_ms >= 1:
+            tokens_per_s = completion_tokens / ((total_ms - self.ttft_ms) / 1000)
+        return CallMetrics(
+            provider=self.provider, model=self.model, cache=self.cache,
+            connect_ms=self.connect_ms, ttfb_ms=self.ttfb_ms, ttft_ms=self.ttft_ms, total_ms=total_ms,
+            prompt_tokens=prompt_tokens, completion_tokens=completion_tokens, tokens_per_s=tokens_per_s,
+            finish_reason=finish_reason, ok=ok, cancelled=cancelled, tokens_saved=tokens_saved,
+        )
+
+
+def percentile(values, p):
+    """Percentil por posição (nearest-rank) de uma lista já ordenada"""
+    if not values:
+        return None
+    rank = max(1, -(-p * len(values) // 100))
+    return values[int(rank) - 1]
+
+
+class MetricsRegistry:
+    """Janela deslizante de chamadas por modelo, compartilhada pelas sessões do processo"""
+
+    def __init__(self, window=METRICS_WINDOW, log_path=METRICS_LOG):
+        self.window = window
+        self.log_path = log_path
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def record(self, metrics):
+        with self._lock:
+            self._calls.setdefault(metrics.model, deque(maxlen=self.window)).append(metrics)
+            if self.log_path:
+                with open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(asdict(metrics)) + "\n")
+        return metrics
+
+    def track(self, stream, provider, model, cache="hit"):
+        """Envolve um stream que não passa pelo cliente HTTP (cache, respostas prontas)"""
+        timer = CallTimer(provider, model, cache)
+        pieces = 0
+        ok = False
+        try:
+            for piece in stream:
+                timer.token()
+                pieces += 1
+                yield piece
+            ok = True
+        finally:
+            if hasattr(stream, "close"):
+                stream.close()
+            self.record(timer.finish(ok, completion_tokens=pieces or None))
+
+    def expected_completion_tokens(self, model, default):
+        """Mediana dos tokens gerados nas respostas completas do modelo (``default`` sem histórico)"""
+        with self._lock:
+            values = sorted(c.completion_tokens for c in self._calls.get(model, ())
+                            if c.cache == "miss" and c.ok and c.completion_tokens)
+        return percentile(values, 50) or default
+
+    def models(self):
+        with self._lock:
+            return list(self._calls)
+
+    def summary(self, model):
+        """Contagem, taxa de acerto de cache e p50/p95/p99 de cada fase do modelo"""
+        with self._lock:
+            calls = list(self._calls.get(model, ()))
+        summary = {
+            "calls": len(calls),
+            "errors": sum(not c.ok and c.cancelled is None for c in calls),
+            "cache_hit_rate": sum(c.cache != "miss" for c in calls) / len(calls) if calls else 0.0,
+            "cancelled": sum(c.cancelled is not None for c in calls),
+            "tokens_saved": sum(c.tokens_saved or 0 for c in calls),
+        }
+        # As fases de rede só fazem sentido nas chamadas que foram ao provedor
+        misses = [c for c in calls if c.cache == "miss" and c.ok]
+        for name in LATENCY_FIELDS:
+            values = sorted(v for v in (getattr(c, name) for c in misses) if v is not None)
+            summary[name] = {f"p{p}": percentile(values, p) for p in PERCENTILES}
+        return summary
+
+
+def format_summary(model, summary):
+    """Resumo de :meth:`MetricsRegistry.summary` em markdown, para a barra lateral"""
+    lines = [f"**{model}** · {summary['calls']} chamadas · cache {summary['cache_hit_rate']:.0%}"
+             + (f" · {summary['errors']} erros" if summary["errors"] else "")
+             + (f" · {summary['cancelled']} canceladas (~{summary['tokens_saved']:,} tokens economizados)"
+                if summary["cancelled"] else "")]
+    labels = [("ttft_ms", "1º token", "ms"), ("total_ms", "total", "ms"), ("ttfb_ms", "1º byte", "ms"),
+              ("connect_ms", "conexão", "ms"), ("tokens_per_s", "geração", "tok/s")]
+    for name, label, unit in labels:
+        values = summary[name]
+        if values["p50"] is None:
+            continue
+        lines.append(f"- {label}: " + " / ".join(f"{values[f'p{p}']:,.0f}" for p in PERCENTILES)
+                     + f" {unit} (p50/p95/p99)")
+    return "\n".join(lines)
@@ -0,0 +1,255 @@
+"""Cascata de modelos: responde com o modelo barato e só escala quando preciso.
+
+:class:`ModelCascade` pede a resposta primeiro ao degrau mais rápido
+(``gpt-3.5-turbo``), guarda o texto sem mostrar e confere sinais baratos de
+que ela está ancorada na prova (:func:`check_grounding`): stream completo e
+não cortado, sem recusa logo no início, nenhuma questão citada que não
+exista no :class:`~exam_index.QuestionIndex`, nenhuma alternativa contrária
+ao gabarito oficial e, se a pergunta cita questões, a resposta trata delas.
+Passando, o texto vai para a tela; falhando, a pergunta segue para o
+próximo degrau (``gpt-4``), cuja resposta é transmitida normalmente. Uma
+questão inexistente já descarta o rascunho no meio do stream, sem esperar
+o fim da geração.
+
+As estatísticas por degrau (aceites, motivos de escalada, latência) e a
+economia estimada em relação a mandar tudo ao último degrau ficam em
+:meth:`ModelCascade.summary`, compartilhadas pelas sessões do processo.
+"""
+import os
+import re
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import dataclass
+
+from exam_index import find_question_refs
+from llm_metrics import percentile
+
+CASCADE_TIERS = tuple(os.environ.get("ENADE_CASCADE_TIERS", "gpt-3.5-turbo,gpt-4").split(","))
+CASCADE_LABEL = "cascata: " + " → ".join(CASCADE_TIERS)
+CHECK_EVERY_CHARS = 400  # conferência parcial das citações durante o stream do rascunho
+WINDOW = 200
+
+# Motivos de escalada, como aparecem na barra lateral
+REASONS = {
+    "erro": "erro na API",
+    "incompleta": "resposta incompleta",
+    "cortada": "cortada no limite de tokens",
+    "recusa": "não encontrou a informação",
+    "questao_inexistente": "citou questão inexistente",
+    "gabarito_divergente": "contradiz o gabarito",
+    "fora_do_pedido": "não tratou da questão pedida",
+}
+
+# Recusas costumam vir logo na abertura da resposta
+_REFUSAL = re.compile(
+    r"\bn[ãa]o\s+(?:(?:foi\s+)?poss[íi]vel|consigo|encontrei|sei\b|tenho\s+(?:acesso|informa)"
+    r"|h[áa]\s+(?:informa|dados|men[çc][ãa]o)|consta|est[áa]\s+(?:dispon[íi]vel|presente|no\s+contexto))",
+    re.IGNORECASE,
+)
+REFUSAL_PREFIX = 300
+# Escolha afirmativa: "a alternativa C está correta", "a resposta correta é a letra **B**"
+# (não "a alternativa A está errada", comum ao comentar os distratores)
+_CHOSEN = re.compile(
+    r"(?i:alternativa|letra|op[çc][ãa]o)\s+[*(]*([A-E])[*)]*\s*(?i:(?:é|está)\s+)?(?i:a\s+)?(?i:correta|certa)\b"
+    r"|\b(?i:correta|certa|resposta|gabarito)\s*:?\s+(?i:é\s+)?(?i:a\s+)?(?i:(?:alternativa|letra)\s+)?[*(]*([A-E])(?![A-Za-zÀ-ú])"
+)
+_SENTENCE = re.compile(r"(?<=[.!?])\s+|\n+")
+
+
+@dataclass(frozen=True)
+class Verdict:
+    ok: bool
+    reason: str = None
+    detail: str = ""
+
+
+ACCEPTED = Verdict(True)
+
+
+def check_citations(text, questions):
+    """Falha se ``text`` cita uma questão que não está no índice da prova"""
+    missing = [qid for qid in find_question_refs(text, in_range=False) if qid not in questions]
+    if missing:
+        return Verdict(False, "questao_inexistente", ", ".join(missing))
+    return ACCEPTED
+
+
+def check_answer_key(text, answer_key):
+    """Falha se uma frase com uma única questão objetiva escolhe alternativa diferente do gabarito"""
+    for sentence in _SENTENCE.split(text):
+        chosen = _CHOSEN.search(sentence)
+        if chosen is None:
+            continue
+        refs = [qid for qid in find_question_refs(sentence) if qid.startswith("Q")]
+        if len(refs) != 1:
+            continue
+        item = answer_key.get(refs[0])
+        letter = chosen.group(1) or chosen.group(2)
+        if item is not None and not item.annulled and letter != item.answer:
+            return Verdict(False, "gabarito_divergente", f"{refs[0]}: {letter} (gabarito {item.answer})")
+    return ACCEPTED
+
+
+def check_grounding(answer, prompt, questions, answer_key=None, completed=True, finish_reason=None):
+    """Sinais baratos de que a resposta do degrau barato pode ir para a tela"""
+    if not completed or not answer.strip():
+        return Verdict(False, "incompleta")
+    if finish_reason == "length":
+        return Verdict(False, "cortada")
+    if _REFUSAL.search(answer[:REFUSAL_PREFIX]):
+        return Verdict(False, "recusa")
+    verdict = check_citations(answer, questions)
+    if not verdict.ok:
+        return verdict
+    if answer_key is not None:
+        verdict = check_answer_key(answer, answer_key)
+        if not verdict.ok:
+            return verdict
+    asked = set(find_question_refs(prompt))
+    cited = set(find_question_refs(answer))
+    if asked and cited and not asked & cited:
+        return Verdict(False, "fora_do_pedido", ", ".join(sorted(asked)))
+    return ACCEPTED
+
+
+class _TierStats:
+    def __init__(self):
+        self.attempts = 0
+        self.accepted = 0
+        self.escalations = Counter()
+        self.latency_ms = deque(maxlen=WINDOW)
+
+
+class ModelCascade:
+    """Degraus em ordem de custo; estatísticas compartilhadas, uma chamada por :meth:`stream`"""
+
+    def __init__(self, tiers=CASCADE_TIERS, metrics=None, check_every=CHECK_EVERY_CHARS, clock=time.monotonic):
+        self.tiers = tuple(tiers)
+        self.metrics = metrics
+        self.check_every = check_every
+        self._clock = clock
+        self._stats = {model: _TierStats() for model in self.tiers}
+        self._lock = threading.Lock()
+        self.answers = 0
+        self.saved_ms = 0.0
+
+    def _baseline_ms(self):
+        """Tempo típico (p50) de uma resposta completa do último degrau"""
+        final = self.tiers[-1]
+        if self.metrics is not None:
+            baseline = self.metrics.summary(final)["total_ms"]["p50"]
+            if baseline is not None:
+                return baseline
+        with self._lock:
+            return percentile(sorted(self._stats[final].latency_ms), 50)
+
+    def _record(self, model, elapsed_ms, verdict):
+        # Aceite no degrau barato economiza o tempo do último; escalada custa o tempo do rascunho
+        baseline = self._baseline_ms() if verdict.ok and model != self.tiers[-1] else None
+        with self._lock:
+            stats = self._stats[model]
+            stats.attempts += 1
+            stats.latency_ms.append(elapsed_ms)
+            if verdict.ok:
+                stats.accepted += 1
+                self.answers += 1
+                if baseline is not None:
+                    self.saved_ms += baseline - elapsed_ms
+            else:
+                stats.escalations[verdict.reason] += 1
+                self.saved_ms -= elapsed_ms
+
+    def _draft(self, generator, questions):
+        """Lê o rascunho inteiro; devolve ``(texto, completo, veredito parcial)``"""
+        pieces = []
+        length = checked = 0
+        try:
+            while True:
+                try:
+                    piece = next(generator)
+                except StopIteration as stop:
+                    return "".join(pieces), stop.value, None
+                pieces.append(piece)
+                length += len(piece)
+                if length - checked >= self.check_every:
+                    text = "".join(pieces)
+                    pieces = [text]
+                    # Sobreposição para não perder uma citação cortada entre dois pedaços
+                    verdict = check_citations(text[max(0, checked - 40):], questions)
+                    checked = length
+                    if not verdict.ok:
+                        return text, False, verdict
+        finally:
+            # Rascunho descartado no meio: fecha o stream (e a conexão) na hora
+            generator.close()
+
+    def stream(self, call, prompt, questions, answer_key=None, info=None, cancel=None):
+        """Gerador de pedaços da resposta, como ``gpt4_chat``; retorna ``True`` no ``[DONE]``.
+
+        ``call(modelo, stream_info)`` devolve o gerador do chat de um degrau;
+        num degrau barato, um erro da API não deve ir para a tela, e sim para
+        ``stream_info["error"]``, o que faz a pergunta escalar. ``info`` recebe
+        o ``stream_info`` do degrau que respondeu, mais ``tier`` (o modelo) e
+        ``escalations`` (lista de ``(modelo, Verdict)``).
+        """
+        info = info if info is not None else {}
+        escalations = []
+        for model in self.tiers[:-1]:
+            tier_info = {}
+            start = self._clock()
+            answer, completed, verdict = self._draft(call(model, tier_info), questions)
+            if cancel is not None and cancel.cancelled:
+                return None
+            if verdict is None and tier_info.get("error"):
+                verdict = Verdict(False, "erro", tier_info["error"])
+            if verdict is None:
+                verdict = check_grounding(answer, prompt, questions, answer_key, completed,
+                                          tier_info.get("finish_reason"))
+            self._record(model, (self._clock() - start) * 1000, verdict)
+            if verdict.ok:
+                info.update(tier_info, tier=model, escalations=escalations)
+                yield answer
+                return completed
+            escalations.append((model, verdict))
+
+        final = self.tiers[-1]
+        start = self._clock()
+        completed = yield from call(final, info)
+        if completed:
+            self._record(final, (self._clock() - start) * 1000, ACCEPTED)
+        info.update(tier=final, escalations=escalations)
+        return completed
+
+    def summary(self):
+        """``{answers, saved_ms, tiers: [{model, attempts, accepted, hit_rate, share, p50_ms, escalations}]}``"""
+        with self._lock:
+            tiers = [
+                {
+                    "model": model,
+                    "attempts": stats.attempts,
+                    "accepted": stats.accepted,
+                    "hit_rate": stats.accepted / stats.attempts if stats.attempts else 0.0,
+                    "share": stats.accepted / self.answers if self.answers else 0.0,
+                    "p50_ms": percentile(sorted(stats.latency_ms), 50),
+                    "escalations": dict(stats.escalations),
+                }
+                for model, stats in self._stats.items()
+            ]
+            return {"answers": self.answers, "saved_ms": self.saved_ms, "tiers": tiers}
+
+
+def format_cascade(summary):
+    """Resumo de :meth:`ModelCascade.summary` em markdown, para a barra lateral"""
+    lines = [f"**{summary['answers']} respostas** · economia estimada {summary['saved_ms'] / 1000:+,.1f} s "
+             "em relação a usar só o último modelo"]
+    for tier in summary["tiers"]:
+        line = (f"- {tier['model']}: {tier['accepted']}/{tier['attempts']} aceitas ({tier['hit_rate']:.0%}), "
+                f"{tier['share']:.0%} das respostas")
+        if tier["p50_ms"] is not None:
+            line += f" · p50 {tier['p50_ms']:,.0f} ms"
+        if tier["escalations"]:
+            line += " · escalou: " + ", ".join(f"{REASONS.get(reason, reason)} ({n})"
+                                               for reason, n in tier["escalations"].items())
+        lines.append(line)
+    return "\n".join(lines)
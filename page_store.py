@@ -0,0 +1,107 @@
+"""Armazenamento compacto do texto extraído dos PDFs.
+
+Todo o texto fica em um único buffer UTF-8, no mesmo formato que era montado
+por concatenação em ``load_all_documents()`` (cabeçalhos ``--- DOCUMENTO``
+e ``[Página N]``), e arrays de offsets apontam o início/fim de cada página.
+O acesso a documentos e faixas devolve ``memoryview`` sem copiar o buffer;
+só o trecho pedido é decodificado.
+"""
+from array import array
+from bisect import bisect_right
+
+
+class PageStore:
+    """Buffer contíguo com o texto de todos os documentos, indexado por (documento, página)"""
+
+    def __init__(self, buffer, starts, ends, documents, total_chars):
+        self._buffer = buffer
+        self._view = memoryview(buffer)
+        # starts[k] e ends[k]: início e fim (em bytes) do texto da página global k
+        self._starts = starts
+        self._ends = ends
+        # nome -> (índice global da primeira página, número de páginas, início, fim do documento)
+        self._documents = documents
+        self.total_chars = total_chars
+
+    @classmethod
+    def build(cls, documents):
+        """Monta o store a partir de ``[(nome, [texto_pagina, ...]), ...]``.
+
+        Páginas sem conteúdo não entram no buffer (como antes), mas continuam
+        endereçáveis e devolvem um texto vazio.
+        """
+        parts = []
+        starts = array("Q")
+        ends = array("Q")
+        doc_index = {}
+        position = 0
+        total_chars = 0
+
+        def append(text):
+            nonlocal position, total_chars
+            encoded = text.encode("utf-8")
+            parts.append(encoded)
+            position += len(encoded)
+            total_chars += len(text)
+
+        for name, pages in documents:
+            first_page = len(starts)
+            doc_start = position
+            append(f"\n\n--- DOCUMENTO: {name} ({len(pages)} páginas) ---\n\n")
+            for i, page_text in enumerate(pages):
+                if page_text.strip():  # Só adiciona se tiver conteúdo
+                    append(f"[Página {i+1}]\n")
+                    starts.append(position)
+                    append(page_text)
+                    ends.append(position)
+                    append("\n\n")
+                else:
+                    starts.append(position)
+                    ends.append(position)
+            append("\n\n")
+            doc_index[name] = (first_page, len(pages), doc_start, position)
+
+        return cls(b"".join(parts), starts, ends, doc_index, total_chars)
+
+    @property
+    def documents(self):
+        """Nomes dos documentos na ordem em que foram carregados"""
+        return list(self._documents)
+
+    def num_pages(self, document):
+        return self._documents[document][1]
+
+    def _page_bounds(self, document, page):
+        first_page, num_pages, _, _ = self._documents[document]
+        if not 1 <= page <= num_pages:
+            raise IndexError(f"{document} não tem a página {page}")
+        k = first_page + page - 1
+        return self._starts[k], self._ends[k]
+
+    def page_text(self, document, page):
+        """Texto da página ``page`` (1-based)"""
+        start, end = self._page_bounds(document, page)
+        return str(self._view[start:end], "utf-8")
+
+    def document_bounds(self, document):
+        """Offsets (em bytes) de início e fim do documento no buffer"""
+        _, _, start, end = self._documents[document]
+        return start, end
+
+    def document_view(self, document):
+        """``memoryview`` do documento inteiro, cabeçalho incluído"""
+        start, end = self.document_bounds(document)
+        return self._view[start:end]
+
+    def view(self, start, end):
+        """``memoryview`` de uma faixa arbitrária de bytes do buffer"""
+        return self._view[start:end]
+
+    def page_at(self, document, offset):
+        """Página (1-based) do documento que contém o offset de bytes ``offset``"""
+        first_page, num_pages, _, _ = self._documents[document]
+        k = bisect_right(self._starts, offset, first_page, first_page + num_pages) - 1
+        return max(1, k - first_page + 1)
+
+    def __len__(self):
+        return len(self._buffer)
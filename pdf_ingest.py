@@ -0,0 +1,184 @@
+"""Extração de texto dos PDFs da prova com cache persistente em disco.
+
+O texto de cada página é gravado em ``.cache/pdf_text`` usando como chave o
+SHA-256 do conteúdo do PDF e a versão do extrator. Em um reinício do processo
+o PyPDF2 nem é carregado: basta ler o JSON correspondente. Se o PDF mudar, o
+hash muda e o cache antigo simplesmente deixa de ser usado.
+"""
+import hashlib
+import json
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+
+# Incrementar sempre que a forma de extrair/normalizar o texto mudar
+EXTRACTOR_VERSION = "pypdf2-v1"
+
+CACHE_DIR = os.environ.get("ENADE_CACHE_DIR", ".cache")
+
+# Abaixo disso o custo de subir os processos supera o ganho do paralelismo
+PARALLEL_MIN_PAGES = 8
+
+# O servidor do Streamlit tem várias threads: um fork dele pode herdar uma trava
+# presa e travar o worker, então os processos saem de um forkserver (ou spawn)
+START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+def file_sha256(data):
+    """Retorna o SHA-256 (hex) dos bytes do arquivo"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def _cache_path(digest):
+    return os.path.join(CACHE_DIR, "pdf_text", f"{digest}.{EXTRACTOR_VERSION}.json")
+
+
+def _read_cache(digest):
+    try:
+        with open(_cache_path(digest), "r", encoding="utf-8") as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if cached.get("sha256") != digest or cached.get("extractor") != EXTRACTOR_VERSION:
+        return None
+    return cached
+
+
+def _write_cache(digest, pages, errors):
+    path = _cache_path(digest)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    payload = {
+        "sha256": digest,
+        "extractor": EXTRACTOR_VERSION,
+        "pages": pages,
+        "errors": errors,
+    }
+    # Escrita atômica: outro worker nunca lê um JSON pela metade
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+def extract_pages(data):
+    """Extrai o texto de cada página com o PyPDF2.
+
+    Retorna ``(pages, errors)``: ``pages`` tem uma string por página (vazia se
+    a extração falhar) e ``errors`` uma lista de ``[indice_pagina, mensagem]``.
+    """
+    import PyPDF2
+
+    pdf = PyPDF2.PdfReader(BytesIO(data))
+    pages = []
+    errors = []
+    for i, page in enumerate(pdf.pages):
+        try:
+            pages.append(page.extract_text() or "")
+        except Exception as e:
+            pages.append("")
+            errors.append([i, str(e)])
+    return pages, errors
+
+
+def default_workers():
+    """Número de processos para extração (``ENADE_PDF_WORKERS`` ou núcleos disponíveis)"""
+    configured = os.environ.get("ENADE_PDF_WORKERS")
+    if configured:
+        return max(1, int(configured))
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _extract_page_range(source, start, stop):
+    """Extrai as páginas ``[start, stop)`` de ``source`` (caminho ou bytes); executado em um processo do pool"""
+    import PyPDF2
+
+    pdf = PyPDF2.PdfReader(source if isinstance(source, str) else BytesIO(source))
+    pages = []
+    errors = []
+    for i in range(start, stop):
+        try:
+            pages.append(pdf.pages[i].extract_text() or "")
+        except Exception as e:
+            pages.append("")
+            errors.append([i, str(e)])
+    return pages, errors
+
+
+def extract_pages_parallel(data, workers=None, path=None):
+    """Extrai as páginas distribuindo faixas entre um ``ProcessPoolExecutor``.
+
+    O resultado tem o mesmo formato de :func:`extract_pages`, com as páginas
+    remontadas na ordem original. Com ``path``, cada processo abre o arquivo
+    em vez de receber uma cópia serializada de ``data`` por faixa (cada um
+    precisa reler o PDF inteiro de qualquer forma). Documentos pequenos,
+    ``workers=1`` ou um pool que não consiga subir caem na extração serial.
+    """
+    import PyPDF2
+
+    workers = workers or default_workers()
+    num_pages = len(PyPDF2.PdfReader(BytesIO(data)).pages)
+    if workers <= 1 or num_pages < PARALLEL_MIN_PAGES:
+        return extract_pages(data)
+
+    # Faixas menores que num_pages/workers equilibram páginas de custo desigual
+    step = max(1, -(-num_pages // (workers * 2)))
+    ranges = [(start, min(start + step, num_pages)) for start in range(0, num_pages, step)]
+
+    try:
+        source = path if path is not None else data
+        with ProcessPoolExecutor(max_workers=min(workers, len(ranges)),
+                                 mp_context=multiprocessing.get_context(START_METHOD)) as pool:
+            futures = [pool.submit(_extract_page_range, source, start, stop) for start, stop in ranges]
+            results = [future.result() for future in futures]
+    except (BrokenProcessPool, OSError):
+        return extract_pages(data)
+
+    pages = []
+    errors = []
+    for range_pages, range_errors in results:
+        pages.extend(range_pages)
+        errors.extend(range_errors)
+    return pages, errors
+
+
+def load_pdf_pages(path, workers=None):
+    """Carrega o texto por página de um PDF, usando o cache em disco quando possível.
+
+    Em cache frio as páginas são extraídas em paralelo (ver
+    :func:`extract_pages_parallel`); ``workers=1`` força a extração serial.
+    Retorna um dicionário com ``pages``, ``errors``, ``sha256`` e ``from_cache``.
+    Exceções ao abrir/ler o PDF são propagadas para quem chamou.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    digest = file_sha256(data)
+
+    cached = _read_cache(digest)
+    if cached is not None:
+        return {
+            "pages": cached["pages"],
+            "errors": cached["errors"],
+            "sha256": digest,
+            "from_cache": True,
+        }
+
+    pages, errors = extract_pages_parallel(data, workers, path=path)
+    _write_cache(digest, pages, errors)
+    return {
+        "pages": pages,
+        "errors": errors,
+        "sha256": digest,
+        "from_cache": False,
+    }
@@ -0,0 +1,123 @@
+"""Pré-calcula, no deploy, as respostas das perguntas sugeridas e do resumo.
+
+Uso::
+
+    OPENAI_API_KEY=... DEEPSEEK_API_KEY=... python precompute_suggestions.py
+    python precompute_suggestions.py --models gpt-4 deepseek-chat --force
+
+Para cada modelo configurado (de cada provedor com chave de API definida),
+as perguntas de ``prompts.SUGESTOES`` e o resumo da prova são enviados uma
+vez, com o mesmo contexto montado pelo app, e as respostas são gravadas com
+o hash dos PDFs e dos modelos de prompt (ver :mod:`precomputed_answers`).
+Respostas já existentes para os mesmos hashes são mantidas, a menos que
+``--force`` seja usado; perguntas que o roteador responde sem o modelo são
+puladas. Todas as chamadas são feitas em paralelo (``ENADE_MAX_CONCURRENCY``
+por chave de API, ver :mod:`async_llm`).
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+from context_packer import context_budget
+from exam_documents import build_chat_context, build_summary_context, load_documents
+from intent_router import route_query
+from async_llm import AsyncLLMClient, ChatRequest
+from precomputed_answers import PrecomputedAnswers
+from prompts import (
+    PEDIDO_RESUMO,
+    RESUMO_MAX_TOKENS,
+    RESUMO_TEMPERATURE,
+    SUGESTOES,
+    chat_messages,
+    summary_messages,
+    templates_hash,
+)
+
+PROVIDERS = {
+    "openai": {
+        "api_key_env": "OPENAI_API_KEY",
+        "models": ["gpt-4", "gpt-4-turbo-preview", "gpt-3.5-turbo"],
+    },
+    "deepseek": {
+        "api_key_env": "DEEPSEEK_API_KEY",
+        "models": ["deepseek-chat", "deepseek-coder"],
+    },
+}
+
+# Valores padrão dos controles da barra lateral
+SUGESTOES_TEMPERATURE = 0.3
+SUGESTOES_MAX_TOKENS = 2000
+
+
+def jobs(dados, model):
+    """``(pergunta, messages, temperatura, max_tokens)`` de cada resposta a pré-calcular"""
+    for pergunta in SUGESTOES:
+        rota = route_query(pergunta, dados['questoes'], dados['gabarito'], dados['padroes'])
+        if rota.direct:
+            continue
+        messages = chat_messages(pergunta)
+        contexto = build_chat_context(dados, pergunta, context_budget(model, SUGESTOES_MAX_TOKENS, messages), model)
+        yield pergunta, chat_messages(pergunta, contexto.text), SUGESTOES_TEMPERATURE, SUGESTOES_MAX_TOKENS
+    messages = summary_messages()
+    contexto = build_summary_context(dados, context_budget(model, RESUMO_MAX_TOKENS, messages), model)
+    yield PEDIDO_RESUMO, summary_messages(contexto.text), RESUMO_TEMPERATURE, RESUMO_MAX_TOKENS
+
+
+async def generate(store, pendentes):
+    """Gera todas as respostas pendentes em paralelo; devolve o número de falhas"""
+    async def one(client, pergunta, request):
+        titulo = pergunta.splitlines()[0]
+        try:
+            result = await client.chat(request)
+        except Exception as e:
+            print(f"[{request.model}] erro em {titulo!r}: {e}")
+            return False
+        if not result.complete:
+            print(f"[{request.model}] resposta interrompida em {titulo!r}")
+            return False
+        # Tudo roda no mesmo loop: gravar aqui não disputa o arquivo com as outras tarefas
+        store.put(request.provider, request.model, pergunta, request.temperature, request.max_tokens, result.text)
+        store.save()
+        print(f"[{request.model}] {result.elapsed:.1f}s: {titulo}")
+        return True
+
+    async with AsyncLLMClient() as client:
+        ok = await asyncio.gather(*(one(client, pergunta, request) for pergunta, request in pendentes))
+    return ok.count(False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pré-calcula as respostas das perguntas sugeridas")
+    parser.add_argument("--models", nargs="+", help="modelos a gerar (padrão: todos dos provedores com chave)")
+    parser.add_argument("--force", action="store_true", help="gera de novo mesmo se já houver resposta")
+    args = parser.parse_args(argv)
+
+    dados = load_documents(on_warning=print, on_error=print)
+    store = PrecomputedAnswers.load(dados['sha256'], templates_hash())
+    print(f"Documentos: {', '.join(dados['arquivos_ok'])}")
+    print(f"Arquivo de respostas: {store.path}")
+
+    pendentes = []
+    for provider, config in PROVIDERS.items():
+        models = [m for m in config["models"] if not args.models or m in args.models]
+        api_key = os.environ.get(config["api_key_env"], "")
+        if not models:
+            continue
+        if not api_key:
+            print(f"{provider}: {config['api_key_env']} não definida, pulando {', '.join(models)}")
+            continue
+        for model in models:
+            for pergunta, messages, temperature, max_tokens in jobs(dados, model):
+                if not args.force and (provider, model, pergunta, temperature, max_tokens) in store:
+                    print(f"[{model}] já existe: {pergunta.splitlines()[0]}")
+                    continue
+                pendentes.append((pergunta, ChatRequest(provider, api_key, model, messages, temperature, max_tokens)))
+
+    failures = asyncio.run(generate(store, pendentes))
+    print(f"{len(store)} respostas prontas em {store.path}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+"""Respostas pré-calculadas para as perguntas sugeridas e o resumo da prova.
+
+Geradas no deploy por ``precompute_suggestions.py`` e guardadas em
+``.cache/suggestions/<hash dos PDFs>-<hash dos prompts>.json``. Como o nome
+do arquivo depende dos dois hashes, alterar um PDF ou um modelo de prompt
+simplesmente faz o app não encontrar respostas prontas até a próxima geração.
+Os apps recarregam o arquivo quando :func:`store_mtime` muda, então uma
+geração feita com o app no ar vale já na pergunta seguinte.
+
+O contexto das respostas é montado com a busca lexical (BM25); com outro
+modo de busca selecionado, os apps não as usam no chat.
+"""
+import json
+import os
+
+from answer_cache import normalize_prompt
+
+CACHE_DIR = os.environ.get("ENADE_CACHE_DIR", ".cache")
+
+
+def store_path(documents_hash, templates_hash):
+    return os.path.join(CACHE_DIR, "suggestions", f"{documents_hash[:16]}-{templates_hash[:16]}.json")
+
+
+def store_mtime(documents_hash, templates_hash):
+    """Data de modificação do arquivo de respostas (``None`` se ainda não foi gerado)"""
+    try:
+        return os.path.getmtime(store_path(documents_hash, templates_hash))
+    except OSError:
+        return None
+
+
+def _prompt_key(prompt, temperature, max_tokens):
+    # Mesmos parâmetros de geração do cache exato (make_key) e do escopo do semântico
+    return f"{normalize_prompt(prompt)}\0temperature={round(float(temperature), 2)}\0max_tokens={int(max_tokens)}"
+
+
+class PrecomputedAnswers:
+    """``{provedor: {modelo: {pergunta normalizada + parâmetros: resposta}}}`` em um arquivo JSON"""
+
+    def __init__(self, path, answers=None):
+        self.path = path
+        self._answers = answers or {}
+
+    @classmethod
+    def load(cls, documents_hash, templates_hash):
+        path = store_path(documents_hash, templates_hash)
+        try:
+            with open(path, encoding="utf-8") as f:
+                return cls(path, json.load(f))
+        except (OSError, ValueError):
+            return cls(path)
+
+    def get(self, provider, model, prompt, temperature, max_tokens):
+        """Resposta gerada com exatamente esta temperatura e ``max_tokens`` (ou ``None``)"""
+        return self._answers.get(provider, {}).get(model, {}).get(_prompt_key(prompt, temperature, max_tokens))
+
+    def put(self, provider, model, prompt, temperature, max_tokens, answer):
+        self._answers.setdefault(provider, {}).setdefault(model, {})[_prompt_key(prompt, temperature, max_tokens)] = answer
+
+    def __contains__(self, key):
+        provider, model, prompt, temperature, max_tokens = key
+        return self.get(provider, model, prompt, temperature, max_tokens) is not None
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._answers, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.path)
+
+    def __len__(self):
+        return sum(len(prompts) for models in self._answers.values() for prompts in models.values())
@@ -0,0 +1,97 @@
+"""Perguntas sugeridas e modelos de prompt compartilhados pelos apps e scripts.
+
+Qualquer alteração aqui muda :func:`templates_hash` e, com isso, invalida as
+respostas pré-calculadas por ``precompute_suggestions.py``.
+"""
+import hashlib
+
+SUGESTOES = [
+    "Quantas questões a prova possui e como estão distribuídas?",
+    "Quais são os principais temas abordados nas questões de algoritmos?",
+    "Analise as questões discursivas e seus padrões de resposta",
+    "Qual o nível de dificuldade geral da prova?",
+    "Compare as questões de formação geral vs específicas"
+]
+
+INSTRUCOES_CHAT = """
+Você é um especialista em análise do ENADE de Ciência da Computação 2017.
+
+DOCUMENTOS DISPONÍVEIS:
+{contexto}
+
+INSTRUÇÕES:
+- Responda com base APENAS nos documentos fornecidos
+- Seja preciso e educativo
+- Cite números de questões quando relevante
+- Use formatação markdown para melhor legibilidade
+- Se não souber algo, seja honesto
+"""
+
+INSTRUCOES_RESUMO = """Você é um especialista em análise pedagógica do ENADE.
+Com base nos documentos da prova ENADE CC 2017, gere um resumo estruturado e detalhado.
+
+DOCUMENTOS: {contexto}"""
+
+PEDIDO_RESUMO = """Gere uma análise completa da prova com:
+
+## 📊 Visão Geral
+- Total de questões e distribuição
+- Tipos de questões (objetivas, discursivas)
+
+## 🎯 Principais Temas Abordados
+- Áreas de conhecimento mais cobradas
+- Tópicos específicos por questão
+
+## 📈 Análise Pedagógica
+- Nível de dificuldade geral
+- Competências avaliadas
+- Pontos de destaque
+
+## 💡 Insights para Educadores
+- Áreas que merecem mais atenção
+- Sugestões para preparação
+
+Use markdown e seja detalhado mas objetivo."""
+
+INSTRUCOES_MEMORIA = """Você mantém o resumo de uma conversa sobre a prova ENADE CC 2017.
+Atualize o resumo anterior com os novos turnos em no máximo 150 palavras, preservando
+os números das questões citadas, as conclusões e o que o usuário ainda quer saber.
+Responda apenas com o novo resumo."""
+
+# Parâmetros usados na geração do resumo
+RESUMO_TEMPERATURE = 0.1
+RESUMO_MAX_TOKENS = 3000
+
+
+def chat_messages(pergunta, contexto="", memoria=()):
+    """Prompt de sistema, memória da conversa (turnos anteriores) e a pergunta atual"""
+    return [
+        {"role": "system", "content": INSTRUCOES_CHAT.format(contexto=contexto)},
+        *memoria,
+        {"role": "user", "content": f"Pergunta: {pergunta}"}
+    ]
+
+
+def summary_messages(contexto=""):
+    return [
+        {"role": "system", "content": INSTRUCOES_RESUMO.format(contexto=contexto)},
+        {"role": "user", "content": PEDIDO_RESUMO}
+    ]
+
+
+def memory_messages(resumo_anterior, turnos):
+    """Pedido de atualização do resumo acumulado da conversa"""
+    novos = "\n\n".join(f"{'Usuário' if papel == 'user' else 'Assistente'}: {texto}" for papel, texto in turnos)
+    return [
+        {"role": "system", "content": INSTRUCOES_MEMORIA},
+        {"role": "user", "content": f"RESUMO ANTERIOR:\n{resumo_anterior or '(vazio)'}\n\nNOVOS TURNOS:\n{novos}"}
+    ]
+
+
+def templates_hash():
+    """Hash dos modelos de prompt e das perguntas sugeridas"""
+    digest = hashlib.sha256()
+    for text in [INSTRUCOES_CHAT, INSTRUCOES_RESUMO, PEDIDO_RESUMO, *SUGESTOES]:
+        digest.update(text.encode("utf-8") + b"\0")
+    digest.update(f"{RESUMO_TEMPERATURE}:{RESUMO_MAX_TOKENS}".encode("utf-8"))
+    return digest.hexdigest()
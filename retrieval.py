@@ -0,0 +1,197 @@
+"""Busca lexical (BM25) sobre trechos dos documentos da prova.
+
+O texto do :class:`PageStore` é dividido em trechos de tamanho limitado por
+página, normalizados (acentos removidos, caixa baixa, stemming leve para o
+português) e indexados em um índice invertido construído uma única vez no
+carregamento. Cada pergunta recupera só os trechos mais relevantes, dentro de
+um orçamento de caracteres, em vez de um prefixo fixo dos documentos.
+"""
+import heapq
+import math
+import re
+import unicodedata
+from collections import Counter
+from dataclasses import dataclass
+
+# Palavras muito frequentes que não ajudam a distinguir trechos
+STOPWORDS = frozenset("""
+a ao aos as ate com como da das de dela dele deles do dos e ela elas ele eles em
+entre era essa esse esta este eu foi for ha isso isto ja la lhe mais mas me mesmo
+na nao nas nem no nos o os ou para pela pelas pelo pelos por qual quais quando que
+quem se sem ser seu seus sua suas sao so tambem te tem tu um uma umas uns voce
+cada qualquer seja foram sera pode podem deve devem
+questao questoes prova pagina documento
+""".split())
+
+# Sufixos removidos pelo stemmer, do mais longo para o mais curto
+_SUFFIXES = (
+    "amentos", "imentos", "amento", "imento", "adoras", "adores", "idades",
+    "mente", "acoes", "icoes", "adora", "ador", "idade", "acao", "icao",
+    "ancia", "encia", "istas", "ista", "ismos", "ismo", "avel", "ivel",
+    "oes", "aes", "ais", "eis", "ois", "ao", "as", "es", "os", "is",
+    "a", "o", "e", "s",
+)
+_MIN_STEM = 3
+
+_WORD = re.compile(r"\w+")
+
+
+def fold_accents(text):
+    """Remove acentos e converte para minúsculas ("Questão" -> "questao")"""
+    normalized = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in normalized if not unicodedata.combining(c)).lower()
+
+
+def stem(word):
+    """Stemmer leve para o português: remove um único sufixo comum de flexão/derivação"""
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= _MIN_STEM:
+            return word[:-len(suffix)]
+    return word
+
+
+def tokenize(text):
+    """Termos indexáveis: sem acento, sem stopwords e com stemming"""
+    return [
+        stem(word)
+        for word in _WORD.findall(fold_accents(text))
+        if word not in STOPWORDS and (len(word) > 1 or word.isdigit())
+    ]
+
+
+@dataclass(frozen=True)
+class Chunk:
+    """Trecho de uma página de um documento"""
+    id: int
+    document: str
+    page: int
+    text: str
+
+    def header(self):
+        return f"[{self.document} — Página {self.page}]"
+
+
+# Cabeçalhos de questão sempre iniciam um novo trecho
+_QUESTION_START = re.compile(r"(?=QUEST[ÃA]O\s+(?:DISCURSIVA\s+)?\d)")
+_SENTENCE_END = re.compile(r"(?<=[.!?;:])\s+")
+
+
+def chunk_pages(store, max_chars=900):
+    """Divide cada página do store em trechos de até ``max_chars`` caracteres.
+
+    Os espaços em branco são compactados (a extração de alguns PDFs gera uma
+    quebra de linha entre cada palavra), e os cortes respeitam fim de frase
+    e o início de cada questão sempre que possível.
+    """
+    chunks = []
+    for document in store.documents:
+        for page in range(1, store.num_pages(document) + 1):
+            text = " ".join(store.page_text(document, page).split())
+            if not text:
+                continue
+            for section in _QUESTION_START.split(text):
+                section = section.strip()
+                if not section:
+                    continue
+                for piece in _pack_sentences(_SENTENCE_END.split(section), max_chars):
+                    chunks.append(Chunk(len(chunks), document, page, piece))
+    return chunks
+
+
+def _pack_sentences(sentences, max_chars):
+    current = []
+    size = 0
+    for sentence in sentences:
+        while len(sentence) > max_chars:
+            if current:
+                yield " ".join(current)
+                current, size = [], 0
+            yield sentence[:max_chars]
+            sentence = sentence[max_chars:]
+        if size + len(sentence) > max_chars and current:
+            yield " ".join(current)
+            current, size = [], 0
+        current.append(sentence)
+        size += len(sentence) + 1
+    if current:
+        yield " ".join(current)
+
+
+class BM25Index:
+    """Índice invertido com ranking BM25 sobre uma lista de :class:`Chunk`"""
+
+    def __init__(self, chunks, k1=1.5, b=0.75):
+        self.chunks = chunks
+        self.k1 = k1
+        self.b = b
+        # termo -> [(id do trecho, frequência do termo no trecho), ...]
+        self._postings = {}
+        self._lengths = []
+        for chunk in chunks:
+            terms = Counter(tokenize(chunk.text))
+            self._lengths.append(sum(terms.values()))
+            for term, tf in terms.items():
+                self._postings.setdefault(term, []).append((chunk.id, tf))
+        total = len(chunks)
+        self._avg_length = (sum(self._lengths) / total) if total else 0.0
+        self._idf = {
+            term: math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self._postings.items()
+        }
+
+    @classmethod
+    def from_store(cls, store, max_chars=900):
+        return cls(chunk_pages(store, max_chars=max_chars))
+
+    def search(self, query, k=8):
+        """Os ``k`` trechos de maior pontuação BM25, como ``[(score, Chunk), ...]``"""
+        scores = {}
+        k1, b, avg = self.k1, self.b, self._avg_length or 1.0
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = self._idf[term]
+            for chunk_id, tf in postings:
+                norm = k1 * (1 - b + b * self._lengths[chunk_id] / avg)
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (k1 + 1) / (tf + norm)
+        best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [(score, self.chunks[chunk_id]) for chunk_id, score in best]
+
+
+def select_chunks(ranked, budget_chars, exclude=()):
+    """Escolhe trechos por ordem de relevância até esgotar ``budget_chars``"""
+    selected = []
+    used = 0
+    for _, chunk in ranked:
+        if chunk.id in exclude:
+            continue
+        cost = len(chunk.text) + len(chunk.header()) + 2
+        if used + cost > budget_chars:
+            continue
+        selected.append(chunk)
+        used += cost
+    return selected
+
+
+def format_chunks(chunks):
+    """Trechos na ordem dos documentos, cada um com documento e página de origem"""
+    ordered = sorted(chunks, key=lambda chunk: chunk.id)
+    return "\n\n".join(f"{chunk.header()}\n{chunk.text}" for chunk in ordered)
+
+
+def build_context(index, query, budget_chars, k=12):
+    """Contexto com os trechos BM25 mais relevantes para ``query`` dentro do orçamento"""
+    return format_chunks(select_chunks(index.search(query, k=k), budget_chars))
+
+
+def reciprocal_rank_fusion(rankings, k=8, constant=60):
+    """Combina rankings (``[(score, Chunk), ...]``) de buscadores diferentes por RRF"""
+    fused = {}
+    chunks = {}
+    for ranking in rankings:
+        for position, (_, chunk) in enumerate(ranking):
+            fused[chunk.id] = fused.get(chunk.id, 0.0) + 1.0 / (constant + position + 1)
+            chunks[chunk.id] = chunk
+    best = heapq.nlargest(k, fused.items(), key=lambda item: item[1])
+    return [(score, chunks[chunk_id]) for chunk_id, score in best]
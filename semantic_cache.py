@@ -0,0 +1,160 @@
+"""Cache semântico: reaproveita respostas de perguntas com outra redação.
+
+O cache exato de :mod:`answer_cache` só acerta quando a pergunta normalizada
+e o contexto são idênticos. Aqui cada pergunta já respondida é guardada com
+seu embedding (mesmos embedders de :mod:`vector_index`); uma nova pergunta
+reaproveita a resposta da vizinha mais próxima quando a similaridade de
+cosseno passa do limiar configurado. Para não devolver a resposta de outra
+questão, as duas perguntas precisam citar exatamente as mesmas questões e os
+mesmos números.
+"""
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+from exam_index import find_question_refs
+
+DEFAULT_THRESHOLD = float(os.environ.get("ENADE_SEMANTIC_THRESHOLD", "0.85"))
+DEFAULT_TTL = float(os.environ.get("ENADE_SEMANTIC_TTL", str(24 * 3600)))
+
+_NUMBER = re.compile(r"\d+")
+
+
+def _signature(prompt):
+    """Questões citadas e números da pergunta: precisam coincidir para haver reuso"""
+    return tuple(find_question_refs(prompt)), frozenset(_NUMBER.findall(prompt))
+
+
+@dataclass(frozen=True)
+class SemanticHit:
+    """Resposta reaproveitada e a pergunta original que a gerou"""
+    answer: str
+    prompt: str
+    similarity: float
+
+
+class _Scope:
+    """Entradas de um mesmo (provedor, modelo, parâmetros)"""
+
+    def __init__(self):
+        self.prompts = []
+        self.answers = []
+        self.signatures = []
+        self.expires = []
+        self.rows = []
+        self._matrix = None
+
+    def matrix(self):
+        if self._matrix is None:
+            self._matrix = np.vstack(self.rows) if self.rows else None
+        return self._matrix
+
+    def add(self, prompt, answer, vector, expires):
+        self.prompts.append(prompt)
+        self.answers.append(answer)
+        self.signatures.append(_signature(prompt))
+        self.expires.append(expires)
+        self.rows.append(vector)
+        self._matrix = None
+
+    def drop(self, keep):
+        """Mantém só as posições de ``keep`` (em ordem)"""
+        for name in ("prompts", "answers", "signatures", "expires", "rows"):
+            values = getattr(self, name)
+            setattr(self, name, [values[i] for i in keep])
+        self._matrix = None
+
+    def __len__(self):
+        return len(self.prompts)
+
+
+class SemanticCache:
+    """Vizinho mais próximo entre perguntas já respondidas, com TTL e contadores"""
+
+    def __init__(self, embedder, threshold=DEFAULT_THRESHOLD, ttl=DEFAULT_TTL, max_entries=2000):
+        self.embedder = embedder
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._scopes = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0  # similares o bastante, mas citando outras questões/números
+        self.expired = 0
+
+    def _embed(self, prompt):
+        return self.embedder.embed([prompt])[0]
+
+    def lookup(self, scope, prompt):
+        """:class:`SemanticHit` da pergunta mais parecida em ``scope`` ou ``None``"""
+        vector = self._embed(prompt)
+        now = time.time()
+        with self._lock:
+            entries = self._scopes.get(scope)
+            if entries is not None:
+                self._expire(entries, now)
+            if not entries:
+                self.misses += 1
+                return None
+            scores = entries.matrix() @ vector
+            signature = _signature(prompt)
+            for i in np.argsort(-scores):
+                if scores[i] < self.threshold:
+                    break
+                if entries.signatures[i] != signature:
+                    self.rejected += 1
+                    continue
+                self.hits += 1
+                return SemanticHit(entries.answers[i], entries.prompts[i], float(scores[i]))
+            self.misses += 1
+            return None
+
+    def add(self, scope, prompt, answer):
+        if not answer:
+            return
+        vector = self._embed(prompt)
+        with self._lock:
+            entries = self._scopes.setdefault(scope, _Scope())
+            entries.add(prompt, answer, vector, time.time() + self.ttl)
+            if sum(len(scope_entries) for scope_entries in self._scopes.values()) > self.max_entries:
+                self._evict_oldest(entries)
+
+    def _evict_oldest(self, grown):
+        """Descarta a entrada mais antiga do cache todo, nunca a que acabou de entrar.
+
+        Dentro de um escopo as entradas estão em ordem de inserção (e de
+        ``expires``, com o mesmo TTL), então basta comparar a primeira de cada um.
+        """
+        candidates = [(key, scope_entries) for key, scope_entries in self._scopes.items()
+                      if scope_entries is not grown or len(scope_entries) > 1]
+        if not candidates:
+            return
+        key, oldest = min(candidates, key=lambda item: item[1].expires[0])
+        oldest.drop(range(1, len(oldest)))
+        if not oldest:
+            del self._scopes[key]
+
+    def _expire(self, entries, now):
+        keep = [i for i, expires in enumerate(entries.expires) if expires > now]
+        if len(keep) < len(entries):
+            self.expired += len(entries) - len(keep)
+            entries.drop(keep)
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(entries) for entries in self._scopes.values())
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "rejected": self.rejected,
+            "expired": self.expired,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,111 @@
+"""Micro-benchmark: loop antigo com ``iter_lines`` + ``json.loads`` vs :class:`sse.ChatStream`.
+
+Uso::
+
+    python sse_benchmark.py
+    python sse_benchmark.py --events 50000 --chunk 512
+
+Gera um stream sintético no formato da OpenAI (pedaços de resposta com
+acentos, escapes e o evento final com ``finish_reason`` e ``usage``), passa
+os mesmos bytes pelos dois decodificadores e mostra eventos/s de cada um,
+conferindo que o texto produzido é idêntico.
+"""
+import argparse
+import io
+import json
+import random
+import time
+
+import requests
+
+from sse import ChatStream, _loads
+
+_PIECES = ["A", " questão", " 12", " aborda", " árvores", " binárias", " de", " busca", ";", " veja", " o",
+           " padrão", " de", " resposta", ".\n\n", "**Análise**", ":", " \"ótima\"", " complexidade", " O(n)"]
+
+
+def synthetic_stream(events, seed=0):
+    rng = random.Random(seed)
+    head = {"id": "chatcmpl-123", "object": "chat.completion.chunk", "created": 1700000000, "model": "gpt-4-0613",
+            "system_fingerprint": None}
+    lines = []
+    for i in range(events):
+        delta = {"role": "assistant", "content": ""} if i == 0 else {"content": rng.choice(_PIECES)}
+        chunk = dict(head, choices=[{"index": 0, "delta": delta, "logprobs": None, "finish_reason": None}])
+        lines.append(b"data: " + json.dumps(chunk, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n\n")
+    final = dict(head, choices=[{"index": 0, "delta": {}, "logprobs": None, "finish_reason": "stop"}],
+                 usage={"prompt_tokens": 5000, "completion_tokens": events, "total_tokens": 5000 + events})
+    lines.append(b"data: " + json.dumps(final, separators=(",", ":")).encode("utf-8") + b"\n\n")
+    lines.append(b"data: [DONE]\n\n")
+    return b"".join(lines)
+
+
+def response_for(body, chunk_size):
+    """Resposta do ``requests`` que entrega ``body`` em pedaços já cortados (mede só a decodificação)"""
+    chunks = [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)]
+    response = requests.Response()
+    response.raw = io.BytesIO()
+    response.status_code = 200
+    response.iter_content = lambda chunk_size=None, decode_unicode=False: iter(chunks)
+    return response, chunk_size
+
+
+def legacy(body, chunk_size):
+    """O loop de ``gpt4_chat``/``deepseek_chat`` antes do decodificador"""
+    response, chunk_size = response_for(body, chunk_size)
+    pieces = []
+    for line in response.iter_lines(chunk_size=chunk_size):
+        if line:
+            decoded_line = line.decode('utf-8')
+            if decoded_line.startswith("data: "):
+                json_data = decoded_line[6:]
+                if json_data != "[DONE]":
+                    try:
+                        event_data = json.loads(json_data)
+                        if "choices" in event_data and len(event_data["choices"]) > 0:
+                            delta = event_data["choices"][0].get("delta", {})
+                            if "content" in delta:
+                                pieces.append(delta["content"])
+                    except json.JSONDecodeError:
+                        continue
+                else:
+                    break
+    return "".join(pieces)
+
+
+def incremental(body, chunk_size):
+    response, chunk_size = response_for(body, chunk_size)
+    stream = ChatStream()
+    text = "".join(stream.iter_content(response.iter_content(chunk_size=chunk_size)))
+    assert stream.done and stream.finish_reason == "stop" and stream.usage
+    return text
+
+
+def measure(decoder, body, chunk_size, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        text = decoder(body, chunk_size)
+        best = min(best, time.perf_counter() - start)
+    return text, best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compara o decodificador SSE incremental com o loop antigo")
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--chunk", type=int, default=1024, help="tamanho dos pedaços lidos da rede, em bytes")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    body = synthetic_stream(args.events)
+    print(f"{args.events} eventos, {len(body) / 1024:.0f} KiB, pedaços de {args.chunk} bytes, "
+          f"JSON: {_loads.__module__}")
+    reference, _ = measure(legacy, body, args.chunk, 1)
+    for name, decoder in [("iter_lines + json.loads", legacy), ("sse.ChatStream", incremental)]:
+        text, seconds = measure(decoder, body, args.chunk, args.repeat)
+        assert text == reference, f"{name} produziu texto diferente"
+        print(f"{name:<24} {args.events / seconds:>12,.0f} eventos/s  ({seconds * 1000:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
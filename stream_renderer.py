@@ -0,0 +1,82 @@
+"""Renderização em quadros das respostas em streaming.
+
+Chamar ``container.markdown(texto + "▌")`` a cada token reenvia pelo
+websocket a resposta inteira, que só cresce: uma resposta longa custa O(n²)
+em bytes e em trabalho do navegador. :class:`StreamRenderer` acumula os
+pedaços e só redesenha quando passaram ``interval_ms`` desde o último quadro
+ou chegaram ``max_chars`` caracteres novos, com um quadro final (sem cursor)
+ao terminar. O primeiro pedaço é desenhado na hora, para não atrasar a
+primeira palavra na tela.
+"""
+import os
+import time
+
+RENDER_INTERVAL_MS = float(os.environ.get("ENADE_RENDER_INTERVAL_MS", "100"))
+RENDER_MAX_CHARS = int(os.environ.get("ENADE_RENDER_MAX_CHARS", "400"))
+CURSOR = "▌"
+
+
+class StreamRenderer:
+    """Agrupa os pedaços do stream em quadros de ``container.markdown``"""
+
+    def __init__(self, container, interval_ms=RENDER_INTERVAL_MS, max_chars=RENDER_MAX_CHARS,
+                 cursor=CURSOR, clock=time.monotonic):
+        self.container = container
+        self.interval = interval_ms / 1000
+        self.max_chars = max_chars
+        self.cursor = cursor
+        self._clock = clock
+        self._pieces = []
+        self._length = 0
+        self._rendered_length = 0
+        self._last_frame = None
+        self.tokens = 0  # pedaços recebidos
+        self.frames = 0  # quadros enviados ao navegador
+        self.bytes_sent = 0
+
+    @property
+    def text(self):
+        if len(self._pieces) > 1:
+            self._pieces = ["".join(self._pieces)]
+        return self._pieces[0] if self._pieces else ""
+
+    def write(self, piece):
+        if not piece:
+            return
+        self._pieces.append(piece)
+        self._length += len(piece)
+        self.tokens += 1
+        now = self._clock()
+        if (self._last_frame is None or now - self._last_frame >= self.interval
+                or self._length - self._rendered_length >= self.max_chars):
+            self._render(self.text + self.cursor, now)
+
+    def consume(self, stream):
+        """Escreve todos os pedaços de ``stream`` e faz o quadro final; devolve o texto.
+
+        Se o script for interrompido no meio (rerun, desconexão), o stream é
+        fechado na hora, o que fecha também a conexão com o provedor.
+        """
+        try:
+            for piece in stream:
+                self.write(piece)
+        finally:
+            if hasattr(stream, "close"):
+                stream.close()
+        return self.finish()
+
+    def finish(self):
+        """Quadro final, sem cursor"""
+        text = self.text
+        self._render(text, self._clock())
+        return text
+
+    def _render(self, content, now):
+        self.container.markdown(content)
+        self._rendered_length = self._length
+        self._last_frame = now
+        self.frames += 1
+        self.bytes_sent += len(content.encode("utf-8"))
+
+    def stats(self):
+        return {"tokens": self.tokens, "frames": self.frames, "bytes": self.bytes_sent}
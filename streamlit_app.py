@@ -3,11 +3,13 @@
 #https://blog.streamlit.io/best-practices-for-building-genai-apps-with-streamlit/
 # From GitHub: 
 
-import streamlit as st, os, time
+import streamlit as st, os
 from google import genai
 from google.genai import types
-from PyPDF2 import PdfReader, PdfWriter, PdfMerger
 import os
+from llm_metrics import CallTimer, MetricsRegistry, format_summary
+from gemini_uploads import UploadRegistry, content_key
+from gemini_sessions import ChatSession
 
 os.environ["GOOGLE_API_KEY"] = st.secrets["GOOGLE_API_KEY"]
 
@@ -43,6 +45,124 @@ def get_clear():
     clear_button=st.sidebar.button("Start new session", key="clear")
     return clear_button
 
+
+@st.cache_resource
+def load_metrics():
+    """Per-model latency metrics shared by every session of the process"""
+    return MetricsRegistry()
+
+
+@st.cache_resource
+def load_uploads():
+    """Remote files by content hash, shared by every session of the process"""
+    return UploadRegistry(client)
+
+
+def upload_file(uploaded):
+    """Remote file for an st.file_uploader file, uploaded once per content"""
+    return load_uploads().upload(uploaded.getvalue(), uploaded.type, uploaded.name)
+
+
+def send_message(chat, message):
+    """chat.send_message with a metrics record.
+
+    Replies are not streamed, so time to first token is the full latency and
+    there is no separate connect / first-byte time.
+    """
+    timer = CallTimer("gemini", MODEL_ID)
+    response = None
+    try:
+        response = chat.send_message(message)
+        timer.token()
+        return response
+    finally:
+        usage = getattr(response, "usage_metadata", None)
+        load_metrics().record(timer.finish(
+            response is not None,
+            prompt_tokens=getattr(usage, "prompt_token_count", None),
+            completion_tokens=getattr(usage, "candidates_token_count", None),
+        ))
+
+
+def show_metrics():
+    metrics = load_metrics()
+    if metrics.models():
+        with st.sidebar.expander("📈 Latency per model"):
+            for model in metrics.models():
+                st.markdown(format_summary(model, metrics.summary(model)))
+
+
+def show_uploads():
+    stats = load_uploads().stats()
+    if stats["hits"] or stats["misses"]:
+        st.sidebar.caption(
+            f"Uploads: {stats['files']} files · {stats['hits']} reused ({stats['hit_rate']:.0%}) · "
+            f"{stats['bytes_saved'] / 2**20:,.1f} MB not re-sent"
+            + (f" · {stats['refreshes']} refreshed" if stats["refreshes"] else "")
+        )
+
+     
+def file_context(*files):
+    """Chat history that starts with the uploaded files"""
+    return [
+        types.Content(
+            role="user",
+            parts=[
+                types.Part.from_uri(file_uri=file.uri, mime_type=file.mime_type)
+                for file in files
+            ]
+        ),
+    ]
+
+
+def get_session(choice, source=None, context=(), config=None):
+    """Chat of this modality kept across reruns; a different file starts a new conversation"""
+    sessions = st.session_state.setdefault("chats", {})
+    if choice in sessions and sessions[choice][0] == source:
+        session = sessions[choice][1]
+        if session.context != list(context):
+            # Same file, re-uploaded near expiry with a new URI
+            session.rebase(context)
+        return session
+    session = ChatSession(client, MODEL_ID, config=config, context=context, send=send_message)
+    sessions[choice] = (source, session)
+    return session
+
+
+def clear_session(choice):
+    st.session_state.get("chats", {}).pop(choice, None)
+
+
+def chat_turn(session, prompt):
+    """Shows the prompt and the reply; only the new message is sent"""
+    with st.chat_message("user"):
+        st.write(prompt)
+    with st.chat_message(
+        "model", avatar="🧞‍♀️",
+    ):
+        response = session.send(prompt)
+        st.markdown(response.text)
+    # Summarising old turns only after the reply is on screen
+    session.compact()
+    show_usage(session)
+
+
+def show_usage(session):
+    """Tokens per turn from usage_metadata"""
+    if not session.usage:
+        return
+    last = session.usage[-1]
+    st.sidebar.caption(
+        f"Last turn: {last.prompt_tokens or 0:,} input / {last.reply_tokens or 0:,} output tokens"
+        + (f" ({last.cached_tokens:,} cached)" if last.cached_tokens else "")
+    )
+    st.sidebar.caption(
+        f"Conversation: {len(session.usage)} turns · "
+        f"{sum(u.prompt_tokens or 0 for u in session.usage):,} input tokens in total · "
+        f"~{session.history_tokens():,} history tokens per turn"
+        + (f" · {session.summarized} turns summarised" if session.summarized else "")
+    )
+
      
 def main():
     choice = get_choice()
@@ -51,252 +171,101 @@ def main():
         st.subheader("Ask Gemini")
         clear = get_clear()
         if clear:
-            if 'message' in st.session_state:
-                del st.session_state['message']
-    
-        if 'message' not in st.session_state:
-            st.session_state.message = " "
+            clear_session(choice)
         
         if clear not in st.session_state:
-            chat = client.chats.create(model=MODEL_ID, config=types.GenerateContentConfig(
+            chat = get_session(choice, config=types.GenerateContentConfig(
                 system_instruction="You are a helpful assistant. Your answers need to brief and concise.",))
             prompt = st.chat_input("Enter your question here")
             if prompt:
-                with st.chat_message("user"):
-                    st.write(prompt)
-        
-                st.session_state.message += prompt
-                with st.chat_message(
-                    "model", avatar="🧞‍♀️",
-                ):
-                    response = chat.send_message(st.session_state.message)
-                    st.markdown(response.text) 
-                    st.sidebar.markdown(response.usage_metadata)
-                st.session_state.message += response.text
+                chat_turn(chat, prompt)
 
     elif choice == "Chat with a PDF":
         st.subheader("Chat with your PDF file")
         clear = get_clear()
         if clear:
-            if 'message' in st.session_state:
-                del st.session_state['message']
-    
-        if 'message' not in st.session_state:
-            st.session_state.message = " "
+            clear_session(choice)
         
         if clear not in st.session_state:
             uploaded_files = st.file_uploader("Choose your pdf file", type=['pdf'], accept_multiple_files=False)
             if uploaded_files:
-                file_name=uploaded_files.name
-                file_upload = client.files.upload(file=file_name)
-                chat2 = client.chats.create(model=MODEL_ID,
-                    history=[
-                        types.Content(
-                            role="user",
-                            parts=[
-    
-                                    types.Part.from_uri(
-                                        file_uri=file_upload.uri,
-                                        mime_type=file_upload.mime_type),
-                                    ]
-                            ),
-                        ]
-                        )
+                file_upload = upload_file(uploaded_files)
+                chat2 = get_session(choice, uploaded_files.file_id, file_context(file_upload))
                 prompt2 = st.chat_input("Enter your question here")
                 if prompt2:
-                    with st.chat_message("user"):
-                        st.write(prompt2)
-            
-                    st.session_state.message += prompt2
-                    with st.chat_message(
-                        "model", avatar="🧞‍♀️",
-                    ):
-                        response2 = chat2.send_message(st.session_state.message)
-                        st.markdown(response2.text)
-                        st.sidebar.markdown(response2.usage_metadata)
-                    st.session_state.message += response2.text
+                    chat_turn(chat2, prompt2)
                     
     elif choice == "Chat with many PDFs":
         st.subheader("Chat with your PDF file")
         clear = get_clear()
         if clear:
-            if 'message' in st.session_state:
-                del st.session_state['message']
-    
-        if 'message' not in st.session_state:
-            st.session_state.message = " "
+            clear_session(choice)
         
         if clear not in st.session_state:
         
             uploaded_files2 = st.file_uploader("Choose 1 or more files",  type=['pdf'], accept_multiple_files=True)
                
             if uploaded_files2:
-                merger = PdfMerger()
-                for file in uploaded_files2:
-                        merger.append(file)
-    
-                fullfile = "merged_all_files.pdf"
-                merger.write(fullfile)
-                merger.close()
-
-                file_upload = client.files.upload(file=fullfile) 
-                chat2b = client.chats.create(model=MODEL_ID,
-                    history=[
-                        types.Content(
-                            role="user",
-                            parts=[
-    
-                                    types.Part.from_uri(
-                                        file_uri=file_upload.uri,
-                                        mime_type=file_upload.mime_type),
-                                    ]
-                            ),
-                        ]
-                        )
+                # One part per PDF instead of a merged file on disk: each PDF is uploaded
+                # once (concurrently), so adding a PDF only uploads the new one
+                contents = [file.getvalue() for file in uploaded_files2]
+                file_uploads = load_uploads().upload_many(
+                    (data, "application/pdf", file.name) for data, file in zip(contents, uploaded_files2)
+                )
+                # The conversation follows the set of PDFs, whatever order they were selected in
+                chat2b = get_session(choice, tuple(sorted(content_key(data) for data in contents)),
+                                     file_context(*file_uploads))
                 prompt2b = st.chat_input("Enter your question here")
                 if prompt2b:
-                    with st.chat_message("user"):
-                        st.write(prompt2b)
-            
-                    st.session_state.message += prompt2b
-                    with st.chat_message(
-                        "model", avatar="🧞‍♀️",
-                    ):
-                        response2b = chat2b.send_message(st.session_state.message)
-                        st.markdown(response2b.text)
-                        st.sidebar.markdown(response2b.usage_metadata)
-                    st.session_state.message += response2b.text
+                    chat_turn(chat2b, prompt2b)
             
     elif choice == "Chat with an image":
         st.subheader("Chat with your PDF file")
         clear = get_clear()
         if clear:
-            if 'message' in st.session_state:
-                del st.session_state['message']
-    
-        if 'message' not in st.session_state:
-            st.session_state.message = " "
+            clear_session(choice)
         
         if clear not in st.session_state:
             uploaded_files2 = st.file_uploader("Choose your PNG or JPEG file",  type=['png','jpg'], accept_multiple_files=False)
             if uploaded_files2:
-                file_name2=uploaded_files2.name
-                file_upload = client.files.upload(file=file_name2)
-                chat3 = client.chats.create(model=MODEL_ID,
-                    history=[
-                        types.Content(
-                            role="user",
-                            parts=[
-    
-                                    types.Part.from_uri(
-                                        file_uri=file_upload.uri,
-                                        mime_type=file_upload.mime_type),
-                                    ]
-                            ),
-                        ]
-                        )
+                file_upload = upload_file(uploaded_files2)
+                chat3 = get_session(choice, uploaded_files2.file_id, file_context(file_upload))
                 prompt3 = st.chat_input("Enter your question here")
                 if prompt3:
-                    with st.chat_message("user"):
-                        st.write(prompt3)
-            
-                    st.session_state.message += prompt3
-                    with st.chat_message(
-                        "model", avatar="🧞‍♀️",
-                    ):
-                        response3 = chat3.send_message(st.session_state.message)
-                        st.markdown(response3.text)
-                    st.session_state.message += response3.text
+                    chat_turn(chat3, prompt3)
                 
     elif choice == "Chat with audio":
         st.subheader("Chat with your audio file")
         clear = get_clear()
         if clear:
-            if 'message' in st.session_state:
-                del st.session_state['message']
-    
-        if 'message' not in st.session_state:
-            st.session_state.message = " "
+            clear_session(choice)
         
         if clear not in st.session_state:
             uploaded_files3 = st.file_uploader("Choose your mp3 or wav file",  type=['mp3','wav'], accept_multiple_files=False)
             if uploaded_files3:
-                file_name3=uploaded_files3.name
-                file_upload = client.files.upload(file=file_name3)
-                chat4 = client.chats.create(model=MODEL_ID,
-                    history=[
-                        types.Content(
-                            role="user",
-                            parts=[
-    
-                                    types.Part.from_uri(
-                                        file_uri=file_upload.uri,
-                                        mime_type=file_upload.mime_type),
-                                    ]
-                            ),
-                        ]
-                        )
+                file_upload = upload_file(uploaded_files3)
+                chat4 = get_session(choice, uploaded_files3.file_id, file_context(file_upload))
                 prompt5 = st.chat_input("Enter your question here")
                 if prompt5:
-                    with st.chat_message("user"):
-                        st.write(prompt5)
-            
-                    st.session_state.message += prompt5
-                    with st.chat_message(
-                        "model", avatar="🧞‍♀️",
-                    ):
-                        response4 = chat4.send_message(st.session_state.message)
-                        st.markdown(response4.text)
-                    st.session_state.message += response4.text
+                    chat_turn(chat4, prompt5)
 
     elif choice == "Chat with video":
         st.subheader("Chat with your video file")
         clear = get_clear()
         if clear:
-            if 'message' in st.session_state:
-                del st.session_state['message']
-    
-        if 'message' not in st.session_state:
-            st.session_state.message = " "
+            clear_session(choice)
         
         if clear not in st.session_state:
             uploaded_files4 = st.file_uploader("Choose your mp4 or mov file",  type=['mp4','mov'], accept_multiple_files=False)
             
             if uploaded_files4:
-                file_name4=uploaded_files4.name
-                video_file = client.files.upload(file=file_name4)
-                while video_file.state == "PROCESSING":
-                    time.sleep(10)
-                    video_file = client.files.get(name=video_file.name)
-                
-                if video_file.state == "FAILED":
-                  raise ValueError(video_file.state)
+                # Waits for PROCESSING only on the first upload of this video
+                video_file = upload_file(uploaded_files4)
                 
-                chat5 = client.chats.create(model=MODEL_ID,
-                    history=[
-                        types.Content(
-                            role="user",
-                            parts=[
-    
-                                    types.Part.from_uri(
-                                        file_uri=video_file.uri,
-                                        mime_type=video_file.mime_type),
-                                    ]
-                            ),
-                        ]
-                        )
+                chat5 = get_session(choice, uploaded_files4.file_id, file_context(video_file))
                 prompt4 = st.chat_input("Enter your question here")
                 if prompt4:
-                    with st.chat_message("user"):
-                        st.write(prompt4)
-            
-                    st.session_state.message += prompt4
-                    with st.chat_message(
-                        "model", avatar="🧞‍♀️",
-                    ):
-                        response5 = chat5.send_message(st.session_state.message)
-                        st.markdown(response5.text)
-                    st.session_state.message += response5.text
+                    chat_turn(chat5, prompt4)
                     
                 
 if __name__ == '__main__':
@@ -305,4 +274,6 @@ if __name__ == '__main__':
     client = genai.Client(api_key=api_key)
     #MODEL_ID = "gemini-2.0-flash-001"
     MODEL_ID = "gemini-2.5-flash-lite"
-    main()
\ No newline at end of file
+    main()
+    show_metrics()
+    show_uploads()
\ No newline at end of file
@@ -1,15 +1,39 @@
 import streamlit as st
 import requests
-import json
 import os
 import regex as re
 import pandas as pd
-import PyPDF2
-from io import BytesIO
 import time
 from datetime import datetime
 import hashlib
 
+from exam_documents import build_chat_context, build_summary_context, load_documents
+from intent_router import route_query
+from conversation_memory import ConversationMemory, resolve_followup
+from retrieval import reciprocal_rank_fusion
+from vector_index import VectorIndex, get_embedder
+from hedged_router import Endpoint, HedgedRouter
+from model_cascade import CASCADE_LABEL, CASCADE_TIERS, REASONS, ModelCascade, format_cascade
+from llm_client import LLMClient, chat_url
+from cancellation import ABANDONED, supersede
+from llm_metrics import CallTimer, MetricsRegistry, format_summary
+from sse import ChatStream
+from stream_renderer import StreamRenderer
+from answer_cache import AnswerCache, cached_stream, make_key, replay
+from semantic_cache import SemanticCache
+from context_packer import context_budget, context_window, count_message_tokens
+from precomputed_answers import PrecomputedAnswers, store_mtime
+from prompts import (
+    PEDIDO_RESUMO,
+    RESUMO_MAX_TOKENS,
+    RESUMO_TEMPERATURE,
+    SUGESTOES,
+    chat_messages,
+    memory_messages,
+    summary_messages,
+    templates_hash,
+)
+
 # Configuração da página
 st.set_page_config(
     page_title="📊 ENADE CC 2017 - DAIA", 
@@ -85,6 +109,8 @@ if 'documentos_carregados' not in st.session_state:
     st.session_state.documentos_carregados = False
 if 'total_perguntas' not in st.session_state:
     st.session_state.total_perguntas = 0
+if 'memoria' not in st.session_state:
+    st.session_state.memoria = ConversationMemory()
 if 'sessao_id' not in st.session_state:
     st.session_state.sessao_id = hashlib.md5(str(time.time()).encode()).hexdigest()[:8]
 
@@ -92,53 +118,36 @@ if 'sessao_id' not in st.session_state:
 @st.cache_resource
 def load_all_documents():
     """Carrega e processa todos os documentos PDF disponíveis"""
-    docs = {}
-    files = {
-        "Prova": "2017 - Questoes.pdf",
-        "Gabarito (QO)": "2017 - BCC - gb.pdf", 
-        "Padrões de Resposta (QD)": "2017 - Padroes de Resposta.pdf"
-    }
-    
-    full_text = ""
-    arquivos_encontrados = []
-    arquivos_faltando = []
-    
-    for name, path in files.items():
-        if os.path.exists(path):
-            try:
-                with open(path, "rb") as f:
-                    pdf = PyPDF2.PdfReader(f)
-                    num_pages = len(pdf.pages)
-                    text = f"\n\n--- DOCUMENTO: {name} ({num_pages} páginas) ---\n\n"
-                    
-                    for i, page in enumerate(pdf.pages):
-                        try:
-                            page_text = page.extract_text()
-                            if page_text.strip():  # Só adiciona se tiver conteúdo
-                                text += f"[Página {i+1}]\n{page_text}\n\n"
-                        except Exception as e:
-                            st.warning(f"Erro ao extrair página {i+1} de {name}: {e}")
-                    
-                    full_text += text + "\n\n"
-                    arquivos_encontrados.append(f"{name} ({num_pages} páginas)")
-                    
-            except Exception as e:
-                st.error(f"Erro ao processar {path}: {e}")
-                arquivos_faltando.append(f"{name} (erro: {e})")
-        else:
-            arquivos_faltando.append(f"{name} (não encontrado)")
-    
-    return {
-        'text': full_text[:150000],  # Limite para contexto
-        'arquivos_ok': arquivos_encontrados,
-        'arquivos_erro': arquivos_faltando,
-        'total_chars': len(full_text)
-    }
+    return load_documents(on_warning=st.warning, on_error=st.error)
+
+@st.cache_resource
+def load_llm_client():
+    """Cliente HTTP com pool de conexões keep-alive, compartilhado por reruns e sessões"""
+    client = LLMClient()
+    # Abre a conexão com a API em segundo plano, antes da primeira pergunta
+    client.warm_in_background(["openai"])
+    return client
+
+@st.cache_resource
+def load_metrics():
+    """Métricas de latência por modelo, compartilhadas por todas as sessões do processo"""
+    return MetricsRegistry()
+
+@st.cache_resource
+def load_router():
+    """Hedge/failover entre provedores; o histórico de 1º token por endpoint vale para todas as sessões"""
+    return HedgedRouter(load_llm_client(), load_metrics())
+
+@st.cache_resource
+def load_cascade():
+    """Cascata gpt-3.5-turbo → gpt-4; taxas de aceite por degrau valem para todas as sessões"""
+    return ModelCascade(metrics=load_metrics())
 
 # Função para chamar a OpenAI GPT-4 API
-def gpt4_chat(messages, api_key, model="gpt-4", temperature=0.5, max_tokens=2000):
-    """Chama a API da OpenAI GPT-4 com tratamento de erros melhorado"""
-    endpoint = "https://api.openai.com/v1/chat/completions"
+def gpt4_chat(messages, api_key, model="gpt-4", temperature=0.5, max_tokens=2000, stream_info=None, cancel=None,
+              on_error=st.error):
+    """Chama a API da OpenAI GPT-4 com tratamento de erros melhorado (mensagens de erro vão para ``on_error``)"""
+    endpoint = chat_url("openai")
     headers = {
         "Authorization": f"Bearer {api_key}",
         "Content-Type": "application/json"
@@ -148,48 +157,183 @@ def gpt4_chat(messages, api_key, model="gpt-4", temperature=0.5, max_tokens=2000
         "messages": messages,
         "temperature": temperature,
         "max_tokens": max_tokens,
-        "stream": True
+        "stream": True,
+        # Último evento traz a contagem de tokens feita pela API
+        "stream_options": {"include_usage": True}
     }
     
+    # Fases da chamada (conexão, 1º byte, 1º token), registradas no fim mesmo com erro
+    timer = CallTimer("openai", model)
+    registro = None
+    stream = ChatStream()
+    cancelado = None
     try:
-        response = requests.post(endpoint, headers=headers, json=payload, stream=True, timeout=60)
+        # Conexão keep-alive do pool compartilhado (sem novo handshake TLS a cada pergunta)
+        with load_llm_client().stream(endpoint, headers, payload) as response:
+            timer.response(response.timings)
+            if cancel is not None:
+                # Stream parado à espera de bytes não chegaria a conferir o token: derruba a conexão
+                cancel.on_cancel(response.abort)
         
-        if response.status_code != 200:
-            error_detail = ""
-            try:
-                error_data = response.json()
-                error_detail = error_data.get('error', {}).get('message', response.text)
-            except:
-                error_detail = response.text
+            if response.status_code != 200:
+                error_detail = ""
+                try:
+                    error_data = response.json()
+                    error_detail = error_data.get('error', {}).get('message', response.text)
+                except:
+                    error_detail = response.text
             
-            st.error(f"❌ Erro na API OpenAI ({response.status_code}): {error_detail}")
-            return
+                on_error(f"❌ Erro na API OpenAI ({response.status_code}): {error_detail}")
+                return
         
-        for line in response.iter_lines():
-            if line:
-                decoded_line = line.decode('utf-8')
-                if decoded_line.startswith("data: "):
-                    json_data = decoded_line[6:]
-                    if json_data != "[DONE]":
-                        try:
-                            event_data = json.loads(json_data)
-                            if "choices" in event_data and len(event_data["choices"]) > 0:
-                                delta = event_data["choices"][0].get("delta", {})
-                                if "content" in delta:
-                                    yield delta["content"]
-                        except json.JSONDecodeError:
-                            continue
-                            
+            try:
+                for content in stream.iter_content(response.iter_bytes()):
+                    if cancel is not None and cancel.cancelled:
+                        # Resposta substituída por uma pergunta nova: fecha a conexão sem ler o resto
+                        cancelado = cancel.reason
+                        return
+                    timer.token()
+                    yield content
+            except Exception:
+                if cancel is None or not cancel.cancelled:
+                    raise
+                # Leitura interrompida pelo abort do cancelamento: não é erro da API
+                cancelado = cancel.reason
+                return
+            if stream.error:
+                erro = stream.error.get('message', stream.error) if isinstance(stream.error, dict) else stream.error
+                on_error(f"❌ Erro no meio da resposta: {erro}")
+            # Sem usage da API: estimativa local do prompt e um token por evento
+            uso = stream.usage or {}
+            registro = timer.finish(
+                stream.done,
+                prompt_tokens=uso["prompt_tokens"] if "prompt_tokens" in uso else count_message_tokens(messages, model),
+                completion_tokens=uso.get("completion_tokens", stream.events),
+                finish_reason=stream.finish_reason,
+            )
+            if stream_info is not None:
+                stream_info.update(finish_reason=stream.finish_reason, usage=stream.usage,
+                                   malformed=stream.malformed, metrics=registro)
+            # Stream completo: sinaliza ao cache que a resposta pode ser guardada
+            return stream.done
+
+    except GeneratorExit:
+        # Rerun, desconexão ou consumidor que parou de ler; o with já fechou a resposta
+        cancelado = ABANDONED
+        raise
+    except requests.exceptions.Timeout:
+        on_error("⏰ Timeout na API. Tente novamente com uma pergunta mais específica.")
+    except requests.exceptions.ConnectionError:
+        on_error("🌐 Erro de conexão. Verifique sua internet.")
+    except Exception as e:
+        on_error(f"❌ Erro inesperado: {str(e)}")
+    finally:
+        if registro is None:
+            gerados = stream.events
+            economizados = None
+            if cancelado:
+                # Quanto uma resposta típica deste modelo ainda teria gerado
+                economizados = max(0, load_metrics().expected_completion_tokens(model, max_tokens) - gerados)
+            registro = timer.finish(False, completion_tokens=gerados or None,
+                                    cancelled=cancelado, tokens_saved=economizados)
+        load_metrics().record(registro)
+
+@st.cache_resource
+def load_answer_cache():
+    """Cache de respostas compartilhado por todas as sessões do processo"""
+    return AnswerCache()
+
+@st.cache_resource(max_entries=1)
+def load_precomputed_answers(documents_hash, mtime):
+    """Respostas das sugestões geradas no deploy por precompute_suggestions.py.
+
+    ``mtime`` do arquivo entra na chave do cache: uma nova geração é lida sem reiniciar o app.
+    """
+    return PrecomputedAnswers.load(documents_hash, templates_hash())
+
+@st.cache_resource
+def load_semantic_cache(embedder_spec):
+    """Cache semântico (perguntas parecidas) compartilhado por todas as sessões"""
+    return SemanticCache(get_embedder(embedder_spec))
+
+@st.cache_resource
+def load_vector_index(embedder_spec, _chunks):
+    """Índice vetorial dos trechos (matriz de embeddings salva em .cache/vectors)"""
+    return VectorIndex.build(_chunks, get_embedder(embedder_spec))
+
+def buscar_trechos(pergunta, k):
+    """Trechos mais relevantes segundo o modo de busca escolhido na barra lateral"""
+    lexical = dados_documentos['busca']
+    if modo_busca == "Lexical (BM25)":
+        return lexical.search(pergunta, k=k)
+    vetorial = load_vector_index(os.environ.get("ENADE_EMBEDDER", "hashing"), lexical.chunks)
+    if modo_busca == "Semântica":
+        return vetorial.search(pergunta, k=k)
+    return reciprocal_rank_fusion([lexical.search(pergunta, k=k), vetorial.search(pergunta, k=k)], k=k)
+
+def montar_contexto(pergunta, orcamento, modelo=None):
+    """Questões citadas na pergunta e trechos mais relevantes, até ``orcamento`` tokens do modelo"""
+    return build_chat_context(dados_documentos, pergunta, orcamento, modelo or model, buscar=buscar_trechos)
+
+def montar_contexto_resumo(orcamento, modelo=None):
+    """Enunciados de todas as questões em ordem, até ``orcamento`` tokens do modelo"""
+    return build_summary_context(dados_documentos, orcamento, modelo or model)
+
+def resumir_conversa(resumo_anterior, turnos):
+    """Atualiza o resumo acumulado da conversa (memória do chat) com o próprio modelo"""
+    return "".join(gpt4_chat(memory_messages(resumo_anterior, turnos), api_key, model=modelo_resumo, temperature=0.0, max_tokens=400))
+
+def chat_com_failover(messages, endpoints, temperature, max_tokens, stream_info=None, cancel=None, on_error=st.error):
+    """Pergunta ao primeiro endpoint com hedge/failover para o segundo (ver hedged_router.py)"""
+    info = stream_info if stream_info is not None else {}
+    try:
+        completa = yield from load_router().stream(endpoints, messages, temperature, max_tokens, info=info, cancel=cancel)
+        # Resposta do provedor reserva não entra no cache do primário
+        return completa and info.get("endpoint") == endpoints[0].name
     except requests.exceptions.Timeout:
-        st.error("⏰ Timeout na API. Tente novamente com uma pergunta mais específica.")
+        on_error("⏰ Timeout na API. Tente novamente com uma pergunta mais específica.")
     except requests.exceptions.ConnectionError:
-        st.error("🌐 Erro de conexão. Verifique sua internet.")
+        on_error("🌐 Erro de conexão. Verifique sua internet.")
     except Exception as e:
-        st.error(f"❌ Erro inesperado: {str(e)}")
+        on_error(f"❌ Erro inesperado: {str(e)}")
+
+def chamar_modelo(modelo, messages, temperature, max_tokens, stream_info=None, cancel=None, on_error=st.error):
+    """Stream de um modelo: direto do openai ou, com a chave reserva configurada, pelo roteador"""
+    if chave_reserva:
+        endpoints = [Endpoint("openai", modelo, api_key), Endpoint("deepseek", modelo_reserva, chave_reserva)]
+        return chat_com_failover(messages, endpoints, temperature, max_tokens, stream_info=stream_info, cancel=cancel,
+                                 on_error=on_error)
+    return gpt4_chat(messages=messages, api_key=api_key, model=modelo, temperature=temperature,
+                     max_tokens=max_tokens, stream_info=stream_info, cancel=cancel, on_error=on_error)
+
+def responder(messages, temperature, max_tokens, stream_info=None, cancel=None, pergunta="", mensagens_do_degrau=None):
+    """Stream da resposta do modelo escolhido ou, na cascata, do mais barato que passar na checagem.
+
+    Na cascata, ``mensagens_do_degrau(modelo)`` devolve as mensagens com o
+    contexto do tamanho da janela de cada degrau (sem ela, vale ``messages``).
+    """
+    if cascata:
+        def degrau(modelo, info):
+            rascunho = modelo != CASCADE_TIERS[-1]
+            return chamar_modelo(
+                modelo, mensagens_do_degrau(modelo) if mensagens_do_degrau else messages, temperature, max_tokens,
+                stream_info=info, cancel=cancel,
+                # Erro no rascunho não vai para a tela: a cascata registra o motivo e escala
+                on_error=(lambda erro: info.update(error=erro)) if rascunho else st.error,
+            )
+        return load_cascade().stream(
+            degrau, pergunta, dados_documentos['questoes'], dados_documentos['gabarito'], info=stream_info, cancel=cancel,
+        )
+    return chamar_modelo(model, messages, temperature, max_tokens, stream_info=stream_info, cancel=cancel)
 
 # Carregar documentos
 with st.spinner("🔄 Carregando documentos..."):
     dados_documentos = load_all_documents()
+    cache_respostas = load_answer_cache()
+    respostas_prontas = load_precomputed_answers(
+        dados_documentos['sha256'], store_mtime(dados_documentos['sha256'], templates_hash()))
+    cache_semantico = load_semantic_cache(os.environ.get("ENADE_EMBEDDER", "hashing"))
+    metricas = load_metrics()
     st.session_state.documentos_carregados = True
 
 # Sidebar melhorada
@@ -210,10 +354,21 @@ with st.sidebar:
     
     model = st.selectbox(
         "Modelo GPT", 
-        options=["gpt-4", "gpt-4-turbo-preview", "gpt-3.5-turbo"], 
+        options=[CASCADE_LABEL, "gpt-4", "gpt-4-turbo-preview", "gpt-3.5-turbo"], 
         index=0,
-        help="gpt-4: melhor qualidade\ngpt-4-turbo: mais rápido\ngpt-3.5-turbo: mais econômico"
+        help="cascata: responde com o gpt-3.5-turbo e só passa ao gpt-4 quando a resposta não se confirma nos documentos\n"
+             "gpt-4: melhor qualidade\ngpt-4-turbo: mais rápido\ngpt-3.5-turbo: mais econômico"
     )
+    # Cache e métricas usam o nome escolhido; contexto e contagem de tokens, o degrau
+    # de menor janela (cada degrau da cascata recebe depois o contexto da própria janela)
+    modelo_escolhido = model
+    cascata = model == CASCADE_LABEL
+    if cascata:
+        model = min(CASCADE_TIERS, key=context_window)
+    # Memória da conversa resumida pelo modelo mais barato da cascata
+    modelo_resumo = CASCADE_TIERS[0] if cascata else model
+    # precompute_suggestions.py gera por modelo; na cascata vale a resposta do último degrau
+    modelo_pronto = CASCADE_TIERS[-1] if cascata else model
     
     temperature = st.slider(
         "Criatividade", 
@@ -227,6 +382,26 @@ with st.sidebar:
         help="Máximo de tokens na resposta"
     )
     
+    with st.expander("🛟 Failover para DeepSeek"):
+        chave_reserva = st.text_input(
+            "DeepSeek API Key (reserva)",
+            type="password",
+            help="Se o 1º token demorar além do prazo, a pergunta também vai para a reserva e vale a resposta que começar primeiro"
+        ) or os.environ.get("DEEPSEEK_API_KEY", "")
+        modelo_reserva = st.selectbox("Modelo reserva", options=["deepseek-chat", "deepseek-coder"], index=0)
+        for nome_endpoint, saude in load_router().status().items():
+            st.caption(
+                f"{nome_endpoint}: " + (f"1º token p95 {saude['p95']:,.0f} ms" if saude['p95'] is not None else "sem amostras")
+                + (" · ⚠️ rebaixado" if saude['demoted'] else "")
+            )
+    
+    modo_busca = st.radio(
+        "Busca nos documentos",
+        options=["Lexical (BM25)", "Semântica", "Híbrida"],
+        index=0,
+        help="Lexical: termos da pergunta\nSemântica: similaridade de embeddings (ENADE_EMBEDDER)\nHíbrida: combina as duas"
+    )
+    
     st.divider()
     
     # Status dos documentos
@@ -255,7 +430,28 @@ with st.sidebar:
         st.metric("Docs", len(dados_documentos['arquivos_ok']))
     
     st.caption(f"Sessão: {st.session_state.sessao_id}")
-    st.caption(f"Contexto: {dados_documentos['total_chars']:,} chars")
+    estatisticas_cache = cache_respostas.stats()
+    st.caption(
+        f"Cache de respostas: {len(cache_respostas):,} guardadas · "
+        f"{estatisticas_cache['hits']} acertos ({estatisticas_cache['hit_rate']:.0%})"
+    )
+    estatisticas_semantico = cache_semantico.stats()
+    st.caption(
+        f"Cache semântico: {len(cache_semantico):,} perguntas · "
+        f"{estatisticas_semantico['hits']} acertos ({estatisticas_semantico['hit_rate']:.0%})"
+    )
+    if st.session_state.get('ultimo_uso_tokens'):
+        tokens_usados, janela = st.session_state.ultimo_uso_tokens
+        st.caption(f"Último prompt: {tokens_usados:,} de {janela:,} tokens")
+    else:
+        st.caption(f"Janela do modelo: {context_window(model):,} tokens")
+    if cascata and load_cascade().answers:
+        with st.expander("🪜 Cascata de modelos"):
+            st.markdown(format_cascade(load_cascade().summary()))
+    if metricas.models():
+        with st.expander("📈 Latência por modelo"):
+            for nome_modelo in metricas.models():
+                st.markdown(format_summary(nome_modelo, metricas.summary(nome_modelo)))
     
     # Botões de ação
     st.divider()
@@ -264,6 +460,7 @@ with st.sidebar:
     
     if st.button("🗑️ Limpar Histórico", use_container_width=True):
         st.session_state.historico = []
+        st.session_state.memoria.reset()
         st.session_state.total_perguntas = 0
         st.rerun()
     
@@ -292,16 +489,8 @@ with tab1:
     # Sugestões de perguntas
     if not st.session_state.historico:
         st.markdown("**💡 Perguntas sugeridas:**")
-        sugestoes = [
-            "Quantas questões a prova possui e como estão distribuídas?",
-            "Quais são os principais temas abordados nas questões de algoritmos?",
-            "Analise as questões discursivas e seus padrões de resposta",
-            "Qual o nível de dificuldade geral da prova?",
-            "Compare as questões de formação geral vs específicas"
-        ]
-        
         cols = st.columns(2)
-        for i, sugestao in enumerate(sugestoes):
+        for i, sugestao in enumerate(SUGESTOES):
             with cols[i % 2]:
                 if st.button(f"💭 {sugestao}", key=f"sug_{i}", use_container_width=True):
                     st.session_state.pergunta_sugerida = sugestao
@@ -328,11 +517,28 @@ with tab1:
     if pergunta_inicial:
         st.session_state.pergunta_sugerida = None
     
-    if prompt := st.chat_input("Digite sua pergunta sobre a prova ENADE CC 2017...", key="chat_input"):
-        if not api_key:
+    # Um clique em uma sugestão vale como pergunta digitada
+    if prompt := (st.chat_input("Digite sua pergunta sobre a prova ENADE CC 2017...", key="chat_input") or pergunta_inicial):
+        # "e a seguinte?" ganha o número da questão a que se refere
+        prompt = resolve_followup(prompt, st.session_state.historico)
+        
+        # Consultas simples (enunciado, gabarito, padrão de resposta, contagens e
+        # listagens) são respondidas direto das estruturas carregadas, sem chamar a API
+        inicio_rota = time.perf_counter()
+        rota = route_query(
+            prompt,
+            dados_documentos['questoes'],
+            dados_documentos['gabarito'],
+            dados_documentos['padroes'],
+        )
+        
+        if not api_key and not rota.direct:
             st.error("🔑 Por favor, configure sua API key da OpenAI na barra lateral")
             st.stop()
             
+        # Uma resposta ainda em andamento nesta sessão é cancelada pela nova pergunta
+        cancelamento = supersede(st.session_state)
+        
         # Incrementar contador
         st.session_state.total_perguntas += 1
         
@@ -342,119 +548,173 @@ with tab1:
         with st.chat_message("user"):
             st.markdown(prompt)
         
-        # Preparar contexto melhorado
-        contexto_sistema = f"""
-        Você é um especialista em análise do ENADE de Ciência da Computação 2017. 
-        
-        DOCUMENTOS DISPONÍVEIS:
-        {dados_documentos['text'][:15000]}... [contexto completo carregado]
-        
-        INSTRUÇÕES:
-        - Responda com base APENAS nos documentos fornecidos
-        - Seja preciso e educativo
-        - Cite números de questões quando relevante  
-        - Use formatação markdown para melhor legibilidade
-        - Se não souber algo, seja honesto
-        """
-        
-        messages = [
-            {"role": "system", "content": contexto_sistema},
-            {"role": "user", "content": f"Pergunta: {prompt}"}
-        ]
+        if rota.direct:
+            with st.chat_message("assistant"):
+                st.markdown(rota.reply)
+                tempo_rota = (time.perf_counter() - inicio_rota) * 1000
+                st.caption(f"⚡ Respondido direto dos documentos oficiais em {tempo_rota:.1f} ms ({rota.intent}), sem chamar a IA")
+            st.session_state.historico.append(("assistant", rota.reply))
+        else:
+            # Preparar contexto melhorado
+            # Turnos anteriores (sem a pergunta atual), com os mais antigos resumidos
+            memoria = st.session_state.memoria
+            memoria.fit(st.session_state.historico[:-1], model, summarize=resumir_conversa)
+            memoria_msgs = memoria.messages()
+            messages = chat_messages(prompt, memoria=memoria_msgs)
+            # O contexto ocupa o que sobra da janela depois da resposta e das mensagens
+            contexto = montar_contexto(prompt, context_budget(model, max_tokens, messages))
+            messages = chat_messages(prompt, contexto.text, memoria_msgs)
+            tokens_prompt = count_message_tokens(messages, model)
+            st.session_state.ultimo_uso_tokens = (tokens_prompt, context_window(model))
+            chave = make_key(
+                "openai", modelo_escolhido, temperature, prompt,
+                "\0".join(m["content"] for m in messages[:-1]) + f"\0max_tokens={max_tokens}",
+            )
+            # Perguntas sugeridas já respondidas no deploy saem direto do arquivo pré-calculado
+            # (só no início da conversa, com os mesmos parâmetros e a busca lexical usados na geração)
+            pronta = None
+            if not memoria_msgs and modo_busca == "Lexical (BM25)":
+                pronta = respostas_prontas.get("openai", modelo_pronto, prompt, temperature, max_tokens)
+            em_cache = pronta is None and chave in cache_respostas
+            # Sem acerto exato, tenta uma pergunta já respondida com outra redação
+            # (só no início da conversa: depois, a resposta depende dos turnos anteriores)
+            escopo = ("openai", modelo_escolhido, temperature, max_tokens)
+            similar = None if pronta is not None or em_cache or memoria_msgs else cache_semantico.lookup(escopo, prompt)
+
+            def mensagens_do_degrau(modelo):
+                """Mensagens com o contexto cortado pela janela do degrau da cascata que vai responder"""
+                if context_window(modelo) == context_window(model):
+                    return messages
+                base = chat_messages(prompt, memoria=memoria_msgs)
+                contexto_degrau = montar_contexto(prompt, context_budget(modelo, max_tokens, base), modelo)
+                return chat_messages(prompt, contexto_degrau.text, memoria_msgs)
         
-        # Gerar resposta com streaming
-        with st.chat_message("assistant"):
-            resposta_container = st.empty()
-            resposta_completa = ""
+            # Gerar resposta com streaming
+            with st.chat_message("assistant"):
+                resposta_container = st.empty()
+                resposta_completa = ""
             
-            start_time = time.time()
+                start_time = time.time()
+                # Preenchido pelo stream do modelo: finish_reason e tokens contados pela API
+                info_stream = {}
             
-            try:
-                with st.spinner("🤔 Analisando documentos..."):
-                    for chunk in gpt4_chat(
-                        messages=messages,
-                        api_key=api_key,
-                        model=model,
-                        temperature=temperature,
-                        max_tokens=max_tokens
-                    ):
-                        if chunk:
-                            resposta_completa += chunk
-                            resposta_container.markdown(resposta_completa + "▌")
+                try:
+                    with st.spinner("🤔 Analisando documentos..."):
+                        if pronta is not None:
+                            resposta_stream = metricas.track(replay(pronta), "openai", modelo_pronto, "pre-calculada")
+                        elif similar is not None:
+                            resposta_stream = metricas.track(replay(similar.answer), "openai", modelo_escolhido, "semantico")
+                        else:
+                            resposta_stream = cached_stream(
+                                cache_respostas,
+                                chave,
+                                lambda: responder(
+                                    messages,
+                                    temperature,
+                                    max_tokens,
+                                    stream_info=info_stream,
+                                    cancel=cancelamento,
+                                    pergunta=prompt,
+                                    mensagens_do_degrau=mensagens_do_degrau
+                                ),
+                                provider="openai",
+                                model=modelo_escolhido,
+                            )
+                            if em_cache:
+                                # Nas respostas novas, quem registra as métricas é o gpt4_chat
+                                resposta_stream = metricas.track(resposta_stream, "openai", modelo_escolhido, "hit")
+                        # Redesenha em quadros (não a cada token); o último quadro vai sem cursor
+                        renderer = StreamRenderer(resposta_container)
+                        resposta_completa = renderer.consume(resposta_stream)
                 
-                # Resposta final sem cursor
-                resposta_container.markdown(resposta_completa)
+                    # Adicionar ao histórico
+                    st.session_state.historico.append(("assistant", resposta_completa))
+                    # Só respostas completas (guardadas no cache exato) viram referência para o semântico
+                    if pronta is None and similar is None and not em_cache and not memoria_msgs and chave in cache_respostas:
+                        cache_semantico.add(escopo, prompt, resposta_completa)
                 
-                # Adicionar ao histórico
-                st.session_state.historico.append(("assistant", resposta_completa))
+                    if info_stream.get("finish_reason") == "length":
+                        st.warning("✂️ Resposta cortada no limite de tokens; aumente o máximo de tokens na barra lateral")
+                    uso = info_stream.get("usage")
+                    if uso:
+                        # Contagem exata da API no lugar da estimativa local
+                        tokens_prompt = uso.get("prompt_tokens", tokens_prompt)
+                        st.session_state.ultimo_uso_tokens = (tokens_prompt, context_window(info_stream.get('tier', model)))
                 
-                # Mostrar tempo de resposta
-                tempo_resposta = time.time() - start_time
-                st.caption(f"⏱️ Respondido em {tempo_resposta:.1f}s com {model}")
+                    # Mostrar tempo de resposta
+                    tempo_resposta = time.time() - start_time
+                    st.caption(
+                        f"⏱️ Respondido em {tempo_resposta:.1f}s com {info_stream.get('tier', modelo_escolhido)} · "
+                        f"{tokens_prompt:,} tokens de entrada ({contexto.tokens:,} de contexto, "
+                        f"{memoria.tokens(model):,} de memória, "
+                        f"{contexto.included} trechos)"
+                        + (" · ♻️ resposta do cache" if em_cache else "")
+                        + (" · 📦 resposta pré-calculada" if pronta is not None else "")
+                        + (f" · {uso['completion_tokens']:,} tokens gerados" if uso and "completion_tokens" in uso else "")
+                        + f" · {renderer.frames} quadros para {renderer.tokens} pedaços"
+                        + (f" · 1º token em {info_stream['metrics'].ttft_ms:,.0f} ms"
+                           if info_stream.get("metrics") and info_stream["metrics"].ttft_ms is not None else "")
+                    )
+                    if info_stream.get("escalations"):
+                        st.caption("🪜 Escalado para " + info_stream['tier'] + ": " + "; ".join(
+                            f"{modelo} {REASONS.get(veredito.reason, veredito.reason)}"
+                            + (f" ({veredito.detail})" if veredito.detail else "")
+                            for modelo, veredito in info_stream['escalations']
+                        ))
+                    if info_stream.get("endpoint", "openai").split("/")[0] != "openai":
+                        st.caption(f"🛟 Respondido por {info_stream['endpoint']} (primário lento ou indisponível)")
+                    if similar is not None:
+                        st.caption(
+                            f"♻️ Resposta reaproveitada da pergunta \"{similar.prompt}\" "
+                            f"(similaridade {similar.similarity:.2f})"
+                        )
                 
-            except Exception as e:
-                st.error(f"❌ Erro ao gerar resposta: {str(e)}")
+                except Exception as e:
+                    st.error(f"❌ Erro ao gerar resposta: {str(e)}")
     
-    # Auto-processar pergunta sugerida
-    elif pergunta_inicial and api_key:
-        st.session_state.total_perguntas += 1
-        st.session_state.historico.append(("user", pergunta_inicial))
-        # Processo similar ao acima para pergunta sugerida
-        st.rerun()
-
     # Gerar resumo automático se solicitado
     if st.session_state.get('gerar_resumo') and api_key:
         st.session_state.gerar_resumo = False
         
         with st.spinner("📝 Gerando análise completa da prova..."):
-            messages = [
-                {
-                    "role": "system", 
-                    "content": f"""Você é um especialista em análise pedagógica do ENADE. 
-                    Com base nos documentos da prova ENADE CC 2017, gere um resumo estruturado e detalhado.
-                    
-                    DOCUMENTOS: {dados_documentos['text'][:12000]}"""
-                },
-                {
-                    "role": "user", 
-                    "content": """Gere uma análise completa da prova com:
-                    
-                    ## 📊 Visão Geral
-                    - Total de questões e distribuição
-                    - Tipos de questões (objetivas, discursivas)
-                    
-                    ## 🎯 Principais Temas Abordados  
-                    - Áreas de conhecimento mais cobradas
-                    - Tópicos específicos por questão
-                    
-                    ## 📈 Análise Pedagógica
-                    - Nível de dificuldade geral
-                    - Competências avaliadas
-                    - Pontos de destaque
-                    
-                    ## 💡 Insights para Educadores
-                    - Áreas que merecem mais atenção
-                    - Sugestões para preparação
-                    
-                    Use markdown e seja detalhado mas objetivo."""
-                }
-            ]
+            messages = summary_messages()
+            contexto = montar_contexto_resumo(context_budget(model, RESUMO_MAX_TOKENS, messages))
+            messages = summary_messages(contexto.text)
+            st.session_state.ultimo_uso_tokens = (count_message_tokens(messages, model), context_window(model))
+            chave = make_key(
+                "openai", modelo_escolhido, RESUMO_TEMPERATURE, PEDIDO_RESUMO,
+                f"{messages[0]['content']}\0max_tokens={RESUMO_MAX_TOKENS}",
+            )
+            pronta = respostas_prontas.get("openai", modelo_pronto, PEDIDO_RESUMO, RESUMO_TEMPERATURE, RESUMO_MAX_TOKENS)
+
+            def mensagens_resumo(modelo):
+                """Como no chat: o contexto do resumo cortado pela janela do degrau da cascata"""
+                if context_window(modelo) == context_window(model):
+                    return messages
+                orcamento = context_budget(modelo, RESUMO_MAX_TOKENS, summary_messages())
+                return summary_messages(montar_contexto_resumo(orcamento, modelo).text)
+            cancelamento = supersede(st.session_state)
             
             resposta_container = st.empty()
-            resposta_resumo = ""
-            
-            for chunk in gpt4_chat(
-                messages=messages,
-                api_key=api_key,
-                model=model,
-                temperature=0.1,
-                max_tokens=3000
-            ):
-                if chunk:
-                    resposta_resumo += chunk
-                    resposta_container.markdown(resposta_resumo + "▌")
             
-            resposta_container.markdown(resposta_resumo)
+            if pronta is not None:
+                resposta_stream = metricas.track(replay(pronta), "openai", modelo_pronto, "pre-calculada")
+            else:
+                resposta_stream = cached_stream(
+                    cache_respostas,
+                    chave,
+                    lambda: responder(
+                        messages,
+                        RESUMO_TEMPERATURE,
+                        RESUMO_MAX_TOKENS,
+                        cancel=cancelamento,
+                        pergunta=PEDIDO_RESUMO,
+                        mensagens_do_degrau=mensagens_resumo
+                    ),
+                    provider="openai",
+                    model=modelo_escolhido,
+                )
+            resposta_resumo = StreamRenderer(resposta_container).consume(resposta_stream)
             st.session_state.historico.append(("assistant", resposta_resumo))
             st.success("✅ Resumo gerado com sucesso!")
 
@@ -608,6 +868,7 @@ with tab2:
     with info_cols[0]:
         st.markdown("""
         **Modelos de IA Disponíveis:**
+        - **Cascata**: GPT-3.5 Turbo primeiro, GPT-4 só quando preciso
         - **GPT-4**: Máxima qualidade e precisão
         - **GPT-4 Turbo**: Mais rápido, mesma qualidade
         - **GPT-3.5 Turbo**: Mais econômico
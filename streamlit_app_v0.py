@@ -1,8 +1,9 @@
 import streamlit as st
 from openai import OpenAI
-import PyPDF2
 import os
 
+from pdf_ingest import load_pdf_pages
+
 # Deepseek- R1
 # Verificar se os arquivos existem
 # Se não existirem, podemos tentar carregar de uma URL? Ou pedir para o usuário fazer upload? Não, queremos evitar upload.
@@ -20,14 +21,9 @@ st.write(
 # Função para extrair texto de um PDF
 @st.cache_resource
 def extract_text_from_pdf(pdf_file_path):
-    with open(pdf_file_path, "rb") as f:
-        pdf_reader = PyPDF2.PdfReader(f)
-        text = ""
-        for page in pdf_reader.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text += page_text + "\n"
-        return text
+    # Texto por página vem do cache em disco (ou do PyPDF2 no primeiro acesso)
+    pages = load_pdf_pages(pdf_file_path)['pages']
+    return "".join(page_text + "\n" for page_text in pages if page_text)
     
 # Mapeamento dos documentos (caminhos locais)
 document_files = {
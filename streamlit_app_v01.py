@@ -7,6 +7,9 @@ import pandas as pd
 import PyPDF2
 from io import BytesIO
 
+from context_packer import context_budget, truncate_to_tokens
+from stream_renderer import StreamRenderer
+
 # Configuração da página
 st.set_page_config(page_title="📊 ENADE CC 2017 - DAIA", layout="wide")
 
@@ -42,7 +45,7 @@ def load_all_documents():
                 full_text += text + "\n\n"
         else:
             st.warning(f"Arquivo não encontrado: {path}")
-    return full_text[:150000]  # Limite para caber no contexto
+    return full_text
 
 # Carregar documentos uma vez no início
 documentos_completos = load_all_documents()
@@ -119,42 +122,34 @@ with tab1:
         with st.chat_message("user"):
             st.markdown(prompt)
         
-        # Montar contexto completo
-        contexto = f"""
-        CONTEXTO COMPLETO DA PROVA ENADE CC 2017:
-        {documentos_completos[:12000]}... [documento completo carregado]
-        """
-        
         # Montar mensagens para a DeepSeek
+        sistema = ("Você é um especialista em análise do ENADE de Ciência da Computação. "
+                   "Responda com base nas questões da prova, do gabarito e dos padrões de resposta combinados.")
+        cabecalho = "CONTEXTO COMPLETO DA PROVA ENADE CC 2017:\n"
+        pergunta = f"\n\nPergunta: {prompt}"
+        # O contexto ocupa o que sobra da janela depois da resposta e de todas as mensagens
+        orcamento = context_budget(model, max_tokens, [
+            {"role": "system", "content": sistema},
+            {"role": "user", "content": cabecalho + pergunta},
+        ])
+        contexto = truncate_to_tokens(documentos_completos, orcamento, model)
         messages = [
-            {
-                "role": "system", 
-                "content": "Você é um especialista em análise do ENADE de Ciência da Computação. "
-                           "Responda com base nas questões da prova, do gabarito e dos padrões de resposta combinados."
-            },
-            {
-                "role": "user", 
-                "content": f"Documentação completa carregada. Pergunta: {prompt}"
-            }
+            {"role": "system", "content": sistema},
+            {"role": "user", "content": cabecalho + contexto + pergunta}
         ]
         
         # Chamar DeepSeek
         try:
-            resposta_parcial = ""
             container = st.empty()
             with st.chat_message("assistant"):
-                for chunk in deepseek_chat(
+                # Redesenha em quadros (não a cada token); o último quadro vai sem cursor
+                resposta_parcial = StreamRenderer(container).consume(deepseek_chat(
                     messages=messages,
                     api_key=api_key,
                     model=model,
                     temperature=temperature,
                     max_tokens=max_tokens
-                ):
-                    if chunk:
-                        resposta_parcial += chunk
-                        container.markdown(resposta_parcial + "▌")
-            
-            container.markdown(resposta_parcial)
+                ))
             st.session_state.historico.append(("assistant", resposta_parcial))
                 
         except Exception as e:
@@ -178,20 +173,14 @@ with tab1:
                 }
             ]
             
-            resposta_parcial = ""
             container = st.empty()
-            for chunk in deepseek_chat(
+            resposta_parcial = StreamRenderer(container).consume(deepseek_chat(
                 messages=messages,
                 api_key=api_key,
                 model=model,
                 temperature=0.1,  # Mais preciso
                 max_tokens=1500
-            ):
-                if chunk:
-                    resposta_parcial += chunk
-                    container.markdown(resposta_parcial + "▌")
-            
-            container.markdown(resposta_parcial)
+            ))
             st.session_state.historico.append(("assistant", resposta_parcial))
             st.session_state.gerar_resumo = False
 
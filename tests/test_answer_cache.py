@@ -0,0 +1,42 @@
+from answer_cache import AnswerCache, cached_stream
+
+
+def test_disk_eviction_drops_least_recently_used(tmp_path):
+    cache = AnswerCache(path=str(tmp_path / "answers.sqlite3"), max_memory=1, max_disk=2)
+    cache.put("a", "resposta a")
+    cache.put("b", "resposta b")
+    # "a" volta a ser usada (vem do disco: a memória só guarda uma entrada)
+    assert cache.get("a") == "resposta a"
+    cache.put("c", "resposta c")
+
+    assert len(cache) == 2
+    assert "b" not in cache
+    assert cache.get("a") == "resposta a" and cache.get("c") == "resposta c"
+
+
+def test_memory_lru_keeps_the_most_recent_entries(tmp_path):
+    cache = AnswerCache(path=str(tmp_path / "answers.sqlite3"), max_memory=2)
+    for key in "abc":
+        cache.put(key, f"resposta {key}")
+
+    assert cache.stats()["memory_entries"] == 2
+    assert cache.get("a") == "resposta a"
+    assert cache.stats()["disk_hits"] == 1
+
+
+def test_entries_survive_a_restart(tmp_path):
+    path = str(tmp_path / "answers.sqlite3")
+    AnswerCache(path=path).put("a", "resposta a")
+
+    assert AnswerCache(path=path).get("a") == "resposta a"
+
+
+def test_incomplete_stream_is_not_cached(tmp_path):
+    cache = AnswerCache(path=str(tmp_path / "answers.sqlite3"))
+
+    def interrupted():
+        yield "meia "
+        return False
+
+    assert list(cached_stream(cache, "k", interrupted)) == ["meia "]
+    assert "k" not in cache
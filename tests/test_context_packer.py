@@ -0,0 +1,43 @@
+from context_packer import (
+    SAFETY_MARGIN,
+    context_budget,
+    context_window,
+    count_message_tokens,
+    count_tokens,
+    pack_context,
+    truncate_to_tokens,
+)
+
+MESSAGES = [{"role": "system", "content": "Você é um especialista no ENADE."},
+            {"role": "user", "content": "Quais questões tratam de grafos?"}]
+
+
+def test_budget_reserves_reply_messages_and_margin():
+    budget = context_budget("gpt-4", 1000, MESSAGES)
+
+    assert budget == context_window("gpt-4") - 1000 - count_message_tokens(MESSAGES, "gpt-4") - SAFETY_MARGIN
+
+
+def test_budget_is_capped_and_never_negative():
+    assert context_budget("deepseek-chat", 1000, MESSAGES, cap=5000) == 5000
+    assert context_budget("gpt-4", 9000, MESSAGES) == 0
+
+
+def test_pack_skips_blocks_that_do_not_fit_and_keeps_document_order():
+    small, large, other = "árvore binária de busca", "grafo " * 200, "tabela hash com encadeamento"
+    budget = count_tokens(small) + count_tokens(other) + count_tokens("\n\n")
+    # Ordem de valor: o bloco grande vem antes, mas não cabe e é pulado
+    packed = pack_context([(2, small), (0, large), (1, other)], budget)
+
+    assert packed.text == f"{other}\n\n{small}"
+    assert packed.included == 2 and packed.dropped == 1
+    assert packed.tokens <= packed.budget == budget
+
+
+def test_truncate_fits_the_budget():
+    text = "A complexidade da inserção em uma árvore AVL é logarítmica. " * 50
+    cut = truncate_to_tokens(text, 40)
+
+    assert text.startswith(cut) and len(cut) < len(text)
+    assert count_tokens(cut) <= 40
+    assert truncate_to_tokens("curto", 40) == "curto"
@@ -0,0 +1,26 @@
+from exam_index import AnswerKey, Rubric, RubricStore, answer_key_reply, find_question_refs, rubric_reply
+
+GABARITO = "ITEM GABARITO 1 A 2 ANULADA 3 C 4 B 5 E 6 D 7 B"
+
+
+def test_answer_key_reply_objective_only():
+    reply = answer_key_reply("qual a resposta da questão 7?", AnswerKey.parse(GABARITO))
+    assert "Questão 07:** alternativa **B**" in reply
+
+
+def test_answer_key_reply_leaves_mixed_prompt_to_the_model():
+    # D2 não está no gabarito: responder só a Q7 deixaria a discursiva sem resposta
+    assert answer_key_reply("resposta da questão 7 e discursiva 2", AnswerKey.parse(GABARITO)) is None
+
+
+def test_rubric_reply_leaves_mixed_prompt_to_the_model():
+    rubrics = RubricStore({"D2": Rubric("D2", "", "Resposta esperada.", (), (("", 10.0),))})
+    assert rubric_reply("padrão de resposta da discursiva 2", rubrics) is not None
+    assert rubric_reply("padrão de resposta da discursiva 2 e da questão 7", rubrics) is None
+
+
+def test_discursive_refs_need_the_number_attached_to_d():
+    assert find_question_refs("qual o padrão de resposta da D2?") == ["D2"]
+    assert find_question_refs("questão discursiva 03") == ["D3"]
+    assert find_question_refs("a letra d 2 da questão 12") == ["Q12"]
+    assert find_question_refs("no item d 3 do enunciado") == []
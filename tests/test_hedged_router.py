@@ -0,0 +1,87 @@
+import argparse
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import llm_client
+from fake_openai_server import make_handler
+from hedged_router import Endpoint, HedgedRouter
+
+MESSAGES = [{"role": "user", "content": "Explique a questão 9"}]
+
+
+def _serve(ttft_ms, fail_rate=0.0):
+    args = argparse.Namespace(ttft_ms=ttft_ms, token_ms=1, tokens=5, fail_rate=fail_rate,
+                              stall_rate=0.0, stall_ms=0, seed=1, verbose=False)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(args))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@pytest.fixture
+def servers(monkeypatch):
+    """Sobe primário e secundário falsos; ``start(primário, secundário)`` recebe kwargs de ``_serve``"""
+    running = []
+
+    def start(primary, secondary):
+        for provider, options in (("openai", primary), ("deepseek", secondary)):
+            server = _serve(**options)
+            running.append(server)
+            monkeypatch.setitem(llm_client.API_BASES, provider, f"http://127.0.0.1:{server.server_port}/v1")
+        return [Endpoint("openai", "gpt-4", "sk-a"), Endpoint("deepseek", "deepseek-chat", "sk-b")]
+
+    yield start
+    for server in running:
+        server.shutdown()
+        server.server_close()
+
+
+def _ask(router, endpoints):
+    info = {}
+    stream = router.stream(endpoints, MESSAGES, info=info)
+    pieces = []
+    while True:
+        try:
+            pieces.append(next(stream))
+        except StopIteration as stop:
+            return "".join(pieces), stop.value, info
+
+
+def test_slow_primary_is_hedged(servers):
+    endpoints = servers({"ttft_ms": 2000}, {"ttft_ms": 20})
+    router = HedgedRouter(hedge_after_ms=200)
+
+    text, completed, info = _ask(router, endpoints)
+
+    assert completed and text
+    assert info["endpoint"] == "deepseek/deepseek-chat" and info["hedged"]
+    assert info["finish_reason"] == "stop"
+    assert router.hedges == 1 and router.hedge_wins == 1
+
+
+def test_failing_primary_fails_over_with_a_single_strike(servers):
+    endpoints = servers({"ttft_ms": 20, "fail_rate": 1.0}, {"ttft_ms": 20})
+    router = HedgedRouter(hedge_after_ms=5000)
+
+    text, completed, info = _ask(router, endpoints)
+
+    assert completed and info["endpoint"] == "deepseek/deepseek-chat"
+    # Failover sai na hora, sem esperar o prazo de hedge, e a falha conta uma vez só
+    assert router.hedges == 0
+    assert router._state(endpoints[0]).strikes == 1
+
+
+def test_primary_over_slo_is_demoted(servers):
+    endpoints = servers({"ttft_ms": 80}, {"ttft_ms": 20})
+    router = HedgedRouter(hedge_after_ms=5000, slo_ttft_ms=40)
+
+    for _ in range(5):
+        _, completed, info = _ask(router, endpoints)
+        assert completed and info["endpoint"] == "openai/gpt-4"
+
+    assert router.demoted(endpoints[0])
+    assert router.order(endpoints)[0] == endpoints[1]
+    _, _, info = _ask(router, endpoints)
+    assert info["endpoint"] == "deepseek/deepseek-chat"
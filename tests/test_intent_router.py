@@ -0,0 +1,58 @@
+import pytest
+
+from exam_index import AnswerKey, QuestionSpan, Rubric, RubricStore
+from intent_router import route_query
+
+
+class _Questions:
+    """Índice mínimo: só as objetivas, com enunciado curto"""
+
+    def __init__(self, numbers):
+        self._ids = [f"Q{n}" for n in numbers]
+
+    def __contains__(self, ref):
+        return ref in self._ids
+
+    def ids(self, kind=None):
+        return [] if kind == "discursiva" else list(self._ids)
+
+    def get(self, ref):
+        if ref not in self._ids:
+            return None
+        return QuestionSpan(ref, "objetiva", int(ref[1:]), "2017 - Questoes.pdf", 0, 0, 0, 0, 1, 1)
+
+    def statement(self, ref):
+        return f"QUESTÃO {int(ref[1:]):02d} Enunciado da questão {ref[1:]}"
+
+
+def test_annulled_questions_are_listed_from_answer_key():
+    answer_key = AnswerKey.parse("ITEM GABARITO 1 A 2 ANULADA 3 C 4 * 5 E")
+    route = route_query("quais questões foram anuladas?", _Questions(range(1, 6)), answer_key, RubricStore({}))
+
+    assert route.intent == "anuladas"
+    assert "Questão 02" in route.reply and "Questão 04" in route.reply
+    assert "Questão 01" not in route.reply
+
+
+@pytest.mark.parametrize("prompt", [
+    "qual a resposta da questão 12 e qual o assunto abordado nela?",
+    "qual o padrão de resposta da D2 e quais erros comuns os alunos cometem?",
+    "mostre o enunciado da questão 7 e diga qual o tema",
+])
+def test_compound_question_goes_to_the_model(prompt):
+    rubrics = RubricStore({"D2": Rubric("D2", "", "Resposta esperada.", (), (("", 10.0),))})
+    answer_key = AnswerKey.parse("ITEM GABARITO 7 B 12 C")
+
+    assert route_query(prompt, _Questions([7, 12]), answer_key, rubrics).intent == "llm"
+
+
+@pytest.mark.parametrize("prompt, intent", [
+    ("qual a resposta da questão 12?", "gabarito"),
+    ("qual o padrão de resposta da D2?", "padrao"),
+    ("mostre o enunciado da questão 7", "enunciado"),
+])
+def test_simple_lookup_is_answered_directly(prompt, intent):
+    rubrics = RubricStore({"D2": Rubric("D2", "", "Resposta esperada.", (), (("", 10.0),))})
+    answer_key = AnswerKey.parse("ITEM GABARITO 7 B 12 C")
+
+    assert route_query(prompt, _Questions([7, 12]), answer_key, rubrics).intent == intent
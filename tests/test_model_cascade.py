@@ -0,0 +1,117 @@
+import pytest
+
+from exam_index import AnswerKey
+from model_cascade import ModelCascade, check_grounding
+
+QUESTIONS = {f"Q{n}" for n in range(1, 36)} | {f"D{n}" for n in range(1, 6)}
+ANSWER_KEY = AnswerKey.parse("ITEM GABARITO 9 C 10 A 11 ANULADA")
+
+
+@pytest.mark.parametrize("answer, kwargs, reason", [
+    ("", {}, "incompleta"),
+    ("A questão 9 trata de", {"completed": False}, "incompleta"),
+    ("A questão 9 trata de pilhas e", {"finish_reason": "length"}, "cortada"),
+    ("Não encontrei essa informação nos documentos.", {}, "recusa"),
+    ("Como na questão 48, a resposta é C.", {}, "questao_inexistente"),
+    ("Na questão 9, a alternativa A está correta.", {}, "gabarito_divergente"),
+    ("A questão 10 trata de filas.", {}, "fora_do_pedido"),
+])
+def test_draft_is_escalated(answer, kwargs, reason):
+    verdict = check_grounding(answer, "qual a resposta da questão 9?", QUESTIONS, ANSWER_KEY, **kwargs)
+
+    assert not verdict.ok and verdict.reason == reason
+
+
+@pytest.mark.parametrize("answer", [
+    "Na questão 9, a alternativa C está correta: a pilha é LIFO.",
+    # Comentar um distrator não é escolher a alternativa
+    "Na questão 9, a alternativa A está errada porque confunde pilha e fila.",
+    # Questão anulada não tem alternativa a contrariar
+    "Na questão 11, a alternativa B está correta.",
+])
+def test_grounded_draft_is_accepted(answer):
+    assert check_grounding(answer, "fale das questões 9 e 11", QUESTIONS, ANSWER_KEY).ok
+
+
+def _tiers(answers, calls):
+    """``call`` da cascata: cada degrau devolve sua resposta em pedaços de 5 caracteres"""
+    def call(model, info):
+        calls.append(model)
+        text = answers[model]
+        for i in range(0, len(text), 5):
+            yield text[i:i + 5]
+        info["finish_reason"] = "stop"
+        return True
+    return call
+
+
+def _run(cascade, call, prompt):
+    info = {}
+    stream = cascade.stream(call, prompt, QUESTIONS, ANSWER_KEY, info=info)
+    pieces = []
+    while True:
+        try:
+            pieces.append(next(stream))
+        except StopIteration as stop:
+            return "".join(pieces), stop.value, info
+
+
+def test_accepted_draft_is_not_escalated():
+    calls = []
+    cascade = ModelCascade(tiers=("barato", "caro"))
+    answers = {"barato": "A questão 9 pede a alternativa C.", "caro": "resposta cara"}
+
+    text, completed, info = _run(cascade, _tiers(answers, calls), "qual a resposta da questão 9?")
+
+    assert (text, completed, calls) == (answers["barato"], True, ["barato"])
+    assert info["tier"] == "barato" and info["escalations"] == []
+
+
+def test_wrong_draft_escalates_to_the_last_tier():
+    calls = []
+    cascade = ModelCascade(tiers=("barato", "caro"))
+    answers = {"barato": "Na questão 9, a alternativa B está correta.", "caro": "Na questão 9, a resposta é C."}
+
+    text, completed, info = _run(cascade, _tiers(answers, calls), "qual a resposta da questão 9?")
+
+    assert text == answers["caro"] and calls == ["barato", "caro"]
+    assert [(model, verdict.reason) for model, verdict in info["escalations"]] == [("barato", "gabarito_divergente")]
+    assert cascade.summary()["tiers"][0]["escalations"] == {"gabarito_divergente": 1}
+
+
+def test_missing_question_stops_the_draft_mid_stream():
+    closed = []
+
+    def call(model, info):
+        try:
+            if model == "barato":
+                yield "Veja a questão 48. "
+                yield "x" * 50
+                raise AssertionError("o rascunho deveria ter sido descartado")
+            yield "ok"
+            return True
+        finally:
+            closed.append(model)
+
+    cascade = ModelCascade(tiers=("barato", "caro"), check_every=10)
+    text, _, info = _run(cascade, call, "fale da prova")
+
+    assert text == "ok" and closed == ["barato", "caro"]
+    assert info["escalations"][0][1].reason == "questao_inexistente"
+
+
+def test_draft_api_error_escalates():
+    calls = []
+
+    def call(model, info):
+        calls.append(model)
+        if model == "barato":
+            info["error"] = "Erro na API OpenAI (429)"
+            return None
+        yield "ok"
+        return True
+
+    text, completed, info = _run(ModelCascade(tiers=("barato", "caro")), call, "fale da prova")
+
+    assert (text, completed, calls) == ("ok", True, ["barato", "caro"])
+    assert info["escalations"][0][1].reason == "erro"
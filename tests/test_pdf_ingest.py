@@ -0,0 +1,55 @@
+import os
+import shutil
+
+import pytest
+
+import pdf_ingest
+
+GABARITO_PDF = os.path.join(os.path.dirname(__file__), os.pardir, "2017 - BCC - gb.pdf")
+
+
+@pytest.fixture
+def pdf(tmp_path, monkeypatch):
+    monkeypatch.setattr(pdf_ingest, "CACHE_DIR", str(tmp_path / "cache"))
+    path = tmp_path / "gabarito.pdf"
+    shutil.copy(GABARITO_PDF, path)
+    return str(path)
+
+
+def _no_extraction(*args, **kwargs):
+    raise AssertionError("o PDF não deveria ser extraído de novo")
+
+
+def test_second_load_comes_from_disk_cache(pdf, monkeypatch):
+    first = pdf_ingest.load_pdf_pages(pdf, workers=1)
+    monkeypatch.setattr(pdf_ingest, "extract_pages_parallel", _no_extraction)
+    second = pdf_ingest.load_pdf_pages(pdf, workers=1)
+
+    assert not first["from_cache"] and second["from_cache"]
+    assert second["pages"] == first["pages"] and "GABARITO" in "".join(first["pages"])
+
+
+def test_changed_pdf_misses_the_cache(pdf):
+    first = pdf_ingest.load_pdf_pages(pdf, workers=1)
+    with open(pdf, "ab") as f:
+        f.write(b"\n% revisado\n")
+    second = pdf_ingest.load_pdf_pages(pdf, workers=1)
+
+    assert not second["from_cache"]
+    assert second["sha256"] != first["sha256"]
+
+
+def test_new_extractor_version_invalidates_the_cache(pdf, monkeypatch):
+    pdf_ingest.load_pdf_pages(pdf, workers=1)
+    monkeypatch.setattr(pdf_ingest, "EXTRACTOR_VERSION", "pypdf2-teste")
+
+    assert not pdf_ingest.load_pdf_pages(pdf, workers=1)["from_cache"]
+
+
+def test_corrupt_cache_file_is_ignored(pdf):
+    digest = pdf_ingest.load_pdf_pages(pdf, workers=1)["sha256"]
+    with open(pdf_ingest._cache_path(digest), "w", encoding="utf-8") as f:
+        f.write('{"sha256": "')
+
+    again = pdf_ingest.load_pdf_pages(pdf, workers=1)
+    assert not again["from_cache"] and again["pages"]
@@ -0,0 +1,30 @@
+import numpy as np
+
+from semantic_cache import SemanticCache
+
+
+class _WordEmbedder:
+    """Embedding determinístico: uma dimensão por palavra conhecida"""
+
+    VOCAB = ["grafo", "árvore", "pilha", "fila", "hash", "ordenação"]
+
+    def embed(self, texts):
+        rows = []
+        for text in texts:
+            row = np.array([float(word in text) for word in self.VOCAB]) + 1e-3
+            rows.append(row / np.linalg.norm(row))
+        return np.vstack(rows)
+
+
+def test_full_cache_still_stores_new_scope():
+    cache = SemanticCache(_WordEmbedder(), threshold=0.9, max_entries=2)
+    cache.add("s", "o que é um grafo?", "resposta grafo")
+    cache.add("s", "o que é uma pilha?", "resposta pilha")
+    cache.add("t", "o que é uma fila?", "resposta fila")
+
+    assert len(cache) == 2
+    hit = cache.lookup("t", "o que é uma fila?")
+    assert hit is not None and hit.answer == "resposta fila"
+    # A entrada descartada é a mais antiga do cache todo
+    assert cache.lookup("s", "o que é um grafo?") is None
+    assert cache.lookup("s", "o que é uma pilha?").answer == "resposta pilha"
@@ -0,0 +1,71 @@
+import json
+
+import pytest
+
+import sse
+from sse import ChatStream, SSEDecoder
+
+
+def _event(content=None, finish_reason=None):
+    delta = {"content": content} if content is not None else {}
+    return "data: " + json.dumps({"choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]},
+                                 ensure_ascii=False) + "\n\n"
+
+
+BODY = (
+    ": keep-alive\n\n"
+    + _event("A questão ")
+    + _event("é sobre árvores \"AVL\"\n")
+    + _event(finish_reason="stop")
+    + 'data: {"choices":[],"usage":{"prompt_tokens":12,"completion_tokens":5}}\n\n'
+    + "data: [DONE]\n\n"
+).encode("utf-8")
+
+
+def _chunks(body, size):
+    return [body[i:i + size] for i in range(0, len(body), size)]
+
+
+@pytest.mark.parametrize("fast_path", [False, True])
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64, len(BODY)])
+def test_content_is_the_same_for_any_chunking(size, fast_path, monkeypatch):
+    # Com e sem o atalho por regex do delta.content (usado quando não há orjson)
+    monkeypatch.setattr(sse, "_FAST_PATH", fast_path)
+    stream = ChatStream()
+    text = "".join(stream.iter_content(_chunks(BODY, size)))
+
+    assert text == "A questão é sobre árvores \"AVL\"\n"
+    assert stream.done and stream.finish_reason == "stop"
+    assert stream.usage == {"prompt_tokens": 12, "completion_tokens": 5}
+    assert stream.malformed == 0
+
+
+def test_accent_split_between_chunks_is_reassembled():
+    body = _event("ção").encode("utf-8")
+    cut = body.index("ç".encode("utf-8")) + 1  # no meio dos 2 bytes do "ç"
+    stream = ChatStream()
+
+    assert stream.feed(body[:cut]) == []
+    assert stream.feed(body[cut:]) == ["ção"]
+
+
+def test_crlf_split_between_chunks():
+    decoder = SSEDecoder()
+
+    assert decoder.feed(b"data: um\r") == []
+    assert decoder.feed(b"\n\r\ndata: dois\r\n\r\n") == [b"um", b"dois"]
+
+
+def test_multiline_data_and_missing_final_blank_line():
+    decoder = SSEDecoder()
+
+    assert decoder.feed(b"data: linha 1\ndata: linha 2\n") == []
+    assert decoder.flush() == [b"linha 1\nlinha 2"]
+
+
+def test_malformed_event_is_counted():
+    stream = ChatStream()
+    body = b'data: {"choices": [\n\n' + _event("ok").encode("utf-8") + b"data: [DONE]\n\n"
+
+    assert list(stream.iter_content([body])) == ["ok"]
+    assert stream.malformed == 1
@@ -0,0 +1,154 @@
+"""Busca semântica (vetorial) sobre os trechos dos documentos da prova.
+
+Os trechos produzidos por :func:`retrieval.chunk_pages` são convertidos em
+vetores por um *embedder* plugável e guardados em uma matriz float32
+normalizada (L2), salva em ``.cache/vectors`` e aberta com ``mmap``. O top-k
+é um produto matriz-vetor seguido de ``argpartition``.
+
+Embedders disponíveis (ver :func:`get_embedder`):
+
+- ``hashing``: determinístico e offline (feature hashing de termos e n-gramas
+  de caracteres), útil para testes e como padrão sem dependências externas;
+- ``openai:<modelo>``: API de embeddings da OpenAI (``OPENAI_API_KEY``);
+- ``st:<modelo>``: modelo local via ``sentence-transformers``, se instalado.
+"""
+import hashlib
+import os
+import zlib
+
+import numpy as np
+
+from retrieval import fold_accents, tokenize
+
+CACHE_DIR = os.environ.get("ENADE_CACHE_DIR", ".cache")
+
+
+def _normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32, copy=False)
+
+
+class HashingEmbedder:
+    """Embedder determinístico por *feature hashing* (sem rede, sem modelo)"""
+
+    def __init__(self, dim=1024, ngram=4):
+        self.dim = dim
+        self.ngram = ngram
+        self.name = f"hashing-v1-{dim}-{ngram}"
+
+    def _features(self, text):
+        terms = tokenize(text)
+        features = [("t", term) for term in terms]
+        # N-gramas de caracteres aproximam variações de forma ("árvore", "árvores", "arborescente")
+        for word in fold_accents(text).split():
+            padded = f" {word} "
+            features.extend(("c", padded[i:i + self.ngram]) for i in range(max(1, len(padded) - self.ngram + 1)))
+        return features
+
+    def embed(self, texts):
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for kind, feature in self._features(text):
+                h = zlib.crc32(f"{kind}:{feature}".encode("utf-8"))
+                sign = 1.0 if h & 0x80000000 else -1.0
+                weight = 1.0 if kind == "t" else 0.5
+                matrix[row, h % self.dim] += sign * weight
+        return _normalize_rows(matrix)
+
+
+class OpenAIEmbedder:
+    """Embeddings pela API da OpenAI (``/v1/embeddings``)"""
+
+    endpoint = "https://api.openai.com/v1/embeddings"
+
+    def __init__(self, model="text-embedding-3-small", api_key=None, batch_size=96, timeout=(5, 60)):
+        self.model = model
+        self.api_key = api_key or os.environ.get("OPENAI_API_KEY", "")
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.name = f"openai-{model}"
+
+    def embed(self, texts):
+        import requests
+
+        rows = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = texts[start:start + self.batch_size]
+            response = requests.post(
+                self.endpoint,
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                json={"model": self.model, "input": batch},
+                timeout=self.timeout,
+            )
+            response.raise_for_status()
+            data = sorted(response.json()["data"], key=lambda item: item["index"])
+            rows.extend(item["embedding"] for item in data)
+        return _normalize_rows(np.asarray(rows, dtype=np.float32))
+
+
+class SentenceTransformerEmbedder:
+    """Embeddings por um modelo local do ``sentence-transformers``"""
+
+    def __init__(self, model="paraphrase-multilingual-MiniLM-L12-v2"):
+        from sentence_transformers import SentenceTransformer
+
+        self._model = SentenceTransformer(model)
+        self.name = f"st-{model.replace('/', '_')}"
+
+    def embed(self, texts):
+        vectors = self._model.encode(list(texts), convert_to_numpy=True, normalize_embeddings=True)
+        return _normalize_rows(np.asarray(vectors, dtype=np.float32))
+
+
+def get_embedder(spec=None, api_key=None):
+    """Cria o embedder a partir de ``spec`` (ou de ``ENADE_EMBEDDER``; padrão ``hashing``)"""
+    spec = spec or os.environ.get("ENADE_EMBEDDER", "hashing")
+    kind, _, model = spec.partition(":")
+    if kind == "openai":
+        return OpenAIEmbedder(model or "text-embedding-3-small", api_key=api_key)
+    if kind == "st":
+        return SentenceTransformerEmbedder(model or "paraphrase-multilingual-MiniLM-L12-v2")
+    if kind == "hashing":
+        return HashingEmbedder(int(model)) if model else HashingEmbedder()
+    raise ValueError(f"Embedder desconhecido: {spec}")
+
+
+class VectorIndex:
+    """Matriz de embeddings (uma linha por trecho) com busca top-k por similaridade de cosseno"""
+
+    def __init__(self, chunks, matrix, embedder):
+        self.chunks = chunks
+        self.matrix = matrix
+        self.embedder = embedder
+
+    @classmethod
+    def build(cls, chunks, embedder):
+        """Calcula (ou reabre do disco) a matriz de embeddings dos trechos.
+
+        A chave do arquivo combina o nome do embedder e o conteúdo dos
+        trechos, então trocar de modelo ou alterar um PDF gera uma nova matriz.
+        """
+        digest = hashlib.sha256(embedder.name.encode("utf-8"))
+        for chunk in chunks:
+            digest.update(b"\0" + chunk.text.encode("utf-8"))
+        path = os.path.join(CACHE_DIR, "vectors", f"{embedder.name}-{digest.hexdigest()[:16]}.npy")
+
+        if not os.path.exists(path):
+            matrix = embedder.embed([chunk.text for chunk in chunks]) if chunks else np.zeros((0, 1), np.float32)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                np.save(f, matrix)
+            os.replace(tmp_path, path)
+        return cls(chunks, np.load(path, mmap_mode="r"), embedder)
+
+    def search(self, query, k=8):
+        """Os ``k`` trechos mais similares à consulta, como ``[(score, Chunk), ...]``"""
+        if not self.chunks:
+            return []
+        scores = self.matrix @ self.embedder.embed([query])[0]
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(float(scores[i]), self.chunks[i]) for i in top]